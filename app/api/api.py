@@ -1,20 +1,121 @@
 import uuid, os
+import asyncio
 import tempfile
+import threading
 import shutil
-import mimetypes
+import sys
+from contextlib import asynccontextmanager
+from functools import lru_cache
 from pathlib import Path
 from typing import Optional
 
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
 
+from app.core.filetype import UnsupportedFileTypeError, detect_file_type
+from app.core.metrics import REGISTRY, record_cache_lookup, timed
 from app.core.paths import  PROJECT_ROOT, APP_DIR
+from app.core.precision import RuntimeConfig, parse_setting
 from app.services.predict import DocumentClassifier
 
 
-app = FastAPI()
+# Load available models automatically
+MODEL_DIR = PROJECT_ROOT / "models"
+
+# Set PRELOAD_DEFAULT_MODEL=0 to skip warming the default model at startup
+PRELOAD_DEFAULT_MODEL = os.environ.get("PRELOAD_DEFAULT_MODEL", "1") != "0"
+
+# Populated by the startup lifespan hook, not at import time
+AVAILABLE_MODELS: list[str] = []
+DEFAULT_MODEL_NAME: Optional[str] = None
+
+# Readiness: flips to True once model discovery and preload have finished
+READINESS = {"ready": False, "detail": "starting"}
+
+# Cache for loaded models
+CLASSIFIERS = {}
+_CLASSIFIERS_LOCK = threading.Lock()
+
+
+def get_available_models() -> list[str]:
+    # Check if the directory exists before trying to load
+    if not MODEL_DIR.is_dir():
+        return []
+    return sorted(d.name for d in MODEL_DIR.iterdir() if d.is_dir())
+
+
+def discover_models() -> None:
+    global AVAILABLE_MODELS, DEFAULT_MODEL_NAME
+    if not MODEL_DIR.is_dir():
+        print(f"[WARN] Model directory not found at '{MODEL_DIR}'", file=sys.stderr)
+    AVAILABLE_MODELS = get_available_models()
+    DEFAULT_MODEL_NAME = "deepset_gbert-base" if "deepset_gbert-base" in AVAILABLE_MODELS else (AVAILABLE_MODELS[0] if AVAILABLE_MODELS else None)
+
+
+@lru_cache(maxsize=None)
+def get_runtime_config() -> RuntimeConfig:
+    """bf16/torch.compile: `runtime:` section of config.yaml, overridden by INFERENCE_BF16/INFERENCE_COMPILE (0, 1, auto)."""
+    import yaml
+
+    config_path = PROJECT_ROOT / "config.yaml"
+    values = {}
+    if config_path.exists():
+        with open(config_path, "r") as f:
+            values = (yaml.safe_load(f) or {}).get("runtime") or {}
+    runtime_config = RuntimeConfig.from_dict(values)
+    if "INFERENCE_BF16" in os.environ:
+        runtime_config.bf16 = parse_setting(os.environ["INFERENCE_BF16"])
+    if "INFERENCE_COMPILE" in os.environ:
+        runtime_config.compile = parse_setting(os.environ["INFERENCE_COMPILE"])
+    return runtime_config
+
+
+def get_classifier(model_name: str):
+    if model_name not in AVAILABLE_MODELS:
+        raise HTTPException(
+            status_code=404, 
+            detail=f"Model '{model_name}' not found. Available models: {AVAILABLE_MODELS}"
+        )
+
+    record_cache_lookup("classifier", hit=model_name in CLASSIFIERS)
+    if model_name not in CLASSIFIERS:
+        # The lock keeps the startup preload and a first request from loading the same model twice
+        with _CLASSIFIERS_LOCK:
+            if model_name not in CLASSIFIERS:
+                model_path = MODEL_DIR / model_name
+                CLASSIFIERS[model_name] = DocumentClassifier(str(model_path), runtime_config=get_runtime_config())
+    return CLASSIFIERS[model_name]
+
+
+def preload_default_model() -> None:
+    """Load the default model (importing torch/transformers) and mark the service ready."""
+    try:
+        if DEFAULT_MODEL_NAME is None:
+            READINESS.update(ready=False, detail=f"No models found in '{MODEL_DIR}'")
+            return
+        if PRELOAD_DEFAULT_MODEL:
+            READINESS["detail"] = f"loading {DEFAULT_MODEL_NAME}"
+            get_classifier(DEFAULT_MODEL_NAME)
+        READINESS.update(ready=True, detail="ok")
+    except Exception as e:
+        print(f"[ERROR] Preloading {DEFAULT_MODEL_NAME} failed: {e}", file=sys.stderr)
+        READINESS.update(ready=False, detail=f"preload failed: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    discover_models()
+    # Preload in a worker thread so the server accepts liveness probes right away
+    preload_task = asyncio.create_task(asyncio.to_thread(preload_default_model))
+    yield
+    if not preload_task.done():
+        preload_task.cancel()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # --- ENABLE CORS ---
 app.add_middleware(
@@ -37,38 +138,18 @@ app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
 async def read_index():
     return FileResponse(STATIC_DIR / "index.html")
 
-# Load models 
 
-# Load available models automatically
-MODEL_DIR = PROJECT_ROOT / "models"
+@app.get("/health")
+async def health():
+    # Liveness: the process is up, models may still be loading
+    return {"status": "alive"}
 
-# Check if the directory exists before trying to load
-if not os.path.isdir(MODEL_DIR):
-    raise RuntimeError(f"Model directory not found at '{MODEL_DIR}'")
 
-# Now load your model from MODEL_DIR
-# e.g., model = YourModelLoader.load(MODEL_DIR)
-
-def get_available_models() -> list[str]:
-    return [d.name for d in MODEL_DIR.iterdir() if d.is_dir()]
-
-AVAILABLE_MODELS = get_available_models()
-DEFAULT_MODEL_NAME = "deepset_gbert-base" if "deepset_gbert-base" in AVAILABLE_MODELS else (AVAILABLE_MODELS[0] if AVAILABLE_MODELS else None)
-
-# Cache for loaded models
-CLASSIFIERS = {}
-
-def get_classifier(model_name: str):
-    if model_name not in AVAILABLE_MODELS:
-        raise HTTPException(
-            status_code=404, 
-            detail=f"Model '{model_name}' not found. Available models: {AVAILABLE_MODELS}"
-        )
-
-    if model_name not in CLASSIFIERS:
-        model_path = MODEL_DIR / model_name
-        CLASSIFIERS[model_name] = DocumentClassifier(str(model_path))
-    return CLASSIFIERS[model_name]
+@app.get("/ready")
+async def ready():
+    # Readiness: green only after model discovery and preload completed
+    status_code = 200 if READINESS["ready"] else 503
+    return JSONResponse(status_code=status_code, content={**READINESS, "default_model": DEFAULT_MODEL_NAME})
 
 
 # Model from kaggle download for testing
@@ -84,36 +165,51 @@ async def list_models():
     }
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    # Prometheus text exposition format
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.post("/predict")
 async def predict(
-    model_name: str = Form(DEFAULT_MODEL_NAME),
+    model_name: Optional[str] = Form(None),
     text: Optional[str] = Form(None),
     file: Optional[UploadFile] = File(None)
 ):  
+    # Resolved per request, the default is only known after startup discovery
+    model_name = model_name or DEFAULT_MODEL_NAME
     if not model_name:
         raise HTTPException(status_code=400, detail="No models available to process request.")
 
-    classifier = get_classifier(model_name)
+    # Off the event loop: loading a model (or waiting for the startup preload to finish it)
+    # must not stall /health and /ready
+    classifier = await run_in_threadpool(get_classifier, model_name)
     # -----------------------
     # CASE 1 — File uploaded
     # -----------------------
     if file:
+        # Sniff the first bytes of the upload and reject unsupported types before touching disk
+        try:
+            with timed("mime_detection"):
+                file_type = detect_file_type(file.file, name=file.filename)
+        except UnsupportedFileTypeError as e:
+            raise HTTPException(status_code=415, detail=str(e))
+
         # Use a secure temporary directory
         temp_dir = tempfile.mkdtemp()
         try:
-            temp_name = Path(temp_dir) / file.filename
-            with open(temp_name, "wb") as f:
+            temp_name = Path(temp_dir) / Path(file.filename).name
+            with timed("upload_read"), open(temp_name, "wb") as f:
                 shutil.copyfileobj(file.file, f)
-            result = classifier.predict_file(temp_name)
+            result = await run_in_threadpool(classifier.predict_file, temp_name, file_type=file_type)
         finally:
             shutil.rmtree(temp_dir) # Clean up the directory and its contents
 
-        mime_type, _ = mimetypes.guess_type(file.filename)
-
         return {
             "mode": "file",
             "filename": file.filename,
-            "mime_type": mime_type,
+            "mime_type": file_type.mime,
             "result": result
         }
 
@@ -121,7 +217,7 @@ async def predict(
     # CASE 2 — Raw text
     # -----------------------
     if text:
-        result = classifier.predict(text)
+        result = await run_in_threadpool(classifier.predict, text)
         return {"mode": "text", "result": result}
 
     # -----------------------
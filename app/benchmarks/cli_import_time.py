@@ -0,0 +1,77 @@
+"""
+Import-time regression check for the `app.main` CLI.
+
+Runs `python -X importtime -m app.main --help` in a fresh interpreter, sums the
+cumulative import time of the top-level imports and fails (exit code 1) when it
+exceeds the budget or when a heavy module sneaks into the `--help` path.
+
+Usage:
+    python -m app.benchmarks.cli_import_time --budget-ms 300
+"""
+import argparse
+import re
+import subprocess
+import sys
+
+from app.core.paths import PROJECT_ROOT
+
+# Modules that must never be imported just to print the CLI help
+FORBIDDEN_MODULES = ("torch", "transformers", "faker", "datasets", "sklearn", "pandas", "matplotlib")
+
+# "import time:       self [us] |  cumulative | imported package"
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def parse_importtime(stderr: str) -> list[tuple[str, int, int]]:
+    """Return (module, cumulative_us, depth) for each line of -X importtime output."""
+    rows = []
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            _, cumulative, indent, module = match.groups()
+            # One leading space for top-level imports, two more per nesting level
+            rows.append((module, int(cumulative), (len(indent) - 1) // 2))
+    return rows
+
+
+def measure(args: list[str]) -> list[tuple[str, int, int]]:
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "app.main", *args],
+        cwd=PROJECT_ROOT, capture_output=True, text=True,
+    )
+    if out.returncode != 0:
+        raise RuntimeError(f"app.main {' '.join(args)} failed:\n{out.stderr[-2000:]}")
+    return parse_importtime(out.stderr)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Check the import-time budget of the CLI --help path.")
+    parser.add_argument("--budget-ms", type=float, default=300.0, help="Maximum total import time in milliseconds.")
+    parser.add_argument("--top", type=int, default=10, help="Show the N slowest top-level imports.")
+    args = parser.parse_args()
+
+    rows = measure(["--help"])
+    top_level = [(m, c) for m, c, depth in rows if depth == 0]
+    total_ms = sum(c for _, c in top_level) / 1000
+    loaded = {m.split(".")[0] for m, _, _ in rows}
+    offenders = sorted(loaded.intersection(FORBIDDEN_MODULES))
+
+    print(f"⏱️  app.main --help imports: {total_ms:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    for module, cumulative in sorted(top_level, key=lambda r: r[1], reverse=True)[:args.top]:
+        print(f"   {cumulative / 1000:8.1f} ms  {module}")
+
+    failed = False
+    if offenders:
+        print(f"[FAIL] Heavy modules imported for --help: {offenders}", file=sys.stderr)
+        failed = True
+    if total_ms > args.budget_ms:
+        print(f"[FAIL] Import time {total_ms:.1f} ms exceeds budget {args.budget_ms:.0f} ms", file=sys.stderr)
+        failed = True
+
+    if failed:
+        sys.exit(1)
+    print("✅ Import-time budget respected")
+
+
+if __name__ == "__main__":
+    main()
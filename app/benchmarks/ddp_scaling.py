@@ -0,0 +1,109 @@
+"""
+Training throughput of CPU data-parallel training at 1/2/4/8 processes.
+
+For every model in `models_to_train` (or --models), a short fixed-length training
+run (synthetic documents generated in memory, padded to --max-length) is started
+through `app.core.ddp.launch_cpu_ddp` with each process count. The Trainer's
+global `train_samples_per_second` is reported together with the speed-up over
+the smallest process count (a single process using all cores by default).
+
+Usage:
+    python -m app.benchmarks.ddp_scaling --procs 1 2 4 8 --steps 20 --output results/ddp_scaling.json
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+from pathlib import Path
+from typing import Dict, List
+
+import yaml
+
+from app.core.ddp import available_cores, launch_cpu_ddp
+from app.core.paths import PROJECT_ROOT
+
+
+def measure_throughput(model_name: str, label_map: Dict[str, str], steps: int, batch_size: int,
+                       max_length: int) -> Dict[str, float]:
+    """Runs inside every DDP worker; returns the Trainer's speed metrics (rank 0's are used)."""
+    from datasets import Dataset
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer, Trainer, TrainingArguments
+
+    from app.sampler.stream import iter_synthetic_batches
+
+    world_size = int(os.environ.get("WORLD_SIZE", 1))
+    n_docs = steps * batch_size * world_size
+    per_category = max(1, n_docs // (2 * len(label_map)) + 1)
+    texts, labels = [], []
+    for batch in iter_synthetic_batches({"v0": per_category, "v1": per_category}, label_map, seed=42):
+        texts.extend(batch.column("text").to_pylist())
+        labels.extend(batch.column("label").to_pylist())
+    classes = sorted(set(labels))
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    encodings = tokenizer(texts, truncation=True, padding="max_length", max_length=max_length)
+    dataset = Dataset.from_dict({**encodings, "label": [classes.index(label) for label in labels]})
+    model = AutoModelForSequenceClassification.from_pretrained(model_name, num_labels=len(classes))
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        args = TrainingArguments(
+            output_dir=output_dir,
+            max_steps=steps,
+            per_device_train_batch_size=batch_size,
+            save_strategy="no",
+            logging_strategy="no",
+            report_to="none",
+            use_cpu=True,
+            ddp_backend="gloo" if world_size > 1 else None,
+        )
+        metrics = Trainer(model=model, args=args, train_dataset=dataset).train().metrics
+    return {
+        "train_samples_per_second": metrics["train_samples_per_second"],
+        "train_runtime": metrics["train_runtime"],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark CPU DDP training scaling.")
+    parser.add_argument("--models", nargs="+", default=None, help="Models to benchmark (default: models_to_train).")
+    parser.add_argument("--procs", nargs="+", type=int, default=[1, 2, 4, 8], help="Process counts.")
+    parser.add_argument("--steps", type=int, default=20, help="Optimizer steps per run.")
+    parser.add_argument("--batch-size", type=int, default=4, help="Per-process batch size.")
+    parser.add_argument("--max-length", type=int, default=256, help="Padded sequence length.")
+    parser.add_argument("--output", default=None, help="Write the results to this JSON file.")
+    args = parser.parse_args()
+
+    with open(PROJECT_ROOT / "config.yaml", "r") as f:
+        config = yaml.safe_load(f)
+    models: List[str] = args.models or config["models_to_train"]
+    n_cores = len(available_cores())
+    procs = [n for n in args.procs if n <= n_cores]
+    if len(procs) < len(args.procs):
+        print(f"[WARN] Skipping process counts above the {n_cores} available cores", file=sys.stderr)
+
+    results = {}
+    for model_name in models:
+        print(f"\n🚀 {model_name}")
+        results[model_name] = {}
+        for n in procs:
+            metrics = launch_cpu_ddp(
+                measure_throughput, n,
+                model_name=model_name, label_map=config["label_map"],
+                steps=args.steps, batch_size=args.batch_size, max_length=args.max_length,
+            )
+            results[model_name][n] = metrics
+            baseline = results[model_name][procs[0]]["train_samples_per_second"]
+            print(f"   {n} proc(s): {metrics['train_samples_per_second']:8.2f} samples/s "
+                  f"({metrics['train_samples_per_second'] / baseline:.2f}x)")
+
+    if args.output:
+        output = Path(args.output)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(results, indent=4))
+        print(f"💾 Saved: {output}")
+
+
+if __name__ == "__main__":
+    main()
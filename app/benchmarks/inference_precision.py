@@ -0,0 +1,85 @@
+"""
+Inference throughput of a trained model in fp32 eager, bf16 autocast, torch.compile
+and bf16 + torch.compile.
+
+Every variant loads the model folder through `DocumentClassifier` (so compile time
+and warmup are part of the reported load time) and classifies the same synthetic
+documents with `predict_batch`. The machine probe from `app.core.precision` is
+saved alongside, to see which variant `"auto"` would pick on this machine.
+
+Usage:
+    python -m app.benchmarks.inference_precision --model deepset_gbert-base --docs 256 --output results/inference_precision.json
+"""
+import argparse
+import json
+import time
+
+from pathlib import Path
+
+import yaml
+
+from app.core.paths import PROJECT_ROOT
+from app.core.precision import RuntimeConfig
+
+VARIANTS = {
+    "fp32_eager": RuntimeConfig(),
+    "bf16_eager": RuntimeConfig(bf16=True),
+    "fp32_compile": RuntimeConfig(compile=True),
+    "bf16_compile": RuntimeConfig(bf16=True, compile=True),
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark bf16 autocast and torch.compile for inference.")
+    parser.add_argument("--model", required=True, help="Model folder under models/.")
+    parser.add_argument("--docs", type=int, default=256, help="Synthetic documents to classify per variant.")
+    parser.add_argument("--batch-size", type=int, default=16, help="predict_batch batch size.")
+    parser.add_argument("--variants", nargs="+", choices=list(VARIANTS), default=list(VARIANTS))
+    parser.add_argument("--output", default=None, help="Write the results to this JSON file.")
+    args = parser.parse_args()
+
+    from app.sampler.stream import iter_synthetic_batches
+    from app.services.predict import DocumentClassifier
+
+    with open(PROJECT_ROOT / "config.yaml", "r") as f:
+        config = yaml.safe_load(f)
+    label_map = config["label_map"]
+    per_category = max(1, args.docs // (2 * len(label_map)) + 1)
+    texts = []
+    for batch in iter_synthetic_batches({"v0": per_category, "v1": per_category}, label_map, seed=42):
+        texts.extend(batch.column("text").to_pylist())
+    texts = texts[:args.docs]
+
+    results = {}
+    for name in args.variants:
+        start = time.perf_counter()
+        classifier = DocumentClassifier(str(PROJECT_ROOT / "models" / args.model), runtime_config=VARIANTS[name])
+        load_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        predictions = classifier.predict_batch(texts, batch_size=args.batch_size)
+        seconds = time.perf_counter() - start
+        results[name] = {
+            "runtime": classifier.runtime,
+            "load_seconds": load_seconds,
+            "docs_per_second": len(texts) / seconds,
+            "labels": [p["label"] for p in predictions],
+        }
+        print(f"   {name:13s} load {load_seconds:6.2f}s  {results[name]['docs_per_second']:8.2f} docs/s")
+
+    # Agreement with fp32 eager shows whether bf16 changes any predictions
+    labels = {name: result.pop("labels") for name, result in results.items()}
+    if "fp32_eager" in labels:
+        for name, result in results.items():
+            same = sum(a == b for a, b in zip(labels[name], labels["fp32_eager"]))
+            result["agreement_with_fp32"] = same / max(len(texts), 1)
+
+    if args.output:
+        output = Path(args.output)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(results, indent=4))
+        print(f"💾 Saved: {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+OCR time and character accuracy with and without image preprocessing.
+
+Every image (and every page of every PDF) in a folder is OCR'd twice: once as
+today (plain grayscale render/RGB image) and once through the preprocessing
+stage of `app.core.ocr`. If a ground-truth transcript `<name>.gt.txt` exists
+next to a scan, the character accuracy (1 - CER) of both paths is reported.
+
+Usage:
+    python -m app.benchmarks.ocr_preprocessing samples/scans --psm 6 --output results/ocr_preprocessing.json
+"""
+import argparse
+import json
+import time
+
+from dataclasses import replace
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+from app.core.ocr import OCRConfig, ocr_image
+from app.core.utils import load_pil_image_module, ocr_dpi_for_page, render_page_for_ocr
+
+IMAGE_SUFFIXES = {".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp", ".webp", ".heic", ".heif"}
+
+
+def iter_scans(folder: Path) -> Iterator[Tuple[Path, List[Tuple[object, Optional[float]]]]]:
+    """Yield (file, [(PIL image, dpi), ...]) for every image or PDF below `folder`."""
+    import fitz  # PyMuPDF
+
+    Image = load_pil_image_module()
+    for path in sorted(folder.rglob("*")):
+        suffix = path.suffix.lower()
+        if suffix == ".pdf":
+            with fitz.open(path) as doc:
+                yield path, [(render_page_for_ocr(page), ocr_dpi_for_page(page)) for page in doc]
+        elif suffix in IMAGE_SUFFIXES:
+            img = Image.open(path)
+            img.load()
+            yield path, [(img, None)]
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.split())
+
+
+def character_accuracy(prediction: str, reference: str) -> float:
+    """1 - character error rate (Levenshtein distance / reference length), whitespace-normalized."""
+    prediction, reference = _normalize(prediction), _normalize(reference)
+    if not reference:
+        return 1.0 if not prediction else 0.0
+    previous = list(range(len(prediction) + 1))
+    for i, ref_char in enumerate(reference, 1):
+        current = [i]
+        for j, pred_char in enumerate(prediction, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ref_char != pred_char),
+            ))
+        previous = current
+    return max(0.0, 1.0 - previous[-1] / len(reference))
+
+
+def run_path(pages, config: OCRConfig) -> Tuple[str, float]:
+    start = time.perf_counter()
+    text = "\n".join(ocr_image(img, config, source_dpi=dpi) for img, dpi in pages)
+    return text, time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark OCR image preprocessing.")
+    parser.add_argument("scan_dir", help="Folder with scanned images/PDFs and optional <name>.gt.txt transcripts.")
+    parser.add_argument("--psm", type=int, default=3, help="Tesseract page segmentation mode.")
+    parser.add_argument("--oem", type=int, default=3, help="Tesseract OCR engine mode.")
+    parser.add_argument("--target-dpi", type=int, default=300, help="Downscale target for preprocessing.")
+    parser.add_argument("--output", default=None, help="Write per-file results to this JSON file.")
+    args = parser.parse_args()
+
+    baseline = OCRConfig(psm=args.psm, oem=args.oem, preprocess=False)
+    preprocessed = replace(baseline, preprocess=True, target_dpi=args.target_dpi)
+
+    rows = []
+    for path, pages in iter_scans(Path(args.scan_dir)):
+        gt_path = path.with_suffix(".gt.txt")
+        reference = gt_path.read_text(encoding="utf-8") if gt_path.exists() else None
+        row = {"file": str(path), "pages": len(pages)}
+        for name, config in (("baseline", baseline), ("preprocessed", preprocessed)):
+            text, seconds = run_path(pages, config)
+            row[f"{name}_seconds"] = seconds
+            row[f"{name}_accuracy"] = character_accuracy(text, reference) if reference is not None else None
+        rows.append(row)
+        print(f"   {path.name:40s} {row['baseline_seconds']:7.2f}s -> {row['preprocessed_seconds']:7.2f}s")
+
+    if not rows:
+        print("No scans found.")
+        return
+
+    print(f"\n⏱️  {len(rows)} files, {sum(r['pages'] for r in rows)} pages")
+    for name in ("baseline", "preprocessed"):
+        total = sum(r[f"{name}_seconds"] for r in rows)
+        scored = [r[f"{name}_accuracy"] for r in rows if r[f"{name}_accuracy"] is not None]
+        accuracy = f"{sum(scored) / len(scored):.2%} char accuracy ({len(scored)} with ground truth)" if scored else "no ground truth"
+        print(f"   {name:13s} total={total:8.2f}s  {accuracy}")
+
+    if args.output:
+        output = Path(args.output)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(rows, indent=4))
+        print(f"💾 Saved: {output}")
+
+
+if __name__ == "__main__":
+    main()
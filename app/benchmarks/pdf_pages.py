@@ -0,0 +1,46 @@
+"""
+Per-page PDF extraction timings.
+
+Runs `extract_pdf` over every PDF in a folder and prints the per-stage timings
+(text layer, page render, OCR) and page routes collected by `app.core.metrics`.
+
+Usage:
+    python -m app.benchmarks.pdf_pages app/data/raw/contracts --output results/pdf_pages.json
+"""
+import argparse
+import time
+
+from pathlib import Path
+
+from app.core.metrics import PDF_PAGES_TOTAL, REGISTRY, STAGE_SECONDS
+from app.core.utils import extract_pdf
+
+PAGE_STAGES = ("pdf_page_text", "pdf_page_render", "ocr", "pdf_extraction")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark per-page PDF extraction.")
+    parser.add_argument("pdf_dir", help="Folder with PDF files (searched recursively).")
+    parser.add_argument("--output", default=None, help="Write the metrics snapshot to this JSON file.")
+    args = parser.parse_args()
+
+    pdfs = sorted(Path(args.pdf_dir).rglob("*.pdf"))
+    start = time.perf_counter()
+    for pdf in pdfs:
+        extract_pdf(str(pdf))
+    elapsed = time.perf_counter() - start
+
+    print(f"⏱️  {len(pdfs)} PDFs in {elapsed:.2f}s")
+    stages = STAGE_SECONDS.snapshot()
+    for stage in PAGE_STAGES:
+        if stage in stages:
+            s = stages[stage]
+            print(f"   {stage:16s} n={int(s['count']):6d}  mean={s['mean_seconds'] * 1000:9.2f} ms  total={s['sum_seconds']:8.2f}s")
+    print(f"   page routes: {PDF_PAGES_TOTAL.snapshot()}")
+
+    if args.output:
+        print(f"💾 Saved: {REGISTRY.write(args.output, fmt='json')}")
+
+
+if __name__ == "__main__":
+    main()
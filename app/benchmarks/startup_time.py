@@ -0,0 +1,103 @@
+"""
+Startup-time benchmark for the inference service.
+
+Tracks two numbers that matter on autoscaled pods:
+1. Cold import time of `app.api.api` (fresh interpreter per run).
+2. First-inference latency: model load + first `predict` vs. a warm `predict`.
+
+Usage:
+    python -m app.benchmarks.startup_time --runs 5 --model deepset_gbert-base
+    python -m app.benchmarks.startup_time --output results/startup_benchmark.jsonl
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+from datetime import datetime
+from pathlib import Path
+
+from app.core.paths import PROJECT_ROOT
+
+SAMPLE_TEXT = "Rechnung Nr. 1042. Bitte überweisen Sie den Gesamtbetrag von 1.190,00 EUR bis zum 30.11."
+
+
+def measure_import_time(module: str, runs: int) -> list[float]:
+    """Import `module` in a fresh interpreter `runs` times and return wall times in seconds."""
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    timings = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=PROJECT_ROOT, capture_output=True, text=True, check=True,
+        )
+        timings.append(float(out.stdout.strip().splitlines()[-1]))
+    return timings
+
+
+def measure_first_inference(model_name: str) -> dict:
+    """Load a model in-process and time the first and a warm prediction."""
+    from app.services.predict import DocumentClassifier
+
+    model_path = PROJECT_ROOT / "models" / model_name
+
+    start = time.perf_counter()
+    classifier = DocumentClassifier(str(model_path))
+    load_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    classifier.predict(SAMPLE_TEXT)
+    first_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    classifier.predict(SAMPLE_TEXT)
+    warm_seconds = time.perf_counter() - start
+
+    return {
+        "model": model_name,
+        "model_load_seconds": load_seconds,
+        "first_predict_seconds": first_seconds,
+        "warm_predict_seconds": warm_seconds,
+        "time_to_first_prediction_seconds": load_seconds + first_seconds,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark API import and first-inference latency.")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh-interpreter import runs.")
+    parser.add_argument("--module", default="app.api.api", help="Module whose import time is measured.")
+    parser.add_argument("--model", default=None, help="Model folder under models/ for the inference benchmark.")
+    parser.add_argument("--output", default=None, help="Append the result as one JSON line to this file.")
+    args = parser.parse_args()
+
+    timings = measure_import_time(args.module, args.runs)
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "import": {
+            "module": args.module,
+            "runs": args.runs,
+            "median_seconds": statistics.median(timings),
+            "min_seconds": min(timings),
+            "max_seconds": max(timings),
+        },
+    }
+    print(f"⏱️  import {args.module}: median {report['import']['median_seconds']:.3f}s over {args.runs} runs")
+
+    if args.model:
+        report["inference"] = measure_first_inference(args.model)
+        inf = report["inference"]
+        print(f"⏱️  model load: {inf['model_load_seconds']:.3f}s | first predict: {inf['first_predict_seconds']:.3f}s"
+              f" | warm predict: {inf['warm_predict_seconds']:.3f}s")
+
+    if args.output:
+        output_path = Path(args.output)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(output_path, "a") as f:
+            f.write(json.dumps(report) + "\n")
+        print(f"💾 Appended result to {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,373 @@
+# autotune.py
+"""
+Batch size, gradient accumulation and gradient checkpointing, measured instead of guessed.
+
+A few optimizer steps on random full-length inputs are timed at doubling batch
+sizes, first without and then with gradient checkpointing, while peak memory is
+tracked. The fastest configuration within the memory budget wins, and gradient
+accumulation makes up the rest of the target effective batch size. Trials are
+cached per (model, device, max_length) in models/autotune_cache.json, so the
+search runs once per machine; delete the file to measure again.
+"""
+import gc
+import json
+import math
+import os
+import platform
+import sys
+import threading
+import time
+
+from contextlib import nullcontext
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.core.paths import AUTOTUNE_CACHE
+
+BATCH_SIZES = (1, 2, 4, 8, 16, 32, 64)
+TRIAL_STEPS = 3
+MEMORY_FRACTION = 0.8  # of the device memory (CPU: this process + RAM available at start)
+SLOWER_THAN_BEST = 0.9  # stop growing the batch once throughput drops below 90% of the best so far
+CUDA_RESERVE = 512 * 2**20  # cuBLAS/cuDNN workspaces and fragmentation, not seen by the allocator peak
+
+
+# -----------------------
+# Memory
+# -----------------------
+
+def _proc_value(path: str, prefix: str) -> Optional[str]:
+    try:
+        with open(path) as f:
+            for line in f:
+                if line.startswith(prefix):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return None
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # Not Linux: the process peak (KB on Linux, bytes on macOS) is the best cheap estimate
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _available_ram_bytes() -> int:
+    available = _proc_value("/proc/meminfo", "MemAvailable")
+    if available is not None:
+        return int(available.split()[0]) * 1024
+    return os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") - _rss_bytes()
+
+
+def memory_budget(device, fraction: float = MEMORY_FRACTION) -> int:
+    """Bytes the training process may use on `device`."""
+    import torch
+
+    if device.type == "cuda":
+        # Free memory (other processes may share the GPU) plus what this process already holds
+        free, _ = torch.cuda.mem_get_info(device)
+        return int(max(free + torch.cuda.memory_reserved(device) - CUDA_RESERVE, 0) * fraction)
+    if device.type == "mps" and hasattr(torch.mps, "recommended_max_memory"):
+        return int(torch.mps.recommended_max_memory() * fraction)
+    return int((_rss_bytes() + _available_ram_bytes()) * fraction)
+
+
+class PeakMemory:
+    """Peak memory while the block runs: the CUDA allocator peak, else sampled every 5ms."""
+
+    def __init__(self, device) -> None:
+        self.device = device
+        self.peak = 0
+        self._stop = threading.Event()
+        self._sampler = None
+
+    def current(self) -> int:
+        import torch
+
+        if self.device.type == "cuda":
+            return torch.cuda.memory_allocated(self.device)
+        if self.device.type == "mps":
+            return torch.mps.driver_allocated_memory()
+        return _rss_bytes()
+
+    def _sample(self) -> None:
+        while not self._stop.wait(0.005):
+            self.peak = max(self.peak, self.current())
+
+    def __enter__(self) -> "PeakMemory":
+        import torch
+
+        if self.device.type == "cuda":
+            torch.cuda.reset_peak_memory_stats(self.device)
+        else:
+            self.peak = self.current()
+            self._sampler = threading.Thread(target=self._sample, daemon=True)
+            self._sampler.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        import torch
+
+        if self.device.type == "cuda":
+            self.peak = torch.cuda.max_memory_allocated(self.device)
+        else:
+            self._stop.set()
+            self._sampler.join()
+            self.peak = max(self.peak, self.current())
+
+
+def _synchronize(device) -> None:
+    import torch
+
+    if device.type == "cuda":
+        torch.cuda.synchronize(device)
+    elif device.type == "mps":
+        torch.mps.synchronize()
+
+
+def _release(device) -> None:
+    import torch
+
+    gc.collect()
+    if device.type == "cuda":
+        torch.cuda.empty_cache()
+    elif device.type == "mps":
+        torch.mps.empty_cache()
+
+
+# -----------------------
+# Trials
+# -----------------------
+
+def device_name(device) -> str:
+    """Cache key part: the GPU model, or the CPU model and thread count."""
+    import torch
+
+    if device.type == "cuda":
+        return f"cuda:{torch.cuda.get_device_name(device)}"
+    if device.type == "cpu":
+        cpu = _proc_value("/proc/cpuinfo", "model name") or platform.processor() or platform.machine()
+        return f"cpu:{cpu}:{torch.get_num_threads()}threads"
+    return device.type
+
+
+def _timed_steps(model, batch_size: int, max_length: int, device, steps: int, dtype) -> Tuple[float, int]:
+    """(seconds for `steps` optimizer steps after one warmup step, peak memory in bytes)."""
+    import torch
+
+    input_ids = torch.randint(1, model.config.vocab_size, (batch_size, max_length), device=device)
+    batch = {
+        "input_ids": input_ids,
+        "attention_mask": torch.ones_like(input_ids),
+        "labels": torch.randint(0, model.config.num_labels, (batch_size,), device=device),
+    }
+    optimizer = torch.optim.AdamW([p for p in model.parameters() if p.requires_grad], lr=1e-5)
+
+    def step() -> None:
+        with torch.autocast(device_type=device.type, dtype=dtype) if dtype else nullcontext():
+            loss = model(**batch).loss
+        loss.backward()
+        optimizer.step()
+        optimizer.zero_grad(set_to_none=True)
+
+    with PeakMemory(device) as memory:
+        step()  # allocates the optimizer state
+        _synchronize(device)
+        start = time.perf_counter()
+        for _ in range(steps):
+            step()
+        _synchronize(device)
+        seconds = time.perf_counter() - start
+    return seconds, memory.peak
+
+
+def run_trial(model, batch_size: int, gradient_checkpointing: bool, max_length: int, device,
+              steps: int = TRIAL_STEPS, mixed_precision: Optional[str] = None) -> Dict[str, Any]:
+    """Time `steps` optimizer steps (after one warmup step) on random full-length inputs."""
+    import torch
+
+    if gradient_checkpointing:
+        model.gradient_checkpointing_enable()
+    else:
+        model.gradient_checkpointing_disable()
+    model.train()
+    dtype = {"bf16": torch.bfloat16, "fp16": torch.float16}.get(mixed_precision)
+
+    result = {"batch_size": batch_size, "gradient_checkpointing": gradient_checkpointing, "measured": True}
+    try:
+        seconds, peak = _timed_steps(model, batch_size, max_length, device, steps, dtype)
+        result.update(samples_per_second=batch_size * steps / seconds, peak_memory_mb=peak / 2**20)
+    except RuntimeError as e:
+        # torch.cuda.OutOfMemoryError and the MPS allocator errors are RuntimeErrors
+        if "out of memory" not in str(e).lower():
+            raise
+        result.update(fits=False, reason="out of memory")
+    finally:
+        # An OOM inside backward() leaves .grad tensors behind that would inflate later trials
+        model.zero_grad(set_to_none=True)
+    # Batch and optimizer state went out of scope with _timed_steps (and the exception)
+    _release(device)
+    return result
+
+
+def _search(model, batch_sizes: Sequence[int], gradient_checkpointing: bool, max_length: int, device,
+            budget: int, baseline: int, steps: int, mixed_precision: Optional[str],
+            best: float = 0.0) -> List[Dict[str, Any]]:
+    """Trials at increasing batch sizes until memory runs out or larger batches stop paying off."""
+    trials, last, stop = [], None, None
+    for batch_size in sorted(batch_sizes):
+        skip = {"batch_size": batch_size, "gradient_checkpointing": gradient_checkpointing, "measured": False}
+        if stop is not None:
+            trials.append({**skip, **stop})
+            continue
+        if last is not None and not last["fits"]:
+            stop = {"fits": False, "reason": "smaller batch did not fit"}
+            trials.append({**skip, **stop})
+            continue
+        if last is not None:
+            # Activations grow linearly with the batch; skip trials that would exceed RAM (no OOM
+            # error on CPU, the kernel just kills the process)
+            predicted = baseline + (last["peak_memory_mb"] * 2**20 - baseline) * batch_size / last["batch_size"]
+            if predicted > budget:
+                trials.append({**skip, "fits": False, "reason": f"predicted peak {predicted / 2**20:.0f}MB"})
+                stop = {"fits": False, "reason": "smaller batch did not fit"}
+                continue
+            if last["samples_per_second"] < SLOWER_THAN_BEST * best:
+                stop = {"fits": None, "reason": "throughput stopped improving"}
+                trials.append({**skip, **stop})
+                continue
+
+        trial = run_trial(model, batch_size, gradient_checkpointing, max_length, device, steps, mixed_precision)
+        if "fits" not in trial:
+            trial["fits"] = trial["peak_memory_mb"] * 2**20 <= budget
+            if trial["fits"]:
+                best = max(best, trial["samples_per_second"])
+        status = (f"{trial['samples_per_second']:7.2f} samples/s, peak {trial['peak_memory_mb']:7.0f}MB"
+                  if "peak_memory_mb" in trial else trial["reason"])
+        print(f"   batch {batch_size:3d}, checkpointing {'on ' if gradient_checkpointing else 'off'}: "
+              f"{status}{'' if trial['fits'] else ' (too large)'}")
+        trials.append(trial)
+        last = trial
+    return trials
+
+
+def _trial_model(model_name: str, num_labels: int, device, lora: Optional[Dict]):
+    from transformers import AutoModelForSequenceClassification
+
+    model = AutoModelForSequenceClassification.from_pretrained(
+        model_name, num_labels=num_labels, ignore_mismatched_sizes=True
+    ).to(device)
+    if lora is not None:
+        from app.core.lora import LoRAConfig, add_lora_adapter
+
+        model = add_lora_adapter(model, LoRAConfig.from_dict(lora), gradient_checkpointing=True)
+    return model
+
+
+# -----------------------
+# Cache + selection
+# -----------------------
+
+def _load_cache(path: Path) -> Dict[str, Any]:
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(path: Path, cache: Dict[str, Any]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    tmp_path.write_text(json.dumps(cache, indent=4))
+    os.replace(tmp_path, path)
+
+
+def pick_config(trials: List[Dict[str, Any]], target_batch_size: int,
+                batch_sizes: Optional[Sequence[int]] = None) -> Optional[Dict[str, Any]]:
+    """Fastest trial that fits (optionally among `batch_sizes`), with the accumulation to reach the target."""
+    fits = [t for t in trials if t["measured"] and t["fits"]
+            and (batch_sizes is None or t["batch_size"] in batch_sizes)]
+    if not fits:
+        return None
+    best = max(fits, key=lambda t: t["samples_per_second"])
+    return {
+        "train_batch_size": best["batch_size"],
+        "gradient_accumulation_steps": max(1, math.ceil(target_batch_size / best["batch_size"])),
+        "gradient_checkpointing": best["gradient_checkpointing"],
+        "samples_per_second": best["samples_per_second"],
+        "peak_memory_mb": best["peak_memory_mb"],
+    }
+
+
+def find_batch_config(
+    model_name: str,
+    num_labels: int,
+    device,
+    max_length: int = 512,
+    target_batch_size: int = 8,
+    batch_sizes: Optional[Sequence[int]] = None,
+    mixed_precision: Optional[str] = None,
+    lora: Optional[Dict] = None,
+    steps: int = TRIAL_STEPS,
+    memory_fraction: float = MEMORY_FRACTION,
+    cache_path: Path = AUTOTUNE_CACHE,
+    measure: bool = True,
+) -> Optional[Dict[str, Any]]:
+    """
+    Fastest fitting (batch size, gradient checkpointing) for training `model_name` on `device`,
+    plus the gradient accumulation that reaches `target_batch_size`. `batch_sizes` restricts the
+    candidates (default: powers of two up to the target). Missing trials are measured on a
+    separate copy of the model and cached; with `measure=False` only the cache is used.
+    Returns None if nothing fits or nothing is cached.
+    """
+    candidates = sorted(batch_sizes or [b for b in BATCH_SIZES if b <= target_batch_size])
+    options = [name for name, on in (("lora", lora is not None), (mixed_precision, mixed_precision)) if on]
+    key = "|".join([model_name, device_name(device), str(max_length), *options])
+
+    cache = _load_cache(cache_path)
+    trials = cache.get(key, {}).get("trials", [])
+    done = {(t["batch_size"], t["gradient_checkpointing"]) for t in trials}
+
+    if measure and any((b, c) not in done for b in candidates for c in (False, True)):
+        print(f"📏 Measuring batch sizes {candidates} for {model_name} ({key.split('|', 1)[1]})")
+        model = _trial_model(model_name, num_labels, device, lora)
+        _release(device)
+        baseline = PeakMemory(device).current()
+        budget = memory_budget(device, memory_fraction)
+        missing = [b for b in candidates if (b, False) not in done]
+        trials += _search(model, missing, False, max_length, device, budget, baseline, steps, mixed_precision)
+
+        # Checkpointing trades ~30% speed for activation memory: only worth trying for batch
+        # sizes that ran out of memory without it
+        plain = {t["batch_size"]: t for t in trials if not t["gradient_checkpointing"]}
+        pending = [b for b in candidates if (b, True) not in done]
+        checkpointed = [b for b in pending if plain[b]["fits"] is False
+                        and getattr(model, "supports_gradient_checkpointing", True)]
+        trials += [{"batch_size": b, "gradient_checkpointing": True, "measured": False, "fits": None,
+                    "reason": "not needed without checkpointing"}
+                   for b in pending if b not in checkpointed]
+        best = max((t["samples_per_second"] for t in plain.values() if t["measured"] and t["fits"]), default=0.0)
+        trials += _search(model, checkpointed, True, max_length, device, budget, baseline, steps,
+                          mixed_precision, best=best)
+
+        del model
+        _release(device)
+        cache[key] = {"trials": trials, "budget_mb": budget / 2**20, "updated": datetime.now().isoformat()}
+        _save_cache(cache_path, cache)
+
+    choice = pick_config(trials, target_batch_size, candidates)
+    if choice is None:
+        print(f"[WARN] No measured batch size fits for {model_name}; using the defaults", file=sys.stderr)
+    else:
+        print(f"📐 Batch size {choice['train_batch_size']} x {choice['gradient_accumulation_steps']} accumulation, "
+              f"gradient checkpointing {'on' if choice['gradient_checkpointing'] else 'off'} "
+              f"({choice['samples_per_second']:.2f} samples/s)")
+        choice["cache_key"] = key
+    return choice
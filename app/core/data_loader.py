@@ -1,62 +1,348 @@
 # data_loader.py
+import csv
+import sys
 import torch
 
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as pa_ds
+from pyarrow import csv as pa_csv
 from pathlib import Path
 
 from sklearn.preprocessing import LabelEncoder
 from sklearn.model_selection import train_test_split
 from datasets import Dataset, DatasetDict
 from transformers import AutoTokenizer
-from typing import Optional, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
 from transformers import PreTrainedTokenizer
 
+from app.core.near_duplicates import cluster_near_duplicates, downsample_clusters, group_train_test_split
+from app.core.prepare_data import processed_parquet_files
+from app.core.sampling import min_count_classes, stratified_subset
 from app.core.utils import save_label_encoder
+from app.sampler.stream import iter_synthetic_batches
 
-def load_and_prepare_data(csv_path: str,
+# Arrow reads the CSV in blocks of this size; duplicates are dropped block by block
+CSV_BLOCK_SIZE = 64 * 1024 * 1024
+
+
+def _clean_batches(batches: Iterable[pa.RecordBatch]) -> Iterator[pa.RecordBatch]:
+    """
+    Drop rows with missing values and duplicate texts (first occurrence wins, compared
+    by 64-bit hash instead of the full string); keeps the `text`, `label` and (if present)
+    `template_id` columns.
+    """
+    seen = np.empty(0, dtype=np.uint64)
+    for batch in batches:
+        # CLEAN NANs
+        batch = batch.filter(pc.and_(pc.is_valid(batch.column("text")), pc.is_valid(batch.column("label"))))
+        if batch.num_rows == 0:
+            continue
+
+        # Prevent Data Leakage by removing duplicates (Parquet files carry the hash already)
+        if "text_hash" in batch.schema.names:
+            hashes = batch.column("text_hash").to_numpy().astype(np.uint64, copy=False)
+        else:
+            hashes = pd.util.hash_array(batch.column("text").to_numpy(zero_copy_only=False))
+        keep = np.zeros(len(hashes), dtype=bool)
+        keep[np.unique(hashes, return_index=True)[1]] = True
+        keep &= ~np.isin(hashes, seen)
+        seen = np.union1d(seen, hashes[keep])
+
+        mask = pa.array(keep)
+        names = ["text", "label"] + (["template_id"] if "template_id" in batch.schema.names else [])
+        yield pa.RecordBatch.from_arrays([batch.column(name).filter(mask) for name in names], names=names)
+
+
+def _table_from_batches(batches: Iterable[pa.RecordBatch]) -> pa.Table:
+    batches = list(batches)
+    if not batches:
+        return pa.table({"text": pa.array([], pa.string()), "label": pa.array([], pa.string())})
+    return pa.Table.from_batches(batches)
+
+
+def read_labeled_parquet(parquet_files: List[Path]) -> pa.Table:
+    """Read only the `text`, `label`, `text_hash` and `template_id` columns of the processed Parquet files."""
+    dataset = pa_ds.dataset([str(f) for f in parquet_files], format="parquet")
+    required_columns = {"text", "label"}
+    missing_columns = required_columns - set(dataset.schema.names)
+    if missing_columns:
+        raise ValueError(f"Missing required columns: {missing_columns}")
+    columns = ["text", "label"] + [c for c in ("text_hash", "template_id") if c in dataset.schema.names]
+    return _table_from_batches(_clean_batches(dataset.to_batches(columns=columns)))
+
+
+def read_labeled_csv(csv_path: Path, block_size: int = CSV_BLOCK_SIZE) -> pa.Table:
+    """Stream the `text` and `label` columns of a CSV with pyarrow."""
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        header = next(csv.reader(f), [])
+    required_columns = {"text", "label"}
+    missing_columns = required_columns - set(header)
+    if missing_columns:
+        raise ValueError(f"Missing required columns: {missing_columns}")
+
+    reader = pa_csv.open_csv(
+        csv_path,
+        read_options=pa_csv.ReadOptions(block_size=block_size),
+        parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=["text", "label"],
+            column_types={"text": pa.string(), "label": pa.string()},
+            strings_can_be_null=True,  # empty cells count as missing, like pd.read_csv
+        ),
+    )
+    return _table_from_batches(_clean_batches(reader))
+
+
+def load_and_prepare_data(data_path: str,
                           label_classes_output: Optional[str]=None,
                           validation_test_split_size: float = 0.3,
                           test_proportion_of_split: float = 0.5,
-                          random_state: int = 42
+                          random_state: int = 42,
+                          near_duplicate_split: bool = False,
+                          near_duplicate_threshold: float = 0.8,
+                          max_cluster_size: Optional[int] = None,
+                          template_split: Optional[str] = None,
+                          max_per_template: Optional[int] = None,
+                          train_subset: Optional[Union[int, float]] = None,
     ) -> Tuple[DatasetDict, LabelEncoder]:
-    csv_path = Path(csv_path)
-    if not csv_path.exists():
-        raise FileNotFoundError(f"CSV file not found: {csv_path}")
-    df = pd.read_csv(csv_path)
-    
-    required_columns = {"text", "label"}
-    missing_columns = required_columns - set(df.columns)
-    if missing_columns:
-        raise ValueError(f"Missing required columns: {missing_columns}")
-    
-    # CLEAN NANs
-    df = df[["text", "label"]].dropna()
+    """
+    `data_path`: the processed folder (Parquet files), a single Parquet file, or a CSV.
+    With `near_duplicate_split`, MinHash/LSH clusters of near-identical texts never straddle
+    two splits, and `max_cluster_size` caps how many members of a cluster are trained on.
+    `template_split` uses the template ids of synthetic documents: "stratify" keeps every
+    template's share equal across splits, "holdout" keeps each template inside one split.
+    `max_per_template` caps the training documents per template. `train_subset` (fraction or
+    count) trains on a stratified subset of the training split, e.g. for HPO trials.
+    """
+    data_path = Path(data_path)
+    if not data_path.exists():
+        raise FileNotFoundError(f"Data not found: {data_path}")
+
+    parquet_files = processed_parquet_files(data_path)
+    if parquet_files:
+        table = read_labeled_parquet(parquet_files)
+    else:
+        # Legacy layout: combined CSV
+        csv_path = data_path / "all_data.csv" if data_path.is_dir() else data_path
+        if not csv_path.exists():
+            raise FileNotFoundError(f"No Parquet files or all_data.csv found in {data_path}")
+        table = read_labeled_csv(csv_path)
+
+    return split_labeled_table(
+        table,
+        label_classes_output=label_classes_output,
+        validation_test_split_size=validation_test_split_size,
+        test_proportion_of_split=test_proportion_of_split,
+        random_state=random_state,
+        near_duplicate_split=near_duplicate_split,
+        near_duplicate_threshold=near_duplicate_threshold,
+        max_cluster_size=max_cluster_size,
+        template_split=template_split,
+        max_per_template=max_per_template,
+        train_subset=train_subset,
+    )
+
+
+def load_synthetic_data(per_generator: Dict[str, int],
+                        label_map: Dict[str, str],
+                        seed: int = 42,
+                        stratified: bool = False,
+                        label_classes_output: Optional[str] = None,
+                        **split_kwargs,
+    ) -> Tuple[DatasetDict, LabelEncoder]:
+    """
+    Same splits as `load_and_prepare_data`, but the documents come straight from the synthetic
+    generators (`per_generator`: {"v0": n, "v1": m} per category) without files on disk.
+    """
+    table = _table_from_batches(_clean_batches(iter_synthetic_batches(
+        per_generator, label_map, seed=seed, stratified=stratified
+    )))
+    print(f"🧪 Generated {table.num_rows} synthetic documents in memory")
+    return split_labeled_table(table, label_classes_output=label_classes_output, **split_kwargs)
+
+
+def _template_codes(table: pa.Table) -> Optional[np.ndarray]:
+    """Integer code per template id; rows without one (real documents) each get a code of their own."""
+    if "template_id" not in table.column_names or table.column("template_id").null_count == table.num_rows:
+        return None
+    codes, uniques = pd.factorize(table.column("template_id").to_numpy(zero_copy_only=False))
+    missing = codes < 0
+    codes[missing] = len(uniques) + np.arange(np.count_nonzero(missing))
+    return codes
+
+
+def _template_strata(rows: np.ndarray, label_ids: np.ndarray, templates: np.ndarray, test_size: float) -> np.ndarray:
+    """
+    Stratification key (label, template) per row. Templates with fewer than two documents, and
+    documents without a template, fall back to their label; if the (label, template) pairs do
+    not fit into the smaller split, only the label is used.
+    """
+    strata = label_ids[rows] * (templates.max() + 1) + templates[rows]
+    _, inverse, counts = np.unique(strata, return_inverse=True, return_counts=True)
+    # Labels are encoded as negative keys so they never collide with a (label, template) key
+    strata = np.where(counts[inverse] >= 2, strata, -1 - label_ids[rows])
+    # A lone fallback row joins a (label, template) stratum of its label
+    _, inverse, counts = np.unique(strata, return_inverse=True, return_counts=True)
+    for row in np.flatnonzero((strata < 0) & (counts[inverse] == 1)):
+        same_label = (label_ids[rows] == label_ids[rows][row]) & (strata >= 0)
+        if same_label.any():
+            strata[row] = strata[same_label][0]
+    smaller_split = min(test_size, 1 - test_size) * len(rows)
+    if len(np.unique(strata)) > smaller_split:
+        print("[WARN] Too many templates for a (label, template) stratified split; stratifying by label",
+              file=sys.stderr)
+        return label_ids[rows]
+    return strata
+
+
+def _row_split_one_sided_labels(val_idx: np.ndarray, test_idx: np.ndarray, label_ids: np.ndarray,
+                                test_size: float, classes: List[str], grouping: str,
+                                random_state: int = 42) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    After a group split (templates, near-duplicate clusters), a label whose groups all landed in
+    validation or all in test would be missing from the other split. Such labels are split
+    row by row instead, with a warning that their groups are shared between the two.
+    """
+    one_sided = np.setxor1d(np.unique(label_ids[val_idx]), np.unique(label_ids[test_idx]))
+    if not len(one_sided):
+        return val_idx, test_idx
+    rng = np.random.default_rng(random_state)
+    temp = np.concatenate([val_idx, test_idx])
+    val_parts = [val_idx[~np.isin(label_ids[val_idx], one_sided)]]
+    test_parts = [test_idx[~np.isin(label_ids[test_idx], one_sided)]]
+    for label in one_sided:
+        rows = temp[label_ids[temp] == label]
+        rows = rows[rng.permutation(len(rows))]
+        n_test = min(max(int(round(len(rows) * test_size)), 1), len(rows) - 1) if len(rows) > 1 else 0
+        test_parts.append(rows[:n_test])
+        val_parts.append(rows[n_test:])
+    print(f"[WARN] {grouping} split: too few {grouping}s of {[classes[i] for i in one_sided]} for both "
+          f"validation and test; these labels are split by rows", file=sys.stderr)
+    return np.sort(np.concatenate(val_parts)), np.sort(np.concatenate(test_parts))
 
-    # Prevent Data Leakage by removing duplicates
-    df = df.drop_duplicates(subset=["text"])
+
+def _warn_missing_labels(splits: Dict[str, np.ndarray], rows: np.ndarray, label_ids: np.ndarray,
+                         classes: List[str]) -> None:
+    for name, idx in splits.items():
+        missing = np.setdiff1d(np.unique(label_ids[rows]), np.unique(label_ids[idx]))
+        if len(missing):
+            print(f"[WARN] No {name} documents for {[classes[i] for i in missing]}; "
+                  f"their {name} metrics are not meaningful", file=sys.stderr)
+
+
+def split_labeled_table(table: pa.Table,
+                        label_classes_output: Optional[str] = None,
+                        validation_test_split_size: float = 0.3,
+                        test_proportion_of_split: float = 0.5,
+                        random_state: int = 42,
+                        near_duplicate_split: bool = False,
+                        near_duplicate_threshold: float = 0.8,
+                        max_cluster_size: Optional[int] = None,
+                        template_split: Optional[str] = None,
+                        max_per_template: Optional[int] = None,
+                        train_subset: Optional[Union[int, float]] = None,
+    ) -> Tuple[DatasetDict, LabelEncoder]:
+    """Encode the labels of a cleaned (text, label) table and split it into train/validation/test."""
+    if template_split not in (None, "stratify", "holdout"):
+        raise ValueError(f"Unknown template_split: {template_split!r} (use 'stratify' or 'holdout')")
+    if template_split and near_duplicate_split:
+        raise ValueError("template_split and near_duplicate_split cannot be combined")
 
     # Prevent crash in train_test_split if a class has only 1 item
-    df = df.groupby('label').filter(lambda x: len(x) >= 3)
+    encoded = pc.dictionary_encode(table.column("label")).combine_chunks()
+    codes = pc.fill_null(encoded.indices, -1).to_numpy(zero_copy_only=False)
+    values = np.array(encoded.dictionary.to_pylist(), dtype=object)
+    classes = sorted(values[min_count_classes(codes, 3)])
 
     label_encoder = LabelEncoder()
-    df["label"] = label_encoder.fit_transform(df["label"])
+    label_encoder.classes_ = np.array(classes, dtype=object)
 
     # Only save label classes during training
     if label_classes_output is not None:
         save_label_encoder(label_encoder, label_classes_output)
 
-    train_df, temp_df = train_test_split(
-        df, test_size=validation_test_split_size, stratify=df["label"], random_state=random_state
-    )
-    val_df, test_df = train_test_split(
-        temp_df, test_size=test_proportion_of_split, stratify=temp_df["label"], random_state=random_state
-    )
+    # Map dictionary codes to sorted class ids (one entry per distinct label, the last one for
+    # missing labels); rows of dropped classes get -1 and are never selected
+    position = {label: i for i, label in enumerate(classes)}
+    class_ids = np.array([position.get(value, -1) for value in values] + [-1], dtype=np.int64)
+    label_ids = class_ids[codes]
+    table = table.set_column(table.schema.get_field_index("label"), "label", pa.array(label_ids))
+
+    # Split row indices, not copies of the data: each split is an index mapping over one table
+    rows = np.flatnonzero(label_ids >= 0)
+    templates = _template_codes(table)
+    if template_split and templates is None:
+        print("[WARN] No template ids in the data; template_split is ignored", file=sys.stderr)
+        template_split = None
+
+    if template_split == "holdout":
+        train_idx, temp_idx = group_train_test_split(
+            rows, label_ids, templates, validation_test_split_size, random_state=random_state
+        )
+        val_idx, test_idx = group_train_test_split(
+            temp_idx, label_ids, templates, test_proportion_of_split, random_state=random_state
+        )
+        val_idx, test_idx = _row_split_one_sided_labels(
+            val_idx, test_idx, label_ids, test_proportion_of_split, classes, "template", random_state
+        )
+    elif template_split == "stratify":
+        train_idx, temp_idx = train_test_split(
+            rows, test_size=validation_test_split_size,
+            stratify=_template_strata(rows, label_ids, templates, validation_test_split_size),
+            random_state=random_state,
+        )
+        val_idx, test_idx = train_test_split(
+            temp_idx, test_size=test_proportion_of_split,
+            stratify=_template_strata(temp_idx, label_ids, templates, test_proportion_of_split),
+            random_state=random_state,
+        )
+    elif near_duplicate_split:
+        # Texts are converted to Python strings one Arrow chunk at a time
+        texts = (text for chunk in table.column("text").chunks for text in chunk.to_pylist())
+        groups = cluster_near_duplicates(texts, threshold=near_duplicate_threshold, seed=random_state)
+        train_idx, temp_idx = group_train_test_split(
+            rows, label_ids, groups, validation_test_split_size, random_state=random_state
+        )
+        val_idx, test_idx = group_train_test_split(
+            temp_idx, label_ids, groups, test_proportion_of_split, random_state=random_state
+        )
+        val_idx, test_idx = _row_split_one_sided_labels(
+            val_idx, test_idx, label_ids, test_proportion_of_split, classes, "cluster", random_state
+        )
+        n_train = len(train_idx)
+        train_idx = downsample_clusters(train_idx, groups, max_cluster_size, random_state=random_state)
+        print(f"🔁 Near-duplicates: {len(rows)} documents in {len(np.unique(groups[rows]))} clusters; "
+              f"training on {len(train_idx)}/{n_train} after down-sampling")
+    else:
+        train_idx, temp_idx = train_test_split(
+            rows, test_size=validation_test_split_size, stratify=label_ids[rows], random_state=random_state
+        )
+        val_idx, test_idx = train_test_split(
+            temp_idx, test_size=test_proportion_of_split, stratify=label_ids[temp_idx], random_state=random_state
+        )
+
+    _warn_missing_labels({"train": train_idx, "validation": val_idx, "test": test_idx}, rows, label_ids, classes)
+
+    if templates is not None and (template_split or max_per_template):
+        n_train = len(train_idx)
+        train_idx = downsample_clusters(train_idx, templates, max_per_template, random_state=random_state)
+        print(f"🧩 Templates ({template_split or 'random split'}): training on {len(train_idx)}/{n_train} documents"
+              f" after capping at {max_per_template} per template" if max_per_template else
+              f"🧩 Templates ({template_split}): {len(train_idx)} training documents")
+
+    if train_subset:
+        n_train = len(train_idx)
+        train_idx = train_idx[stratified_subset(label_ids[train_idx], train_subset, random_state=random_state)]
+        print(f"✂️  Training on a stratified subset of {len(train_idx)}/{n_train} documents")
 
+    full = Dataset(table)
     dataset = DatasetDict({
-        "train": Dataset.from_dict(train_df.to_dict("list")),
-        "validation": Dataset.from_dict(val_df.to_dict("list")),
-        "test": Dataset.from_dict(test_df.to_dict("list"))
+        "train": full.select(train_idx),
+        "validation": full.select(val_idx),
+        "test": full.select(test_idx)
     })
 
     return dataset, label_encoder
@@ -0,0 +1,109 @@
+# ddp.py
+"""
+Multi-process data-parallel training on CPU-only machines.
+
+A single training process only scales through intra-op threads, which flattens
+out early for BERT-sized models. Here N processes are spawned with the gloo
+backend; each one gets its own slice of the available cores (CPU affinity plus
+`torch.set_num_threads`) so the processes do not fight over the same cores.
+The regular `Trainer` picks the process group up from the environment.
+"""
+import os
+import signal
+import socket
+
+from typing import Any, Callable, Dict, List
+
+import torch
+import torch.multiprocessing as mp
+
+
+def available_cores() -> List[int]:
+    """Cores this process may run on (respects taskset/cgroup limits where the OS exposes them)."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def core_slices(n_procs: int, cores: List[int] = None) -> List[List[int]]:
+    """Split the cores into `n_procs` contiguous, (almost) equal slices."""
+    cores = cores if cores is not None else available_cores()
+    if n_procs > len(cores):
+        raise ValueError(f"Cannot run {n_procs} processes on {len(cores)} cores")
+    size, extra = divmod(len(cores), n_procs)
+    slices, start = [], 0
+    for rank in range(n_procs):
+        stop = start + size + (rank < extra)
+        slices.append(cores[start:stop])
+        start = stop
+    return slices
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _worker(rank: int, world_size: int, slices: List[List[int]], port: int,
+            fn: Callable[..., Any], kwargs: Dict[str, Any], results) -> None:
+    cores = slices[rank]
+    os.environ.update({
+        "MASTER_ADDR": "127.0.0.1",
+        "MASTER_PORT": str(port),
+        "RANK": str(rank),
+        "LOCAL_RANK": str(rank),
+        "WORLD_SIZE": str(world_size),
+        "OMP_NUM_THREADS": str(len(cores)),
+    })
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    torch.set_num_threads(len(cores))
+
+    try:
+        result = fn(**kwargs)
+    except Exception as e:
+        # Hand the original exception (e.g. TrainingPreempted) to the launcher
+        if rank == 0:
+            results.put(e)
+        raise
+    if rank == 0:
+        results.put(result)
+
+
+def launch_cpu_ddp(fn: Callable[..., Any], n_procs: int, **kwargs) -> Any:
+    """
+    Run `fn(**kwargs)` in `n_procs` pinned processes (gloo process group over localhost)
+    and return the result of rank 0; an exception raised on rank 0 is re-raised here.
+    `fn` must be importable (module level) for spawning. SIGTERM is forwarded to the workers.
+    """
+    slices = core_slices(n_procs)
+    print(f"🧵 CPU DDP: {n_procs} processes x {[len(s) for s in slices]} cores (gloo)")
+    results = mp.get_context("spawn").SimpleQueue()
+    processes = mp.start_processes(
+        _worker,
+        args=(n_procs, slices, _free_port(), fn, kwargs, results),
+        nprocs=n_procs,
+        join=False,
+        start_method="spawn",
+    )
+
+    def forward(signum, frame):
+        for process in processes.processes:
+            if process.is_alive():
+                os.kill(process.pid, signum)
+
+    previous = signal.signal(signal.SIGTERM, forward)
+    try:
+        while not processes.join():
+            pass
+    except mp.ProcessRaisedException:
+        if results.empty():
+            raise
+    finally:
+        signal.signal(signal.SIGTERM, previous)
+
+    result = results.get()
+    if isinstance(result, Exception):
+        raise result
+    return result
@@ -13,9 +13,9 @@ from typing import Dict, Optional
 from transformers import AutoTokenizer
 from torch.utils.data import DataLoader
 from sklearn.metrics import precision_recall_fscore_support
-from transformers import AutoModelForSequenceClassification
 
 from app.core.data_loader import load_and_prepare_data, tokenize_dataset
+from app.core.lora import load_classifier
 
 # Device detection
 device = (
@@ -38,8 +38,8 @@ def evaluate_model(
     dataset, _ = tokenize_dataset(dataset, tokenizer_name=str(model_path))
     dataset.set_format(type="torch", columns=["input_ids", "attention_mask", "label"])
 
-    # 3. Load model and set device
-    model = AutoModelForSequenceClassification.from_pretrained(model_path)
+    # 3. Load model (or LoRA adapter on its base model) and set device
+    model = load_classifier(str(model_path))
     model.to(device)
     model.eval()
 
@@ -0,0 +1,151 @@
+# filetype.py
+"""
+File type detection from magic bytes instead of the filename.
+
+Only the first few KB of a file are read. Supported types are matched against a
+small precompiled signature table; anything else is named via `puremagic` and
+rejected before any expensive parsing happens.
+"""
+import io
+import zipfile
+
+from functools import lru_cache
+from pathlib import Path
+from typing import BinaryIO, NamedTuple, Union
+
+HEAD_SIZE = 4096
+
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+
+class FileType(NamedTuple):
+    kind: str   # "pdf", "image", "docx" or "text" — selects the extractor
+    mime: str
+
+
+class UnsupportedFileTypeError(ValueError):
+    """Raised for files no extractor can handle (e.g. legacy .doc, archives, audio)."""
+
+    def __init__(self, mime: str, source: str = "") -> None:
+        self.mime = mime
+        super().__init__(f"Unsupported file type: {mime}" + (f" ({source})" if source else ""))
+
+
+# ---------------------------
+# SIGNATURE TABLE
+# (offset, magic bytes, kind, mime) — checked in order, built once at import
+# ---------------------------
+_SIGNATURES = (
+    (0, b"%PDF-", "pdf", "application/pdf"),
+    (0, b"\x89PNG\r\n\x1a\n", "image", "image/png"),
+    (0, b"\xff\xd8\xff", "image", "image/jpeg"),
+    (0, b"II*\x00", "image", "image/tiff"),
+    (0, b"MM\x00*", "image", "image/tiff"),
+    (0, b"BM", "image", "image/bmp"),
+    (0, b"GIF87a", "image", "image/gif"),
+    (0, b"GIF89a", "image", "image/gif"),
+    (8, b"WEBP", "image", "image/webp"),        # RIFF....WEBP
+    (0, b"PK\x03\x04", "zip", "application/zip"),  # refined to DOCX below
+)
+_HEIF_BRANDS = {b"heic", b"heix", b"hevc", b"hevx", b"heim", b"heis", b"mif1", b"msf1"}
+_OLE2_MAGIC = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"  # legacy .doc/.xls, not readable by python-docx
+
+
+@lru_cache(maxsize=None)
+def _puremagic():
+    # Only needed to name unsupported types in error messages
+    try:
+        import puremagic
+        return puremagic
+    except ImportError:
+        return None
+
+
+def _read_head(source: Union[str, Path, bytes, BinaryIO]) -> bytes:
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source[:HEAD_SIZE])
+    if isinstance(source, (str, Path)):
+        with open(source, "rb") as f:
+            return f.read(HEAD_SIZE)
+    # File-like object: read the head and rewind so the caller can still consume it
+    position = source.tell()
+    head = source.read(HEAD_SIZE)
+    source.seek(position)
+    return head
+
+
+def _is_docx(source: Union[str, Path, bytes, BinaryIO], head: bytes) -> bool:
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    position = None if isinstance(source, (str, Path)) else source.tell()
+    try:
+        # Only the central directory is read, not the archive members
+        with zipfile.ZipFile(source) as zf:
+            return "word/document.xml" in zf.namelist()
+    except zipfile.BadZipFile:
+        # Truncated input: fall back to the local file headers in the first bytes
+        return b"word/" in head
+    finally:
+        if position is not None:
+            source.seek(position)
+
+
+def _looks_like_text(head: bytes) -> bool:
+    if not head or b"\x00" in head:
+        return False
+    try:
+        head.decode("utf-8")
+    except UnicodeDecodeError as e:
+        # A multi-byte character cut at HEAD_SIZE is still text
+        if e.start < len(head) - 4:
+            try:
+                head.decode("cp1252")
+            except UnicodeDecodeError:
+                return False
+    control = sum(1 for b in head if b < 32 and b not in (9, 10, 12, 13))
+    return control / len(head) < 0.05
+
+
+def sniff_mime(head: bytes) -> str:
+    puremagic = _puremagic()
+    if puremagic is not None:
+        try:
+            return puremagic.from_string(head, mime=True) or "application/octet-stream"
+        except Exception:
+            pass
+    return "application/octet-stream"
+
+
+def detect_file_type(source: Union[str, Path, bytes, BinaryIO], name: str = "") -> FileType:
+    """
+    Detect the type of a file, byte string or seekable stream from its first bytes.
+    Raises UnsupportedFileTypeError for anything the extractors cannot handle.
+    """
+    head = _read_head(source)
+    if not head:
+        raise UnsupportedFileTypeError("application/x-empty", name)
+
+    for offset, magic, kind, mime in _SIGNATURES:
+        if head[offset:offset + len(magic)] == magic:
+            if kind == "zip":
+                if _is_docx(source, head):
+                    return FileType("docx", DOCX_MIME)
+                raise UnsupportedFileTypeError(mime, name)
+            if mime == "image/webp" and not head.startswith(b"RIFF"):
+                continue
+            # "BM" alone would also match text such as "BMW ..."; the BMP header has reserved zero bytes
+            if mime == "image/bmp" and head[6:10] != b"\x00\x00\x00\x00":
+                continue
+            return FileType(kind, mime)
+
+    # ISO-BMFF container: ....ftypheic
+    if head[4:8] == b"ftyp" and head[8:12] in _HEIF_BRANDS:
+        return FileType("image", "image/heic")
+
+    if head.startswith(_OLE2_MAGIC):
+        raise UnsupportedFileTypeError("application/msword", name)
+
+    if _looks_like_text(head):
+        return FileType("text", "text/plain")
+
+    raise UnsupportedFileTypeError(sniff_mime(head), name)
@@ -0,0 +1,108 @@
+# lora.py
+"""
+LoRA adapters for the sequence classifiers (optional: `pip install peft`).
+
+With LoRA only low-rank update matrices in the attention layers and the
+classification head are trained and saved (a few MB instead of a ~440MB
+checkpoint per model/trial). An adapter folder holds `adapter_config.json`
+(which names the base model), the adapter weights, the tokenizer and
+`label_classes.npy`; `merge_adapter` folds it back into a regular model folder.
+"""
+import shutil
+
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+ADAPTER_CONFIG_FILE = "adapter_config.json"
+
+
+@dataclass
+class LoRAConfig:
+    r: int = 8
+    alpha: int = 16
+    dropout: float = 0.1
+    # None lets peft pick the attention projections it knows for the architecture
+    target_modules: Optional[List[str]] = None
+
+    @classmethod
+    def from_dict(cls, values: Optional[dict]) -> "LoRAConfig":
+        values = values or {}
+        return cls(**{k: v for k, v in values.items() if k in cls.__dataclass_fields__})
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def is_adapter_dir(path) -> bool:
+    return (Path(path) / ADAPTER_CONFIG_FILE).is_file()
+
+
+def adapter_base_model(path) -> str:
+    """Name or path of the base model an adapter was trained on."""
+    from peft import PeftConfig
+
+    return PeftConfig.from_pretrained(str(path)).base_model_name_or_path
+
+
+def add_lora_adapter(model, config: LoRAConfig, gradient_checkpointing: bool = False):
+    """Wrap a sequence classification model; only LoRA matrices and the head stay trainable."""
+    from peft import LoraConfig, TaskType, get_peft_model
+
+    if gradient_checkpointing:
+        # Frozen embeddings produce no grads; checkpointed blocks need inputs that require them
+        model.enable_input_require_grads()
+    peft_config = LoraConfig(
+        task_type=TaskType.SEQ_CLS,  # also saves the classification head (modules_to_save)
+        r=config.r,
+        lora_alpha=config.alpha,
+        lora_dropout=config.dropout,
+        target_modules=config.target_modules,
+    )
+    model = get_peft_model(model, peft_config)
+    model.print_trainable_parameters()
+    return model
+
+
+def lora_from_config(training_config: Optional[dict]) -> Optional[dict]:
+    """`training.lora` from config.yaml if enabled, else None (full fine-tuning)."""
+    lora = (training_config or {}).get("lora") or {}
+    return lora if lora.get("enabled") else None
+
+
+def load_base_model(base_model: str, num_labels: int):
+    from transformers import AutoModelForSequenceClassification
+
+    return AutoModelForSequenceClassification.from_pretrained(base_model, num_labels=num_labels)
+
+
+def load_classifier(model_path: str):
+    """A regular model folder, or an adapter folder applied to its base model (unmerged)."""
+    from transformers import AutoModelForSequenceClassification
+
+    if not is_adapter_dir(model_path):
+        return AutoModelForSequenceClassification.from_pretrained(model_path)
+    from peft import PeftModel
+
+    from app.core.utils import load_label_encoder
+
+    num_labels = len(load_label_encoder(str(model_path)).classes_)
+    base = load_base_model(adapter_base_model(model_path), num_labels)
+    return PeftModel.from_pretrained(base, str(model_path))
+
+
+def merge_adapter(adapter_dir: str, output_dir: str) -> Path:
+    """Fold the adapter into its base model and save a regular, deployable model folder."""
+    from transformers import AutoTokenizer
+
+    adapter_path, output_path = Path(adapter_dir), Path(output_dir)
+    merged = load_classifier(str(adapter_path)).merge_and_unload()
+
+    output_path.mkdir(parents=True, exist_ok=True)
+    merged.save_pretrained(output_path)
+    AutoTokenizer.from_pretrained(str(adapter_path)).save_pretrained(output_path)
+    for name in ("label_classes.npy", "experiment_report.json"):
+        if (adapter_path / name).exists():
+            shutil.copy2(adapter_path / name, output_path / name)
+    print(f"✅ Merged {adapter_path} into {output_path}")
+    return output_path
@@ -0,0 +1,272 @@
+# metrics.py
+"""
+Lightweight Prometheus-style metrics shared by the API and batch CLI runs.
+
+The registry lives in-process, so the FastAPI `/metrics` endpoint and a batch
+run that calls `REGISTRY.write(path)` report exactly the same numbers.
+"""
+import json
+import threading
+import time
+
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+# Latency buckets in seconds: sub-millisecond tokenization up to minute-long OCR runs
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, float("inf"),
+)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+def _escape_label_value(value: str) -> str:
+    """Backslash, double quote and newline must be escaped in the exposition format."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape_label_value(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, e.g. predictions per model."""
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        key = self._key(labels)
+        with self._lock:
+            return self._values.get(key, 0.0)
+
+    def _items(self) -> List[Tuple[LabelValues, float]]:
+        # Copied under the lock: worker threads add new label sets while /metrics renders
+        with self._lock:
+            return sorted(self._values.items())
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for key, val in self._items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(val)}")
+        return lines
+
+    def snapshot(self) -> Dict[str, float]:
+        return {",".join(k) or "_": v for k, v in self._items()}
+
+
+class Gauge(Counter):
+    """Point-in-time value, e.g. model load time or cache hit ratio."""
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+
+class Histogram(_Metric):
+    """Cumulative latency histogram with Prometheus bucket semantics."""
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = DEFAULT_BUCKETS, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        if self.buckets[-1] != float("inf"):
+            self.buckets += (float("inf"),)
+        # label values -> [bucket counts..., sum, count]
+        self._values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.setdefault(key, [0.0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _items(self) -> List[Tuple[LabelValues, List[float]]]:
+        # Copies of the states, so sum and count of a series stay consistent while rendering
+        with self._lock:
+            return [(key, list(state)) for key, state in sorted(self._values.items())]
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for key, state in self._items():
+            for bound, count in zip(self.buckets, state):
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {_format_value(count)}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(state[-2])}")
+            lines.append(f"{self.name}_count{labels} {_format_value(state[-1])}")
+        return lines
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        out = {}
+        for key, state in self._items():
+            count = state[-1]
+            out[",".join(key) or "_"] = {
+                "count": count,
+                "sum_seconds": state[-2],
+                "mean_seconds": state[-2] / count if count else 0.0,
+            }
+        return out
+
+
+class MetricsRegistry:
+    """Holds every metric and renders them in the Prometheus text format."""
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets=buckets))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict[str, dict]:
+        return {name: m.snapshot() for name, m in self._metrics.items()}
+
+    def write(self, output_path: str, fmt: Optional[str] = None) -> Path:
+        """Dump metrics to disk: `.json` for a summary, anything else as Prometheus text."""
+        output_path = Path(output_path)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        fmt = fmt or ("json" if output_path.suffix == ".json" else "prometheus")
+        if fmt == "json":
+            output_path.write_text(json.dumps(self.snapshot(), indent=4))
+        else:
+            output_path.write_text(self.render())
+        return output_path
+
+
+# ---------------------------
+# SHARED METRICS
+# ---------------------------
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "docclf_stage_seconds",
+    "Latency of each document classification stage in seconds.",
+    ["stage"],
+)
+PREDICTIONS_TOTAL = REGISTRY.counter(
+    "docclf_predictions_total",
+    "Number of predictions served per model and predicted label.",
+    ["model", "label"],
+)
+FILES_TOTAL = REGISTRY.counter(
+    "docclf_files_total",
+    "Number of files processed per detected mime type.",
+    ["mime"],
+)
+PDF_PAGES_TOTAL = REGISTRY.counter(
+    "docclf_pdf_pages_total",
+    "PDF pages per extraction route (text, ocr, skip) and the quality decision behind it.",
+    ["route", "reason"],
+)
+EXTRACTION_EARLY_STOPS_TOTAL = REGISTRY.counter(
+    "docclf_extraction_early_stops_total",
+    "Extractions stopped early because the token budget was reached, per document kind.",
+    ["kind"],
+)
+OCR_TIMEOUTS_TOTAL = REGISTRY.counter(
+    "docclf_ocr_timeouts_total",
+    "OCR calls aborted because they exceeded the per-call timeout, per engine.",
+    ["engine"],
+)
+MODEL_LOAD_SECONDS = REGISTRY.gauge(
+    "docclf_model_load_seconds",
+    "Time spent loading the tokenizer and model weights.",
+    ["model"],
+)
+CACHE_REQUESTS_TOTAL = REGISTRY.counter(
+    "docclf_cache_requests_total",
+    "Cache lookups per cache and result (hit or miss).",
+    ["cache", "result"],
+)
+CACHE_HIT_RATIO = REGISTRY.gauge(
+    "docclf_cache_hit_ratio",
+    "Share of cache lookups answered from the cache.",
+    ["cache"],
+)
+
+
+def timed(stage: str):
+    """Context manager recording the wall time of a pipeline stage."""
+    return STAGE_SECONDS.time(stage=stage)
+
+
+# Held across increment, read and ratio update so concurrent lookups publish a matching ratio
+_CACHE_LOOKUP_LOCK = threading.Lock()
+
+
+def record_cache_lookup(cache: str, hit: bool) -> None:
+    with _CACHE_LOOKUP_LOCK:
+        CACHE_REQUESTS_TOTAL.inc(cache=cache, result="hit" if hit else "miss")
+        hits = CACHE_REQUESTS_TOTAL.value(cache=cache, result="hit")
+        misses = CACHE_REQUESTS_TOTAL.value(cache=cache, result="miss")
+        CACHE_HIT_RATIO.set(hits / (hits + misses), cache=cache)
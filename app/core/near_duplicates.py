@@ -0,0 +1,153 @@
+# near_duplicates.py
+"""
+Near-duplicate clustering with MinHash + LSH.
+
+Template-based synthetic documents differ only in names, dates and amounts. If
+such siblings land in train and test, test scores are inflated. Documents are
+shingled into word n-grams, MinHash signatures are banded into LSH buckets and
+only candidates that share a bucket are compared, so the cost stays near-linear
+in the number of documents. Clusters are then kept inside a single split.
+"""
+import zlib
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Universal hashing modulo a Mersenne prime: a*x+b stays below 2^63 for x < 2^31
+_MERSENNE_PRIME = np.uint64((1 << 31) - 1)
+
+# 64 permutations in 16 bands of 4 rows: pairs with Jaccard >= 0.8 become candidates
+# with probability > 0.99; candidates are verified on the full signature
+DEFAULT_NUM_PERM = 64
+DEFAULT_BANDS = 16
+DEFAULT_SHINGLE_SIZE = 3
+
+
+def shingle_hashes(text: str, shingle_size: int = DEFAULT_SHINGLE_SIZE) -> np.ndarray:
+    """Deterministic 32-bit hashes (CRC32) of the word n-grams of a cleaned text."""
+    words = text.split()
+    if len(words) <= shingle_size:
+        shingles = [" ".join(words)]
+    else:
+        shingles = [" ".join(words[i:i + shingle_size]) for i in range(len(words) - shingle_size + 1)]
+    return np.fromiter((zlib.crc32(s.encode("utf-8")) for s in set(shingles)), dtype=np.uint64)
+
+
+class MinHasher:
+    def __init__(self, num_perm: int = DEFAULT_NUM_PERM, seed: int = 42) -> None:
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self._a = rng.integers(1, int(_MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, int(_MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+
+    def signature(self, hashes: np.ndarray) -> np.ndarray:
+        x = hashes % _MERSENNE_PRIME
+        permuted = (self._a[:, None] * x[None, :] + self._b[:, None]) % _MERSENNE_PRIME
+        return permuted.min(axis=1).astype(np.uint32)
+
+
+def _find(parent: np.ndarray, i: int) -> int:
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def cluster_near_duplicates(
+    texts: Iterable[str],
+    threshold: float = 0.8,
+    num_perm: int = DEFAULT_NUM_PERM,
+    bands: int = DEFAULT_BANDS,
+    shingle_size: int = DEFAULT_SHINGLE_SIZE,
+    seed: int = 42,
+) -> np.ndarray:
+    """
+    Returns a cluster id per document (the index of the cluster's first document).
+    Documents whose estimated Jaccard similarity is >= `threshold` share a cluster.
+    """
+    if num_perm % bands:
+        raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands})")
+    hasher = MinHasher(num_perm, seed)
+    signatures = [hasher.signature(shingle_hashes(t, shingle_size)) for t in texts]
+    n_docs = len(signatures)
+    parent = np.arange(n_docs)
+    if n_docs == 0:
+        return parent
+    signatures = np.stack(signatures)
+
+    rows_per_band = num_perm // bands
+    min_matches = threshold * num_perm
+    for band in range(bands):
+        band_sig = signatures[:, band * rows_per_band:(band + 1) * rows_per_band]
+        # Per bucket, one representative document per cluster started in it: an unrelated
+        # collision that landed first must not hide later near-duplicates from each other
+        buckets: Dict[bytes, List[int]] = {}
+        for doc, key in enumerate(map(bytes, band_sig)):
+            representatives = buckets.setdefault(key, [])
+            if representatives:
+                # Verify the LSH candidates on the full signature
+                matches = np.count_nonzero(signatures[representatives] == signatures[doc], axis=1) >= min_matches
+                for other in np.asarray(representatives)[matches]:
+                    root_a, root_b = _find(parent, int(other)), _find(parent, doc)
+                    if root_a != root_b:
+                        parent[max(root_a, root_b)] = min(root_a, root_b)
+                if matches.any():
+                    continue
+            representatives.append(doc)
+
+    return np.array([_find(parent, i) for i in range(n_docs)])
+
+
+def group_train_test_split(
+    rows: np.ndarray,
+    labels: np.ndarray,
+    groups: np.ndarray,
+    test_size: float,
+    random_state: int = 42,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Split row indices so that no cluster straddles both sides. Per label (of a cluster's
+    first row), clusters are visited in random order and moved to the test side while
+    they fit into `test_size` of that label's rows, so one huge template cluster cannot
+    swallow the test set.
+    """
+    rng = np.random.default_rng(random_state)
+    _, inverse = np.unique(groups[rows], return_inverse=True)
+    sizes = np.bincount(inverse)
+    cluster_labels = labels[rows][np.unique(inverse, return_index=True)[1]]
+
+    test_clusters = []
+    for label in np.unique(cluster_labels):
+        members = np.flatnonzero(cluster_labels == label)
+        members = members[rng.permutation(len(members))]
+        target = test_size * sizes[members].sum()
+        taken, chosen = 0, []
+        for cluster in members:
+            if taken + sizes[cluster] <= target:
+                chosen.append(cluster)
+                taken += sizes[cluster]
+        if not chosen and len(members) > 1:
+            # Every cluster is larger than the target: still test on the smallest one
+            chosen.append(members[np.argmin(sizes[members])])
+        test_clusters.extend(chosen)
+
+    in_test = np.isin(inverse, test_clusters)
+    return rows[~in_test], rows[in_test]
+
+
+def downsample_clusters(rows: np.ndarray, groups: np.ndarray, max_cluster_size: Optional[int],
+                        random_state: int = 42) -> np.ndarray:
+    """Keep at most `max_cluster_size` randomly chosen rows per near-duplicate cluster."""
+    if not max_cluster_size:
+        return rows
+    rng = np.random.default_rng(random_state)
+    shuffled = rows[rng.permutation(len(rows))]
+    # Rank of each row inside its cluster after shuffling; keep the first k per cluster
+    order = np.argsort(groups[shuffled], kind="stable")
+    sorted_groups = groups[shuffled][order]
+    starts = np.r_[0, np.flatnonzero(sorted_groups[1:] != sorted_groups[:-1]) + 1]
+    rank = np.arange(len(order)) - np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+    keep = np.zeros(len(shuffled), dtype=bool)
+    keep[order[rank < max_cluster_size]] = True
+    return np.sort(shuffled[keep])
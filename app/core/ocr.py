@@ -0,0 +1,288 @@
+# ocr.py
+"""
+OCR helpers shared by PDF and image extraction.
+
+Tesseract time grows with pixel count and noise, so images can optionally be
+preprocessed first: grayscale, downscale to a target DPI, deskew, Otsu
+binarization (NumPy) and cropping of empty margins.
+
+Recognition goes through an `OCREngine`: either `pytesseract` (one tesseract
+process per call) or a pool of long-lived `tesserocr` API instances that keep
+the language model loaded between pages.
+"""
+import abc
+import sys
+import threading
+import time
+
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from app.core.metrics import OCR_TIMEOUTS_TOTAL, timed
+
+# Deskew search range; scanners rarely skew by more than a few degrees
+DESKEW_MAX_ANGLE = 5.0
+DESKEW_STEP = 0.5
+DESKEW_WORK_WIDTH = 800  # estimate the angle on a downsampled copy
+CROP_PADDING_PX = 16
+
+
+@dataclass
+class OCRConfig:
+    lang: str = "deu"
+    psm: int = 3            # Tesseract page segmentation mode (3 = fully automatic)
+    oem: int = 3            # OCR engine mode (3 = default, 1 = LSTM only)
+    preprocess: bool = False
+    target_dpi: int = 300
+    deskew: bool = True
+    binarize: bool = True
+    crop_margins: bool = True
+    engine: str = "auto"    # "auto" (tesserocr if installed), "tesserocr" or "pytesseract"
+    max_concurrency: int = 4  # OCR calls running at once, per engine
+    timeout: float = 120.0  # seconds per page/image; 0 disables the limit
+
+    @classmethod
+    def from_dict(cls, values: Optional[dict]) -> "OCRConfig":
+        values = values or {}
+        return cls(**{k: v for k, v in values.items() if k in cls.__dataclass_fields__})
+
+    def tesseract_args(self) -> str:
+        return f"--psm {self.psm} --oem {self.oem}"
+
+
+DEFAULT_OCR_CONFIG = OCRConfig()
+
+
+# ---------------------------
+# PREPROCESSING
+# ---------------------------
+def otsu_threshold(gray) -> int:
+    """Otsu's threshold over the 256-bin histogram of a uint8 array."""
+    import numpy as np
+
+    hist = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    levels = np.arange(256, dtype=np.float64)
+    weight_bg = np.cumsum(hist)
+    weight_fg = gray.size - weight_bg
+    sum_bg = np.cumsum(levels * hist)
+    mean_bg = sum_bg / np.maximum(weight_bg, 1)
+    mean_fg = (sum_bg[-1] - sum_bg) / np.maximum(weight_fg, 1)
+    between_class_variance = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+    return int(np.argmax(between_class_variance))
+
+
+def estimate_skew_angle(img) -> float:
+    """Angle (degrees) that maximizes the variance of row ink sums, i.e. aligns text lines."""
+    import numpy as np
+
+    scale = min(1.0, DESKEW_WORK_WIDTH / max(img.width, 1))
+    small = img.resize((max(1, int(img.width * scale)), max(1, int(img.height * scale))))
+    arr = np.asarray(small)
+    ink_threshold = otsu_threshold(arr)
+
+    best_angle, best_score = 0.0, -1.0
+    steps = int(DESKEW_MAX_ANGLE / DESKEW_STEP)
+    for i in range(-steps, steps + 1):
+        angle = i * DESKEW_STEP
+        rotated = np.asarray(small.rotate(angle, fillcolor=255))
+        row_ink = (rotated <= ink_threshold).sum(axis=1)
+        score = float(row_ink.var())
+        if score > best_score:
+            best_angle, best_score = angle, score
+    return best_angle
+
+
+def crop_empty_margins(binary):
+    """Crop to the bounding box of dark pixels (plus padding) of a binarized image."""
+    import numpy as np
+
+    arr = np.asarray(binary)
+    ink = arr < 128
+    rows = np.flatnonzero(ink.any(axis=1))
+    cols = np.flatnonzero(ink.any(axis=0))
+    if rows.size == 0 or cols.size == 0:
+        return binary
+    top = max(0, rows[0] - CROP_PADDING_PX)
+    bottom = min(arr.shape[0], rows[-1] + CROP_PADDING_PX + 1)
+    left = max(0, cols[0] - CROP_PADDING_PX)
+    right = min(arr.shape[1], cols[-1] + CROP_PADDING_PX + 1)
+    return binary.crop((left, top, right, bottom))
+
+
+def preprocess_for_ocr(img, source_dpi: Optional[float] = None, config: OCRConfig = DEFAULT_OCR_CONFIG):
+    """Grayscale -> downscale to target DPI -> deskew -> Otsu binarization -> crop margins."""
+    import numpy as np
+    from PIL import Image
+
+    img = img.convert("L")
+
+    if source_dpi and source_dpi > config.target_dpi:
+        scale = config.target_dpi / source_dpi
+        img = img.resize((max(1, int(img.width * scale)), max(1, int(img.height * scale))), Image.LANCZOS)
+
+    if config.deskew:
+        angle = estimate_skew_angle(img)
+        if angle:
+            img = img.rotate(angle, resample=Image.BICUBIC, expand=True, fillcolor=255)
+
+    if config.binarize:
+        arr = np.asarray(img)
+        img = Image.fromarray(np.where(arr > otsu_threshold(arr), 255, 0).astype(np.uint8))
+
+    if config.crop_margins:
+        img = crop_empty_margins(img)
+
+    return img
+
+
+# ---------------------------
+# OCR ENGINES
+# ---------------------------
+class OCRTimeoutError(TimeoutError):
+    """Raised when a single OCR call exceeds `OCRConfig.timeout`."""
+
+
+class OCRRecognitionError(RuntimeError):
+    """Raised when Tesseract fails on an image for any other reason."""
+
+
+class OCREngine(abc.ABC):
+    """Runs Tesseract with at most `max_concurrency` calls in flight."""
+    name = "base"
+
+    def __init__(self, max_concurrency: int = 4) -> None:
+        self._slots = threading.BoundedSemaphore(max(1, max_concurrency))
+
+    def image_to_string(self, img, config: OCRConfig) -> str:
+        with self._slots:
+            try:
+                return self._recognize(img, config)
+            except OCRTimeoutError:
+                OCR_TIMEOUTS_TOTAL.inc(engine=self.name)
+                raise
+
+    @abc.abstractmethod
+    def _recognize(self, img, config: OCRConfig) -> str:
+        ...
+
+    def close(self) -> None:
+        pass
+
+
+class PytesseractEngine(OCREngine):
+    """Spawns a tesseract process per call (no extra dependency, highest overhead)."""
+    name = "pytesseract"
+
+    def _recognize(self, img, config: OCRConfig) -> str:
+        import pytesseract
+
+        try:
+            try:
+                return pytesseract.image_to_string(img, lang=config.lang, config=config.tesseract_args(),
+                                                   timeout=config.timeout)
+            except pytesseract.TesseractError:
+                # Language data missing (e.g. no tesseract-ocr-deu): fall back to the default model
+                return pytesseract.image_to_string(img, config=config.tesseract_args(), timeout=config.timeout)
+        except RuntimeError as e:
+            # On timeout pytesseract kills the process and raises RuntimeError("Tesseract process timeout")
+            if "timeout" not in str(e):
+                raise
+            raise OCRTimeoutError(f"OCR exceeded {config.timeout}s") from e
+
+
+class TesserocrEngine(OCREngine):
+    """
+    Reuses initialized `tesserocr.PyTessBaseAPI` instances, so the language data is
+    loaded once per instance instead of once per page. At most `max_concurrency`
+    instances exist per (lang, oem); tesserocr releases the GIL while recognizing.
+    """
+    name = "tesserocr"
+
+    def __init__(self, max_concurrency: int = 4) -> None:
+        super().__init__(max_concurrency)
+        self._idle: Dict[Tuple[str, int], List] = {}
+        self._all: List = []
+        self._lock = threading.Lock()
+
+    def _create_api(self, lang: str, oem: int):
+        import tesserocr
+
+        try:
+            api = tesserocr.PyTessBaseAPI(lang=lang, oem=tesserocr.OEM(oem))
+        except RuntimeError:
+            # Language data missing: fall back to the default model, like the pytesseract engine
+            print(f"[WARN] Tesseract language '{lang}' not available, using the default", file=sys.stderr)
+            api = tesserocr.PyTessBaseAPI(oem=tesserocr.OEM(oem))
+        with self._lock:
+            self._all.append(api)
+        return api
+
+    def _recognize(self, img, config: OCRConfig) -> str:
+        import tesserocr
+
+        key = (config.lang, config.oem)
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            api = idle.pop() if idle else None
+        if api is None:
+            api = self._create_api(*key)
+        try:
+            api.SetPageSegMode(tesserocr.PSM(config.psm))
+            api.SetImage(img)
+            start = time.monotonic()
+            if not api.Recognize(timeout=int(config.timeout * 1000)):
+                # Recognize() only reports failure; it was a timeout if the limit was set and reached
+                if config.timeout and time.monotonic() - start >= config.timeout:
+                    raise OCRTimeoutError(f"OCR exceeded {config.timeout}s")
+                raise OCRRecognitionError("Tesseract could not recognize the image")
+            return api.GetUTF8Text()
+        finally:
+            api.Clear()
+            with self._lock:
+                self._idle[key].append(api)
+
+    def close(self) -> None:
+        with self._lock:
+            for api in self._all:
+                api.End()
+            self._all.clear()
+            self._idle.clear()
+
+
+@lru_cache(maxsize=None)
+def get_ocr_engine(name: str = "auto", max_concurrency: int = 4) -> OCREngine:
+    """Shared engine per (name, concurrency); "auto" prefers the long-lived tesserocr backend."""
+    if name in ("auto", "tesserocr"):
+        try:
+            import tesserocr  # noqa: F401
+            return TesserocrEngine(max_concurrency)
+        except ImportError:
+            if name == "tesserocr":
+                raise
+    if name in ("auto", "pytesseract"):
+        return PytesseractEngine(max_concurrency)
+    raise ValueError(f"Unknown OCR engine: {name}")
+
+
+# ---------------------------
+# OCR
+# ---------------------------
+def image_dpi(img) -> Optional[float]:
+    dpi = img.info.get("dpi")
+    if dpi and dpi[0]:
+        return float(dpi[0])
+    return None
+
+
+def ocr_image(img, config: OCRConfig = DEFAULT_OCR_CONFIG, source_dpi: Optional[float] = None) -> str:
+    """Run Tesseract on a PIL image, optionally preprocessing it first."""
+    if config.preprocess:
+        with timed("ocr_preprocess"):
+            img = preprocess_for_ocr(img, source_dpi or image_dpi(img), config)
+    elif img.mode not in ("L", "RGB"):
+        img = img.convert("RGB")  # Ensure compatibility with Tesseract
+
+    engine = get_ocr_engine(config.engine, config.max_concurrency)
+    with timed("ocr"):
+        return engine.image_to_string(img, config)
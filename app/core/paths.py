@@ -18,9 +18,15 @@ DATA_DIR = APP_DIR / "data"
 RAW_DIR = DATA_DIR / "raw"
 SYNTHETIC_DIR = DATA_DIR / "synthetic"
 PROCESSED_DIR = DATA_DIR / "processed"
+PACKED_SYNTHETIC_DIR = SYNTHETIC_DIR / "packed"
+
+# Measured batch size / gradient checkpointing per (model, device, max_length), see app.core.autotune
+AUTOTUNE_CACHE = PROJECT_ROOT / "models" / "autotune_cache.json"
 
 DIRS_TO_CREATE = [RAW_DIR, SYNTHETIC_DIR, PROCESSED_DIR]
 
-# Automatically create directories if missing
-for d in DIRS_TO_CREATE:
-    d.mkdir(parents=True, exist_ok=True)
+
+def ensure_data_dirs() -> None:
+    """Create the data directories if missing (called by the pipeline steps, not on import)."""
+    for d in DIRS_TO_CREATE:
+        d.mkdir(parents=True, exist_ok=True)
@@ -0,0 +1,104 @@
+# precision.py
+"""
+bf16 autocast and torch.compile settings, chosen per machine.
+
+bf16 autocast only pays off where the hardware has native bf16 math (AMX or
+AVX512_BF16 on recent Xeons, Ampere+ GPUs); elsewhere it is emulated and slower
+than fp32. Both settings are opt-in: False, True, or "auto" to let
+`probe_capabilities` decide. `resolve_runtime` returns the choice together with
+the probe, so it can be recorded in experiment_report.json.
+"""
+import sys
+
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple, Union
+
+BF16_CPU_FLAGS = ("amx_bf16", "avx512_bf16")
+Setting = Union[bool, str]  # False, True or "auto"
+
+
+@dataclass
+class RuntimeConfig:
+    bf16: Setting = False
+    compile: Setting = False
+    compile_mode: str = "default"  # torch.compile mode: "default", "reduce-overhead", "max-autotune"
+    # Inference: inputs are padded to these lengths and each one is compiled at load time
+    warmup_lengths: Tuple[int, ...] = (64, 128, 256, 512)
+    warmup_batch_size: int = 16  # largest inference batch (--batch-size for --classify/--watch)
+
+    @classmethod
+    def from_dict(cls, values: Optional[dict]) -> "RuntimeConfig":
+        values = values or {}
+        config = cls(**{k: v for k, v in values.items() if k in cls.__dataclass_fields__})
+        config.warmup_lengths = tuple(sorted(config.warmup_lengths))
+        return config
+
+
+DEFAULT_RUNTIME_CONFIG = RuntimeConfig()
+
+
+def parse_setting(value: Optional[str]) -> Setting:
+    """"auto", or a boolean from an environment variable / CLI string ("1", "true", "yes")."""
+    value = (value or "").strip().lower()
+    return "auto" if value == "auto" else value in ("1", "true", "yes", "on")
+
+
+def _cpu_flags() -> set:
+    cpuinfo = Path("/proc/cpuinfo")
+    if not cpuinfo.exists():
+        return set()
+    for line in cpuinfo.read_text().splitlines():
+        if line.startswith("flags"):
+            return set(line.split(":", 1)[1].split())
+    return set()
+
+
+@lru_cache(maxsize=None)
+def probe_capabilities(device_type: str) -> Dict[str, Any]:
+    """What this machine can do natively on `device_type` ("cpu", "cuda", "mps")."""
+    import torch
+
+    cpu_flags = sorted(_cpu_flags().intersection(BF16_CPU_FLAGS))
+    if device_type == "cuda":
+        bf16 = torch.cuda.is_bf16_supported()
+    elif device_type == "cpu":
+        mkldnn_bf16 = getattr(torch.ops.mkldnn, "_is_mkldnn_bf16_supported", None)
+        bf16 = bool(cpu_flags) or bool(mkldnn_bf16 and mkldnn_bf16())
+    else:
+        bf16 = False
+    return {
+        "device": device_type,
+        "torch_version": torch.__version__,
+        "cpu_bf16_flags": cpu_flags,
+        "bf16_native": bf16,
+        # Inductor needs a C++ toolchain; Windows and MPS are not supported well enough
+        "compile_available": hasattr(torch, "compile") and sys.platform != "win32" and device_type != "mps",
+    }
+
+
+def resolve_runtime(config: RuntimeConfig, device) -> Dict[str, Any]:
+    """Turn the opt-in settings into the bf16/compile choice for `device`, plus the probe."""
+    capabilities = probe_capabilities(device.type)
+
+    bf16 = config.bf16
+    if bf16 == "auto":
+        bf16 = capabilities["bf16_native"]
+    elif bf16 and not capabilities["bf16_native"]:
+        print(f"[WARN] bf16 requested but {device.type} has no native bf16 support; it will be emulated (slow)",
+              file=sys.stderr)
+
+    compile_model = config.compile
+    if compile_model == "auto":
+        compile_model = capabilities["compile_available"]
+    elif compile_model and not capabilities["compile_available"]:
+        print(f"[WARN] torch.compile is not available for {device.type} here; running eager", file=sys.stderr)
+        compile_model = False
+
+    return {
+        "bf16": bool(bf16),
+        "compile": bool(compile_model),
+        "compile_mode": config.compile_mode,
+        "capabilities": capabilities,
+    }
@@ -1,11 +1,27 @@
 import sys
 # First app import to ensure PROJECT_ROOT is added to sys.path
-from app.core.paths import PROCESSED_DIR, PROJECT_ROOT, RAW_DIR, SYNTHETIC_DIR
+from app.core.paths import PACKED_SYNTHETIC_DIR, PROCESSED_DIR, PROJECT_ROOT, RAW_DIR, SYNTHETIC_DIR, ensure_data_dirs
 from pathlib import Path
 from typing import Dict, List
 import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as pa_ds
+import pyarrow.parquet as pq
+from pyarrow import csv as pa_csv
 
 from app.core.utils import extract_pdf, clean_text
+from app.sampler.template_ids import read_template_ids
+
+# Column layout of the processed Parquet files (template_id is only known for synthetic documents)
+PROCESSED_COLUMNS = ["filename", "label", "text_hash", "source", "template_id", "text"]
+PROCESSED_SCHEMA = pa.schema([
+    ("filename", pa.string()),
+    ("label", pa.string()),
+    ("text_hash", pa.uint64()),
+    ("source", pa.string()),
+    ("template_id", pa.string()),
+    ("text", pa.string()),
+])
 
 
 def read_text_file(path: Path) -> str:
@@ -22,11 +38,13 @@ def read_text_file(path: Path) -> str:
     return ""
 
 
-def process_dataset(input_dir: str, output_file: str, label_map: Dict[str, str]) -> pd.DataFrame | None:
-    """Walk through folders, extract PDF/TXT text, clean it, assign labels, and export CSV."""
+def process_dataset(input_dir: str, output_file: str, label_map: Dict[str, str], source: str = "",
+                    export_csv: bool = False) -> pd.DataFrame | None:
+    """Walk through folders, extract PDF/TXT text, clean it, assign labels, and export Parquet."""
     input_path = Path(input_dir)
     output_path = Path(output_file)
     output_path.parent.mkdir(parents=True, exist_ok=True)
+    source = source or input_path.name
 
     print(f"\nStarting dataset processing: {input_path}")
 
@@ -43,6 +61,8 @@ def process_dataset(input_dir: str, output_file: str, label_map: Dict[str, str])
 
         files = [f for f in folder_path.iterdir() if f.suffix.lower() in {".pdf", ".txt"}]
         total_files = len(files)
+        # Written next to synthetic .txt files by the generators (app.sampler.template_ids)
+        template_ids = read_template_ids(folder_path)
 
         for idx, file in enumerate(files, start=1):
             text_raw = extract_pdf(str(file)) if file.suffix.lower() == ".pdf" else read_text_file(file)
@@ -52,7 +72,8 @@ def process_dataset(input_dir: str, output_file: str, label_map: Dict[str, str])
                 records.append({
                     "filename": file.name,
                     "text": text_clean,
-                    "label": label
+                    "label": label,
+                    "template_id": template_ids.get(file.name),
                 })
 
             # Print progress every 25 files
@@ -64,50 +85,122 @@ def process_dataset(input_dir: str, output_file: str, label_map: Dict[str, str])
         return None
 
     df = pd.DataFrame(records)
-    df.to_csv(output_path, index=False)
+    df["source"] = source
+    # Same 64-bit hash the data loader uses for de-duplication, so it never re-hashes the text
+    df["text_hash"] = pd.util.hash_array(df["text"].to_numpy(dtype=object))
+    df = df[PROCESSED_COLUMNS]
+    pq.write_table(pa.Table.from_pandas(df, schema=PROCESSED_SCHEMA, preserve_index=False), output_path,
+                   compression="zstd")
 
     print(f"\n✅ Completed: {len(df)} documents")
-    print(f"📄 Saved CSV: {output_path}")
+    print(f"📄 Saved Parquet: {output_path}")
+    if export_csv:
+        df.to_csv(output_path.with_suffix(".csv"), index=False)
+        print(f"📄 Saved CSV: {output_path.with_suffix('.csv')}")
     print("\n📊 Label distribution:")
     print(df["label"].value_counts())
 
     return df
 
 
+def process_packed_shards(shard_dir: Path, output_file: str, source: str = "synthetic",
+                          export_csv: bool = False) -> int:
+    """Clean packed synthetic shards (see app.sampler.packed) shard by shard into one Parquet file."""
+    from app.sampler.packed import read_packed_shards
+
+    output_path = Path(output_file)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    print(f"\nStarting packed shard processing: {shard_dir}")
+
+    n_docs = 0
+    label_counts = pd.Series(dtype="int64")
+    with pq.ParquetWriter(output_path, PROCESSED_SCHEMA, compression="zstd") as writer:
+        for shard in read_packed_shards(shard_dir):
+            shard["text"] = shard["text"].map(clean_text)
+            shard = shard[shard["text"].astype(bool)].copy()
+            shard["source"] = source
+            shard["text_hash"] = pd.util.hash_array(shard["text"].to_numpy(dtype=object))
+            writer.write_table(pa.Table.from_pandas(shard[PROCESSED_COLUMNS], schema=PROCESSED_SCHEMA,
+                                                    preserve_index=False))
+            n_docs += len(shard)
+            label_counts = label_counts.add(shard["label"].value_counts(), fill_value=0)
+
+    if not n_docs:
+        output_path.unlink()
+        print(f"[EMPTY] No documents found in {shard_dir}", file=sys.stderr)
+        return 0
+
+    print(f"\n✅ Completed: {n_docs} documents")
+    print(f"📄 Saved Parquet: {output_path}")
+    if export_csv:
+        pq.read_table(output_path).to_pandas().to_csv(output_path.with_suffix(".csv"), index=False)
+        print(f"📄 Saved CSV: {output_path.with_suffix('.csv')}")
+    print("\n📊 Label distribution:")
+    print(label_counts.astype(int))
+    return n_docs
+
+
 # -----------------------------
 # Helpers
 # -----------------------------
 
-def combine_csv_files(processed_dir: Path) -> Path:
-    """Combine all CSV files in PROCESSED_DIR into all_data.csv."""
+def processed_parquet_files(path: Path) -> List[Path]:
+    """Parquet files of the processed dataset: a single file or every *.parquet in a folder."""
+    path = Path(path)
+    if path.is_dir():
+        return sorted(path.glob("*.parquet"))
+    return [path] if path.suffix == ".parquet" else []
+
+
+def combine_processed_files(processed_dir: Path, export_csv: bool = False) -> pa_ds.Dataset:
+    """
+    Union of all Parquet files in PROCESSED_DIR. Nothing is rewritten: readers open the
+    folder as one dataset. With `export_csv`, all_data.csv is streamed out for external tools.
+    """
     if not processed_dir.exists():
         raise FileNotFoundError(f"Processed directory not found: {processed_dir}")
 
-    csv_files = list(processed_dir.glob("*.csv"))
+    parquet_files = processed_parquet_files(processed_dir)
 
-    if not csv_files:
-        raise FileNotFoundError("No CSV files found in PROCESSED_DIR.")
+    if not parquet_files:
+        raise FileNotFoundError("No Parquet files found in PROCESSED_DIR.")
 
-    output_csv = processed_dir / "all_data.csv"
+    dataset = pa_ds.dataset(parquet_files, format="parquet")
+    n_rows = sum(pq.ParquetFile(f).metadata.num_rows for f in parquet_files)
+    print(f"Combined {len(parquet_files)} Parquet files ({n_rows} documents) in {processed_dir}")
 
-    if output_csv.exists():
-        print(f"Using existing combined CSV: {output_csv}")
-    else:
-        print(f"Combining {len(csv_files)} CSV files into {output_csv}...")
-        df_list = [pd.read_csv(f) for f in csv_files]
-        all_data = pd.concat(df_list, ignore_index=True)
-        all_data.to_csv(output_csv, index=False)
-        print(f"Created combined CSV: {output_csv}")
+    if export_csv:
+        output_csv = processed_dir / "all_data.csv"
+        with pa_csv.CSVWriter(output_csv, dataset.schema) as writer:
+            for batch in dataset.to_batches():
+                writer.write_batch(batch)
+        print(f"Exported combined CSV: {output_csv}")
 
-    return output_csv
+    return dataset
 
 
 def prepare_datasets(config: dict) -> None:
-    """Process raw and synthetic data into separate CSV files."""
+    """Process raw and synthetic data into separate Parquet files."""
+    ensure_data_dirs()
+    export_csv = config.get("processed_data", {}).get("export_csv", False)
 
-    raw_csv = Path(PROCESSED_DIR) / "raw_data.csv"
-    process_dataset(RAW_DIR, str(raw_csv), config["label_map"])
+    raw_parquet = Path(PROCESSED_DIR) / "raw_data.parquet"
+    process_dataset(RAW_DIR, str(raw_parquet), config["label_map"], source="raw", export_csv=export_csv)
 
     if SYNTHETIC_DIR is not None:
-        synthetic_csv = Path(PROCESSED_DIR) / "synthetic_data.csv"
-        process_dataset(SYNTHETIC_DIR, str(synthetic_csv), config["label_map"])
+        synthetic_parquet = Path(PROCESSED_DIR) / "synthetic_data.parquet"
+        process_dataset(SYNTHETIC_DIR, str(synthetic_parquet), config["label_map"], source="synthetic",
+                        export_csv=export_csv)
+
+    # Packed shards from `--generate` with synthetic_data.packed are read directly, no .txt round trip
+    from app.sampler.packed import packed_shard_paths
+
+    packed_parquet = Path(PROCESSED_DIR) / "synthetic_packed.parquet"
+    if config["synthetic_data"].get("packed") and packed_shard_paths(PACKED_SYNTHETIC_DIR):
+        process_packed_shards(PACKED_SYNTHETIC_DIR, str(packed_parquet), source="synthetic", export_csv=export_csv)
+    else:
+        # Shards left from an earlier packed run would otherwise be unioned with the .txt synthetic data
+        for stale in (packed_parquet, packed_parquet.with_suffix(".csv")):
+            if stale.exists():
+                stale.unlink()
+                print(f"Removed stale packed synthetic data: {stale}")
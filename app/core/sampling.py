@@ -0,0 +1,101 @@
+# sampling.py
+"""
+Label-aware sampling on integer label codes.
+
+Balancing, minimum-count filtering and stratified subsets all work on one array
+of label codes (0..n_classes-1, negative = ignore) and return row indices, so
+callers never filter a DataFrame once per label. Rows are shuffled once and
+ranked inside their class; every selection is a vectorized comparison on ranks.
+"""
+from typing import Optional, Tuple, Union
+
+import numpy as np
+
+
+def class_counts(codes: np.ndarray) -> np.ndarray:
+    """Rows per class code (negative codes are ignored)."""
+    codes = np.asarray(codes)
+    valid = codes[codes >= 0]
+    return np.bincount(valid, minlength=codes.max() + 1 if len(valid) else 0)
+
+
+def min_count_classes(codes: np.ndarray, min_count: int) -> np.ndarray:
+    """Boolean mask over class codes: True for classes with at least `min_count` rows."""
+    return class_counts(codes) >= min_count
+
+
+def _shuffled_ranks(codes: np.ndarray, rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Rows with a valid code in random order, grouped by class: returns (rows, class of each
+    row, rank of the row inside its class).
+    """
+    codes = np.asarray(codes)
+    rows = np.flatnonzero(codes >= 0)
+    rows = rows[rng.permutation(len(rows))]
+    rows = rows[np.argsort(codes[rows], kind="stable")]
+    grouped = codes[rows]
+    starts = np.r_[0, np.flatnonzero(grouped[1:] != grouped[:-1]) + 1] if len(rows) else np.empty(0, int)
+    sizes = np.diff(np.r_[starts, len(rows)])
+    ranks = np.arange(len(rows)) - np.repeat(starts, sizes)
+    return rows, grouped, ranks
+
+
+def balance_indices(codes: np.ndarray, target_per_class: Optional[int] = None,
+                    random_state: int = 42) -> np.ndarray:
+    """
+    Row indices with exactly `target_per_class` rows per class (default: the smallest class),
+    in random order. Larger classes are down-sampled without replacement; smaller classes keep
+    all rows and are topped up with rows drawn with replacement.
+    """
+    rng = np.random.default_rng(random_state)
+    counts = class_counts(codes)
+    present = np.flatnonzero(counts)
+    if not len(present):
+        return np.empty(0, dtype=np.int64)
+    if target_per_class is None:
+        target_per_class = int(counts[present].min())
+
+    rows, grouped, ranks = _shuffled_ranks(codes, rng)
+    selected = rows[ranks < target_per_class]
+
+    # Up-sampling: draw the missing rows per class at random offsets into its group
+    deficit = np.maximum(target_per_class - counts[present], 0)
+    starts = np.searchsorted(grouped, present)
+    extra_class = np.repeat(np.arange(len(present)), deficit)
+    offsets = (rng.random(len(extra_class)) * counts[present][extra_class]).astype(np.int64)
+    extra = rows[starts[extra_class] + offsets]
+
+    balanced = np.concatenate([selected, extra])
+    return balanced[rng.permutation(len(balanced))]
+
+
+def stratified_subset(codes: np.ndarray, size: Union[int, float], random_state: int = 42) -> np.ndarray:
+    """
+    Sorted row indices of a stratified subset: `size` is a fraction (0-1] or a row count. Every
+    class keeps its share (at least one row per present class).
+
+    An int is always a row count, so `1` is rejected instead of silently meaning one row:
+    write `1.0` for all rows.
+    """
+    if isinstance(size, bool) or not isinstance(size, (int, float)):
+        raise ValueError(f"Subset size must be a fraction or a row count, got {size!r}")
+    if isinstance(size, int) and size <= 1:
+        raise ValueError(f"Subset size {size} is a row count; use a fraction such as 1.0 or 0.5 instead")
+    if isinstance(size, float) and not 0 < size <= 1:
+        raise ValueError(f"Subset fraction must be in (0, 1], got {size}")
+    codes = np.asarray(codes)
+    counts = class_counts(codes)
+    total = int(counts.sum())
+    fraction = size if isinstance(size, float) else size / max(total, 1)
+    if fraction >= 1:
+        return np.flatnonzero(codes >= 0)
+
+    quota = np.floor(counts * fraction).astype(np.int64)
+    # Largest remainders fill the rounding gap, so an integer `size` is met exactly
+    missing = int(round(total * fraction)) - int(quota.sum())
+    if missing > 0:
+        quota[np.argsort(-(counts * fraction - quota), kind="stable")[:missing]] += 1
+    quota[(counts > 0) & (quota == 0)] = 1
+
+    rows, grouped, ranks = _shuffled_ranks(codes, np.random.default_rng(random_state))
+    return np.sort(rows[ranks < quota[grouped]])
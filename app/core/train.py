@@ -1,14 +1,20 @@
 
 import torch, os,json
+import shutil
+import signal
+import threading
 
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Iterator, Optional
 
 from sklearn.metrics import precision_recall_fscore_support
-from transformers import EarlyStoppingCallback
+from transformers import EarlyStoppingCallback, TrainerCallback
 from transformers import AutoModelForSequenceClassification, AutoConfig, TrainingArguments, Trainer, DataCollatorWithPadding
+from transformers.trainer_utils import get_last_checkpoint
 
-from app.core.data_loader import load_and_prepare_data, tokenize_dataset
+from app.core.data_loader import load_and_prepare_data, load_synthetic_data, tokenize_dataset
+from app.core.precision import RuntimeConfig, resolve_runtime
 from app.core.utils import save_training_config
 # Device detection
 
@@ -33,10 +39,111 @@ def compute_metrics(eval_pred):
         "f1": float(f1),
     }
 
+# -----------------------
+# Checkpointing / preemption
+# -----------------------
+
+class TrainingPreempted(RuntimeError):
+    """Training stopped on SIGTERM/SIGINT after writing a checkpoint; rerun to resume."""
+
+    def __init__(self, checkpoint_dir: str) -> None:
+        super().__init__(checkpoint_dir)
+        self.checkpoint_dir = checkpoint_dir
+
+    def __str__(self) -> str:
+        return f"Training preempted, checkpoint saved in {self.checkpoint_dir}"
+
+
+class PreemptionCallback(TrainerCallback):
+    """On SIGTERM (spot instance reclaim) or SIGINT, save a checkpoint after the current step and stop."""
+
+    def __init__(self) -> None:
+        self.requested = False
+        self.stopped = False
+
+    @contextmanager
+    def handle_signals(self) -> Iterator[None]:
+        # Signal handlers can only be installed from the main thread
+        if threading.current_thread() is not threading.main_thread():
+            yield
+            return
+
+        def request_stop(signum, frame):
+            if self.requested:
+                # Second signal: give up on the checkpoint
+                raise KeyboardInterrupt
+            print(f"\n⚠️  Received {signal.Signals(signum).name}: saving a checkpoint after this step...")
+            self.requested = True
+
+        previous = {sig: signal.signal(sig, request_stop) for sig in (signal.SIGTERM, signal.SIGINT)}
+        try:
+            yield
+        finally:
+            for sig, handler in previous.items():
+                signal.signal(sig, handler)
+
+    def on_step_end(self, args, state, control, **kwargs):
+        if torch.distributed.is_available() and torch.distributed.is_initialized():
+            # All ranks must stop at the same step, or the others wait in the next all-reduce forever
+            flag = torch.tensor([int(self.requested)])
+            torch.distributed.all_reduce(flag, op=torch.distributed.ReduceOp.MAX)
+            self.requested = bool(flag.item())
+        if self.requested:
+            control.should_save = True
+            control.should_training_stop = True
+            self.stopped = True
+        return control
+
+
+FINGERPRINT_FILE = "run_fingerprint.json"
+
+
+def data_fingerprint(csv_path: str, synthetic_data: Optional[Dict], data_split_config: Dict) -> Dict[str, Any]:
+    """Identifies the training data: the synthetic recipe, or the processed files with size and mtime."""
+    if synthetic_data is not None:
+        return {"synthetic": synthetic_data, "split": data_split_config}
+    from app.core.prepare_data import processed_parquet_files
+
+    path = Path(csv_path)
+    files = processed_parquet_files(path) or [path / "all_data.csv" if path.is_dir() else path]
+    return {
+        "files": [[str(f), f.stat().st_size, f.stat().st_mtime_ns] for f in files if f.exists()],
+        "split": data_split_config,
+    }
+
+
+def remove_checkpoints(save_path: Path) -> None:
+    for checkpoint in save_path.glob("checkpoint-*"):
+        shutil.rmtree(checkpoint, ignore_errors=True)
+
+
+def resumable_checkpoint(save_path: Path, fingerprint: Dict[str, Any], resume: bool) -> Optional[str]:
+    """
+    Latest `checkpoint-*` of an unfinished run with the same fingerprint (model, labels, data,
+    hyperparameters). Otherwise the stale checkpoints are removed and the fingerprint of the new
+    run is written. Call on the main process first (other ranks then see the cleaned folder).
+    """
+    fingerprint = json.loads(json.dumps(fingerprint, default=str))
+    fingerprint_file = save_path / FINGERPRINT_FILE
+    last_checkpoint = get_last_checkpoint(str(save_path))
+    stored = json.loads(fingerprint_file.read_text()) if fingerprint_file.exists() else None
+    if resume and last_checkpoint and stored == fingerprint:
+        return last_checkpoint
+
+    if int(os.environ.get("RANK", 0)) == 0:
+        if last_checkpoint:
+            reason = "--no-resume" if not resume else "model, data or hyperparameters changed"
+            print(f"🧹 Removing checkpoints of a previous run in {save_path} ({reason})")
+            remove_checkpoints(save_path)
+        fingerprint_file.write_text(json.dumps(fingerprint, indent=4))
+    return None
+
+
 def get_sensible_batch_sizes(device, user_train_batch=None, user_eval_batch=None, user_gradient_accumulation=None):
     """
     Selects sensible default batch sizes and FP16 settings based on the device
-    if the user has not provided them.
+    if the user has not provided them. Batch sizes are only a fallback when
+    autotuning (app.core.autotune) is off or finds nothing.
     """
     if user_train_batch is None:
         if device.type == "cuda":
@@ -67,14 +174,38 @@ def train_model(
     dropout: Optional[float] = None,
     early_stopping_patience: int = 3,  
     data_split_config: Optional[Dict] = None,
+    synthetic_data: Optional[Dict] = None,
+    resume: bool = True,
+    save_steps: Optional[int] = None,
+    ddp_backend: Optional[str] = None,
+    lora: Optional[Dict] = None,
+    runtime: Optional[Dict] = None,
+    autotune: bool = True,
+    target_batch_size: int = 8,
+    max_length: int = 512,
+    gradient_checkpointing: Optional[bool] = None,
 )-> Dict[str, Any]:
+    """
+    `synthetic_data` ({"per_generator", "label_map", "seed"}) trains on synthetic documents
+    generated in memory instead of the files at `csv_path`.
+    With `resume`, an unfinished run continues from the latest `checkpoint-*` in `save_path`
+    (model, optimizer, scheduler and RNG state) if model, data and hyperparameters are unchanged;
+    the checkpoints are removed once the final model is saved. `save_steps` evaluates and checkpoints every N steps
+    instead of once per epoch. SIGTERM/SIGINT write a checkpoint and raise `TrainingPreempted`.
+    `ddp_backend` ("gloo") is set when running as one of several processes (see app.core.ddp);
+    only rank 0 writes the model, label classes and report.
+    `lora` ({"r", "alpha", "dropout", "target_modules"}) freezes the base model and trains LoRA
+    adapters plus the classification head; only those are saved (see app.core.lora).
+    `runtime` ({"bf16", "compile", "compile_mode"}, see app.core.precision) opts into bf16
+    autocast and torch.compile; the resolved choice is recorded in the report.
+    With `autotune`, batch size, gradient accumulation (up to `target_batch_size`) and gradient
+    checkpointing are measured on this device (cached, see app.core.autotune); a given
+    `train_batch` is kept and only checkpointing is decided. `gradient_checkpointing` forces it.
+    """
+    is_main_process = int(os.environ.get("RANK", 0)) == 0
 
     print(f"📌 Using device: {device}")
 
-    # Adaptive batch size based on device
-    # If user did NOT provide batch sizes, auto-adjust safely
-    # Adaptive batch size based on device
-    # Then in train_model():
     save_path = Path(save_path)
     save_path.mkdir(parents=True, exist_ok=True)
 
@@ -86,14 +217,50 @@ def train_model(
         user_gradient_accumulation=gradient_accumulation
     )
 
+    runtime_choice = resolve_runtime(RuntimeConfig.from_dict(runtime), device)
+    use_bf16 = runtime_choice["bf16"]
+    use_fp16 = use_fp16 and not use_bf16
+    print(f"⚙️  bf16 autocast: {use_bf16}, torch.compile: {runtime_choice['compile']}")
+
     data_split_config = data_split_config or {}
-    dataset, label_encoder = load_and_prepare_data(
-        csv_path,
-        label_classes_output=f"{save_path}/label_classes.npy",
-        **data_split_config
-    )
+    if synthetic_data is not None:
+        dataset, label_encoder = load_synthetic_data(
+            label_classes_output=f"{save_path}/label_classes.npy" if is_main_process else None,
+            **synthetic_data,
+            **data_split_config
+        )
+    else:
+        dataset, label_encoder = load_and_prepare_data(
+            csv_path,
+            label_classes_output=f"{save_path}/label_classes.npy" if is_main_process else None,
+            **data_split_config
+        )
+
+    dataset, tokenizer = tokenize_dataset(dataset, tokenizer_name=model_name, max_length=max_length, batch_size=1000)
 
-    dataset, tokenizer = tokenize_dataset(dataset, tokenizer_name=model_name, batch_size=1000)
+    # ===== MEASURED BATCH SIZE & GRADIENT CHECKPOINTING =====
+    tuned = None
+    if autotune:
+        from app.core.autotune import find_batch_config
+
+        tuned = find_batch_config(
+            model_name,
+            len(label_encoder.classes_),
+            device,
+            max_length=max_length,
+            target_batch_size=train_batch * (gradient_accumulation or 1) if train_batch else target_batch_size,
+            batch_sizes=[train_batch] if train_batch else None,
+            mixed_precision="bf16" if use_bf16 else "fp16" if use_fp16 else None,
+            lora=lora,
+            # Ranks measuring at the same time would skew each other; DDP runs only reuse the cache
+            measure=int(os.environ.get("WORLD_SIZE", 1)) == 1,
+        )
+    if tuned is not None:
+        train_batch_size = tuned["train_batch_size"]
+        grad_accum = tuned["gradient_accumulation_steps"]
+        eval_batch_size = eval_batch or train_batch_size * 2
+    if gradient_checkpointing is None:
+        gradient_checkpointing = tuned["gradient_checkpointing"] if tuned is not None else True
 
     # Load model
     if dropout is None:
@@ -113,6 +280,12 @@ def train_model(
             ignore_mismatched_sizes=True
         ).to(device)
 
+    lora_config = None
+    if lora is not None:
+        from app.core.lora import LoRAConfig, add_lora_adapter
+
+        lora_config = LoRAConfig.from_dict(lora)
+        model = add_lora_adapter(model, lora_config, gradient_checkpointing=gradient_checkpointing)
 
     # TrainingArguments
     args = TrainingArguments(
@@ -126,8 +299,11 @@ def train_model(
         per_device_eval_batch_size=eval_batch_size,    
         gradient_accumulation_steps=grad_accum,  
 
-        eval_strategy="epoch",
-        save_strategy="epoch",
+        eval_strategy="steps" if save_steps else "epoch",
+        save_strategy="steps" if save_steps else "epoch",
+        eval_steps=save_steps,
+        save_steps=save_steps or 500,
+        # The best checkpoint is kept as well, so the latest one is always there to resume from
         save_total_limit=1,
         logging_steps=50,
 
@@ -136,9 +312,12 @@ def train_model(
         greater_is_better=True,
 
         fp16=use_fp16,
-        #gradient_checkpointing=(device.type == "cuda"),
-        gradient_checkpointing=True,
+        bf16=use_bf16,
+        torch_compile=runtime_choice["compile"],
+        torch_compile_mode=runtime_choice["compile_mode"] if runtime_choice["compile"] else None,
+        gradient_checkpointing=gradient_checkpointing,
         report_to="none",
+        ddp_backend=ddp_backend,
         dataloader_pin_memory=(device.type != "mps"),# Disable pin_memory on Mac (MPS) to stop the warning
     )
 
@@ -150,6 +329,7 @@ def train_model(
     # Data collator for dynamic padding
     data_collator = DataCollatorWithPadding(tokenizer=tokenizer)
 
+    preemption = PreemptionCallback()
     trainer = Trainer(
         model=model,
         args=args,
@@ -157,15 +337,47 @@ def train_model(
         eval_dataset=dataset["validation"],
         data_collator=data_collator,
         compute_metrics=compute_metrics,
-        callbacks=[early_stopping],
+        callbacks=[early_stopping, preemption],
     )
 
+    fingerprint = {
+        "model": model_name,
+        "label_classes": label_encoder.classes_.tolist(),
+        "data": data_fingerprint(csv_path, synthetic_data, data_split_config),
+        "hyperparameters": {
+            "learning_rate": learning_rate,
+            "epochs": epochs,
+            "train_batch_size": train_batch_size,
+            "eval_batch_size": eval_batch_size,
+            "gradient_accumulation_steps": grad_accum,
+            "weight_decay": weight_decay,
+            "warmup_steps": warmup_steps,
+            "dropout": dropout,
+            "save_steps": save_steps,
+            "max_length": max_length,
+            "lora": lora,
+            "world_size": int(os.environ.get("WORLD_SIZE", 1)),
+        },
+    }
+    with args.main_process_first(desc="checkpoint fingerprint"):
+        last_checkpoint = resumable_checkpoint(save_path, fingerprint, resume)
+    if last_checkpoint:
+        print(f"♻️  Resuming from {last_checkpoint}")
+
     # The train() method returns the final training metrics
-    train_result = trainer.train()
+    with preemption.handle_signals():
+        train_result = trainer.train(resume_from_checkpoint=last_checkpoint)
+
+    if preemption.stopped:
+        raise TrainingPreempted(get_last_checkpoint(str(save_path)) or str(save_path))
 
     # The best model is already loaded thanks to `load_best_model_at_end=True`
-    model.save_pretrained(save_path)
-    tokenizer.save_pretrained(save_path)
+    # (with LoRA, save_pretrained writes only the adapters and the classification head)
+    if is_main_process:
+        model.save_pretrained(save_path)
+        tokenizer.save_pretrained(save_path)
+        # The run is finished: the next --train starts fresh instead of restoring this state
+        remove_checkpoints(save_path)
 
     # Save training configuration
     # To get training accuracy (if computed during training), we often look at state.log_history
@@ -196,15 +408,25 @@ def train_model(
             "train_batch_size": train_batch_size,
             "eval_batch_size": eval_batch_size,
             "gradient_accumulation_steps": grad_accum,
+            "gradient_checkpointing": gradient_checkpointing,
+            "batch_autotune": tuned,
             "weight_decay": weight_decay,
             "warmup_steps": warmup_steps,
             "dropout": dropout,
             "device": str(device),
-            "fp16_enabled": use_fp16
+            "world_size": int(os.environ.get("WORLD_SIZE", 1)),
+            "fp16_enabled": use_fp16,
+            "bf16_enabled": use_bf16,
+            "torch_compile": runtime_choice["compile"],
+            "lora": lora_config.to_dict() if lora_config else None
         },
 
+        # Machine probe behind the bf16/compile choice
+        "runtime": runtime_choice,
+
         # 2. THE DATASET INFO
         "dataset_config": {
+            "source": "synthetic_in_memory" if synthetic_data is not None else str(csv_path),
             "num_labels": len(label_encoder.classes_),
             "label_classes": label_encoder.classes_.tolist(),
             "splitting_strategy": {
@@ -251,7 +473,8 @@ def train_model(
     }
 
     
-    save_training_config(experiment_report, str(save_path))
+    if is_main_process:
+        save_training_config(experiment_report, str(save_path))
 
     return {
         "validation": best_val_metrics,
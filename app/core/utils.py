@@ -1,18 +1,33 @@
 # utils.py
+# Heavy dependencies (PyMuPDF, Tesseract, Pillow, scikit-learn) are imported on
+# first use so that importing this module (e.g. for clean_text) stays cheap.
+from __future__ import annotations
+
 import json
-import fitz  # PyMuPDF
 import sys
-import pytesseract
-import io
 import re
+import threading
 
-import pillow_heif
-pillow_heif.register_heif_opener()
-
-from PIL import Image
+from functools import lru_cache
 from pathlib import Path
-import numpy as np
-from sklearn.preprocessing import LabelEncoder
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator, List, Optional
+
+from app.core.metrics import EXTRACTION_EARLY_STOPS_TOTAL, PDF_PAGES_TOTAL, timed
+from app.core.ocr import DEFAULT_OCR_CONFIG, OCRConfig, OCRRecognitionError, OCRTimeoutError, ocr_image
+from app.core.text_quality import PageDecision, decide_page_route
+
+if TYPE_CHECKING:
+    from sklearn.preprocessing import LabelEncoder
+
+
+@lru_cache(maxsize=None)
+def load_pil_image_module():
+    """Import PIL once and register the HEIC/HEIF opener on first use."""
+    import pillow_heif
+    from PIL import Image
+
+    pillow_heif.register_heif_opener()
+    return Image
 
 
 # ---------------------------
@@ -43,65 +58,359 @@ def clean_text(text: str) -> str:
     
     return text.lower().strip()
 
+# -----------------------
+# TOKEN BUDGET (early-stop extraction)
+# -----------------------
+class TokenBudget:
+    """
+    Counts the tokens of the cleaned text extracted so far. Extractors stop once
+    the budget is exhausted, because the model truncates everything beyond it.
+    The default counter (whitespace words) never overestimates subword tokens,
+    so stopping on it is always safe; pass the tokenizer for a tight budget.
+    """
+
+    def __init__(self, max_tokens: int, count_tokens: Optional[Callable[[str], int]] = None) -> None:
+        self.max_tokens = max_tokens
+        self.count_tokens = count_tokens or (lambda text: len(text.split()))
+        self.used = 0
+
+    @property
+    def exhausted(self) -> bool:
+        return self.used >= self.max_tokens
+
+    def consume(self, text: str) -> bool:
+        """Account for a newly extracted piece of raw text; returns True once exhausted."""
+        cleaned = clean_text(text)
+        if cleaned:
+            self.used += self.count_tokens(cleaned)
+        return self.exhausted
+
+
+def collect_until_budget(pieces: Iterable[str], budget: Optional[TokenBudget], kind: str) -> str:
+    """Join lazily extracted pieces (pages, paragraphs, blocks), stopping once the budget is full."""
+    parts = []
+    for piece in pieces:
+        parts.append(piece)
+        if budget is not None and budget.consume(piece):
+            EXTRACTION_EARLY_STOPS_TOTAL.inc(kind=kind)
+            break
+    # Closes the generator, so e.g. the PDF is released without reading the remaining pages
+    close = getattr(pieces, "close", None)
+    if close is not None:
+        close()
+    return "".join(parts)
+
+def iter_text_file(path: str, chunk_size: int = 64 * 1024) -> Iterator[str]:
+    """Read a text file in chunks, so a budget can stop before reading multi-MB exports."""
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
 # -----------------------
 # EXTRACT TEXT FROM PDF
 # -----------------------
 
 
-def extract_pdf(pdf_path: str) -> str:
+# PyMuPDF is not thread-safe: every call into it (open, page text, rendering, close) from the
+# extraction thread pools of --classify/--watch goes through this lock; Tesseract runs outside it
+PYMUPDF_LOCK = threading.RLock()
+
+# Rendering budget for OCR: A4 at 300 DPI (3508 px long side); larger pages get a lower DPI
+OCR_MAX_DPI = 300
+OCR_MIN_DPI = 150
+OCR_MAX_LONG_SIDE_PX = 3508
+
+
+def ocr_dpi_for_page(page) -> int:
+    """Adaptive render DPI: 300 DPI up to A4, scaled down for larger pages (A3, plans, posters)."""
+    long_side_pt = max(page.rect.width, page.rect.height) or 842  # 1 pt = 1/72 inch
+    dpi = int(OCR_MAX_LONG_SIDE_PX * 72 / long_side_pt)
+    return max(OCR_MIN_DPI, min(OCR_MAX_DPI, dpi))
+
+
+def render_page_for_ocr(page):
+    """Render a PDF page straight into a grayscale PIL image (no PNG encode/decode round trip)."""
+    import fitz  # PyMuPDF
+
+    Image = load_pil_image_module()
+    # Tesseract binarizes internally, so grayscale loses nothing and is 3x less data than RGB
+    pix = page.get_pixmap(dpi=ocr_dpi_for_page(page), colorspace=fitz.csGRAY, alpha=False)
+    return Image.frombytes("L", (pix.width, pix.height), pix.samples)
+
+
+def count_vector_paths(page) -> int:
+    """Number of vector drawing paths (only computed for pages without usable text or images)."""
+    get_drawings = getattr(page, "get_cdrawings", None) or page.get_drawings
+    return len(get_drawings())
+
+
+def iter_pdf_pages(pdf_path: str, ocr_mode: str = "auto", ocr_config: OCRConfig = DEFAULT_OCR_CONFIG) -> Iterator[str]:
     """
-    Extracts text from a PDF.
+    Lazily extracts the text of each PDF page.
     Priority:
-    1. Direct text extraction (fast, accurate).
-    2. OCR fallback if the page is a scanned image (slow).
+    1. Direct text extraction (fast, accurate) if the text layer passes the quality check.
+    2. OCR fallback for scanned pages, garbage text layers and vector-only pages (slow).
+
+    ocr_mode: "auto" (per-page quality decision), "always" (OCR every page) or "never".
+    ocr_config: Tesseract options and optional image preprocessing (see `app.core.ocr`).
     """
-    full_text = ""
-    
-    def _page_contains_image(page) -> bool:
-        """Detect whether a PDF page contains image blocks (PyMuPDF type 1)."""
-        try:
-            info = page.get_text("dict")
-        except:
-            return False
-        blocks = info.get("blocks", [])
-        if not blocks:
-            return False
-        for block in blocks:
-            if block.get("type") == 1:
-                return True
-        return False
+    import fitz  # PyMuPDF
 
     try:
-        with fitz.open(pdf_path) as doc:
-            for page in doc:
+        with PYMUPDF_LOCK:
+            doc = fitz.open(pdf_path)
+    except Exception as e:
+        print(f"Error reading {pdf_path}: {e}", file=sys.stderr)
+        return
+
+    try:
+        for page_index in range(len(doc)):
+            img = None
+            # All PyMuPDF work for the page happens under the lock; OCR and the consumer run outside it
+            with PYMUPDF_LOCK:
+                page = doc[page_index]
                 # 1. Try to get digital text first
-                page_text = page.get_text()
-                
-                if page_text.strip(): # If meaningful digital text exists, use it
-                    full_text += page_text
-                
-                # 2. If no digital text, check if it's a scanned image and then use OCR
-                elif _page_contains_image(page):
-                    # Render page as an image
-                    pix = page.get_pixmap(dpi=300)
-                    img = Image.open(io.BytesIO(pix.tobytes()))
-                    img = img.convert("RGB") # Ensure compatibility with pytesseract
-                    # Perform OCR (assuming German based on your previous context)
-                    ocr_text = pytesseract.image_to_string(img, lang='deu')
-                    full_text += ocr_text
+                with timed("pdf_page_text"):
+                    page_text = page.get_text()
+
+                # 2. Decide per page: trust the text layer, OCR or skip.
+                #    The page's image list is read from its resources, no layout analysis needed.
+                with timed("pdf_page_quality"):
+                    if ocr_mode == "always":
+                        decision = PageDecision("ocr", "forced")
+                    elif ocr_mode == "never":
+                        decision = PageDecision("text", "ocr_disabled") if page_text.strip() else PageDecision("skip", "ocr_disabled")
+                    else:
+                        area = page.rect.width * page.rect.height
+                        has_images = bool(page.get_images())
+                        decision = decide_page_route(page_text, area, has_images)
+                        if decision.route == "skip":
+                            # Blank-looking page: text may be drawn as vector outlines
+                            decision = decide_page_route(page_text, area, has_images, count_vector_paths(page))
+
+                if decision.route == "ocr":
+                    with timed("pdf_page_render"):
+                        img = render_page_for_ocr(page)
+                    source_dpi = ocr_dpi_for_page(page)
+                del page
+            PDF_PAGES_TOTAL.inc(route=decision.route, reason=decision.reason)
+
+            if decision.route == "text":
+                yield page_text
+
+            elif decision.route == "ocr":
+                # Perform OCR (German by default, see OCRConfig.lang)
+                try:
+                    yield ocr_image(img, ocr_config, source_dpi=source_dpi)
+                except (OCRTimeoutError, OCRRecognitionError) as e:
+                    # One pathological page should not cost the rest of the document
+                    print(f"[WARN] {pdf_path} page {page_index + 1}: {e}", file=sys.stderr)
 
     except Exception as e:
         print(f"Error reading {pdf_path}: {e}", file=sys.stderr)
+    finally:
+        with PYMUPDF_LOCK:
+            doc.close()
+
 
-    return full_text
+def extract_pdf(pdf_path: str, ocr_mode: str = "auto", budget: Optional[TokenBudget] = None,
+                ocr_config: OCRConfig = DEFAULT_OCR_CONFIG) -> str:
+    """
+    Extracts text from a PDF page by page (see `iter_pdf_pages`).
+    With a `budget`, extraction (and OCR) stops once enough text for the model is collected.
+    """
+    with timed("pdf_extraction"):
+        return collect_until_budget(iter_pdf_pages(pdf_path, ocr_mode, ocr_config), budget, kind="pdf")
+
+
+# -----------------------
+# EXTRACT TEXT FROM DOCX
+# -----------------------
+
+# Above this (uncompressed) size of word/document.xml the body is streamed with
+# iterparse instead of building the python-docx object model
+DOCX_STREAMING_MIN_BYTES = 5 * 1024 * 1024
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_MC_FALLBACK = "{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback"
+_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}Relationship"
+
+
+def _iter_docx_block(block) -> Iterator[str]:
+    """Text of a python-docx Paragraph or Table; table rows become tab-separated lines."""
+    from docx.table import Table
+
+    if isinstance(block, Table):
+        for row in block.rows:
+            seen, cells = set(), []
+            for cell in row.cells:
+                # Merged cells are returned once per grid column
+                if id(cell._tc) in seen:
+                    continue
+                seen.add(id(cell._tc))
+                cells.append(" ".join(
+                    text.strip() for inner in cell.iter_inner_content() for text in _iter_docx_block(inner)
+                ))
+            yield "\t".join(cells) + "\n"
+    elif block.text:
+        yield block.text + "\n"
+
+
+def _iter_docx_object_model(docx_path: str) -> Iterator[str]:
+    import docx  # for DOCX files
+
+    document = docx.Document(docx_path)
+    headers, footers = [], []
+    for section in document.sections:
+        # First-page and even-page variants too, like the streaming path (every header*/footer* part)
+        parts = [(headers, section.header), (headers, section.first_page_header), (headers, section.even_page_header),
+                 (footers, section.footer), (footers, section.first_page_footer), (footers, section.even_page_footer)]
+        for target, part in parts:
+            if part.is_linked_to_previous:
+                continue
+            text = "".join(t for block in part.iter_inner_content() for t in _iter_docx_block(block))
+            if text.strip() and text not in target:
+                target.append(text)
+
+    # Letterheads (sender, "Rechnung") live in the header, so it comes first
+    yield from headers
+    for block in document.iter_inner_content():
+        yield from _iter_docx_block(block)
+    yield from footers
+
+
+def _iter_docx_xml(xml_file) -> Iterator[str]:
+    """Stream paragraphs and table rows of a WordprocessingML part, clearing parsed elements."""
+    from xml.etree.ElementTree import iterparse
+
+    runs: List[str] = []          # text of the current paragraph
+    rows: List[List[str]] = []    # open table rows (a stack, tables can be nested)
+    cells: List[List[str]] = []   # paragraphs of the open table cells
+    fallback_depth = 0            # text boxes are stored twice (mc:Choice + mc:Fallback)
+    ppr_depth = 0                 # w:pPr holds tab-stop definitions (w:tabs/w:tab), not text
+
+    for event, elem in iterparse(xml_file, events=("start", "end")):
+        tag = elem.tag
+        if tag == _MC_FALLBACK:
+            fallback_depth += 1 if event == "start" else -1
+            continue
+        if fallback_depth:
+            continue
+        if tag == _W + "pPr":
+            ppr_depth += 1 if event == "start" else -1
+            continue
+        if ppr_depth:
+            continue
+
+        if event == "start":
+            if tag == _W + "tr":
+                rows.append([])
+            elif tag == _W + "tc":
+                cells.append([])
+            continue
+
+        if tag == _W + "t":
+            runs.append(elem.text or "")
+        elif tag == _W + "tab":
+            runs.append("\t")
+        elif tag in (_W + "br", _W + "cr"):
+            runs.append("\n")
+        elif tag == _W + "p":
+            text = "".join(runs)
+            runs.clear()
+            elem.clear()
+            if cells:
+                cells[-1].append(text.strip())
+            elif text:
+                yield text + "\n"
+        elif tag == _W + "tc":
+            rows[-1].append(" ".join(p for p in cells.pop() if p))
+        elif tag == _W + "tr":
+            row = "\t".join(rows.pop())
+            if cells:
+                cells[-1].append(row)  # nested table inside a cell
+            else:
+                yield row + "\n"
+        elif tag == _W + "tbl":
+            elem.clear()
+
+
+def _docx_part_number(name: str) -> int:
+    match = re.search(r"(\d+)\.xml$", name)
+    return int(match.group(1)) if match else 0
+
+
+def _docx_header_footer_parts(zf, kind: str) -> List[str]:
+    """Header or footer parts referenced by document.xml, in numeric order (header2 before header10)."""
+    from xml.etree.ElementTree import parse
+
+    rel_type = f"http://schemas.openxmlformats.org/officeDocument/2006/relationships/{kind}"
+    try:
+        with zf.open("word/_rels/document.xml.rels") as rels_file:
+            rels = parse(rels_file).getroot()
+    except KeyError:
+        return []
+    targets = {"word/" + rel.get("Target", "").lstrip("/").removeprefix("word/")
+               for rel in rels.iter(_REL) if rel.get("Type") == rel_type}
+    return sorted((n for n in targets if n in zf.NameToInfo), key=_docx_part_number)
+
+
+def _iter_docx_streaming(docx_path: str) -> Iterator[str]:
+    import zipfile
+
+    with zipfile.ZipFile(docx_path) as zf:
+        # Parts no section refers to (left over after editing) are not part of the document
+        parts = _docx_header_footer_parts(zf, "header")
+        parts += ["word/document.xml"]
+        parts += _docx_header_footer_parts(zf, "footer")
+        seen = set()
+        for name in parts:
+            with zf.open(name) as xml_file:
+                if name == "word/document.xml":
+                    yield from _iter_docx_xml(xml_file)
+                    continue
+                # Headers/footers are tiny; drop duplicates (first page, even pages, sections)
+                text = "".join(_iter_docx_xml(xml_file))
+                if text.strip() and text not in seen:
+                    seen.add(text)
+                    yield text
+
+
+def iter_docx_blocks(docx_path: str) -> Iterator[str]:
+    """
+    Lazily yields DOCX text in reading order: headers, body paragraphs and tables
+    (one tab-separated line per row), footers. Large documents are streamed from XML.
+    """
+    import zipfile
+
+    with zipfile.ZipFile(docx_path) as zf:
+        body_size = zf.getinfo("word/document.xml").file_size
+    if body_size >= DOCX_STREAMING_MIN_BYTES:
+        yield from _iter_docx_streaming(docx_path)
+    else:
+        yield from _iter_docx_object_model(docx_path)
+
+
+def extract_docx(docx_path: str, budget: Optional[TokenBudget] = None) -> str:
+    """Extracts DOCX text (see `iter_docx_blocks`), stopping once the budget is full."""
+    with timed("docx_extraction"):
+        return collect_until_budget(iter_docx_blocks(docx_path), budget, kind="docx")
 
 
 def save_label_encoder(label_encoder: LabelEncoder, output_path: str) -> None:
+    import numpy as np
+
     output_path = Path(output_path)
     output_path.parent.mkdir(parents=True, exist_ok=True)
     np.save(output_path, label_encoder.classes_)
 
 def load_label_encoder(model_path: str) -> LabelEncoder:
+    import numpy as np
+    from sklearn.preprocessing import LabelEncoder
+
     label_path = Path(model_path) / "label_classes.npy"
     if not label_path.exists():
         raise FileNotFoundError(f"label_classes.npy not found in {model_path}")
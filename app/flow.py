@@ -11,23 +11,37 @@ os.environ["WANDB_DISABLED"] = "true" # Disable Weights & Biases logging
 os.environ["TOKENIZERS_PARALLELISM"] = "false" # Disable parallelism in tokenizers to avoid warnings and potential issues
 
 from pathlib import Path
-from metaflow import FlowSpec, step, Parameter
+from metaflow import FlowSpec, step, Parameter, retry
 
 from app.core.paths import PROJECT_ROOT, PROCESSED_DIR
+from app.core.lora import lora_from_config
 from app.core.train import train_model
+from app.sampler.packed import per_generator_from_config
 
 
 class GermanModelFlow(FlowSpec):
 
     csv_path = Parameter(
         "csv",
-        help="Path to the training data CSV file.",
-        default=str(PROCESSED_DIR / "all_data.csv")
+        help="Path to the training data: processed Parquet folder/file or a CSV file.",
+        default=str(PROCESSED_DIR)
     )
 
     # Parameters can now override the config file
     epochs = Parameter("epochs", help="Number of training epochs.", default=None, type=int)
     learning_rate = Parameter("lr", help="Learning rate.", default=None, type=float)
+    resume = Parameter(
+        "resume",
+        help="Continue an unfinished run from its checkpoints (set to False to start from scratch).",
+        default=True,
+        type=bool,
+    )
+    in_memory_synthetic = Parameter(
+        "in-memory-synthetic",
+        help="Train on synthetic documents generated in memory instead of the data at --csv.",
+        default=False,
+        type=bool,
+    )
 
     @step
     def start(self):
@@ -45,6 +59,8 @@ class GermanModelFlow(FlowSpec):
 
         self.next(self.train_each_model, foreach="model_list")
 
+    # A preempted attempt (TrainingPreempted) is retried and resumes from its checkpoint
+    @retry(times=2)
     @step
     def train_each_model(self):
         self.model_name = self.input
@@ -59,6 +75,15 @@ class GermanModelFlow(FlowSpec):
         lr = self.learning_rate if self.learning_rate is not None else training_config["learning_rate"]
         num_epochs = self.epochs if self.epochs is not None else training_config["epochs"]
 
+        synthetic_data = None
+        if self.in_memory_synthetic:
+            synthetic_data = {
+                "per_generator": per_generator_from_config(self.config["synthetic_data"]),
+                "label_map": self.config["label_map"],
+                "seed": self.config["synthetic_data"].get("seed", 42),
+                "stratified": self.config["synthetic_data"].get("stratified_templates", False),
+            }
+
         # train_model returns a dict with 'validation' and 'test' keys
         all_metrics = train_model(
             model_name=self.model_name,
@@ -66,7 +91,16 @@ class GermanModelFlow(FlowSpec):
             save_path=save_path,
             learning_rate=lr,
             epochs=num_epochs,
-            data_split_config=self.config.get("data_split", {})
+            data_split_config=self.config.get("data_split", {}),
+            synthetic_data=synthetic_data,
+            # A retried step continues from the checkpoints of the failed attempt
+            resume=self.resume and training_config.get("resume", True),
+            save_steps=training_config.get("save_steps"),
+            lora=lora_from_config(training_config),
+            runtime=self.config.get("runtime"),
+            autotune=training_config.get("autotune", True),
+            target_batch_size=training_config.get("target_batch_size", 8),
+            max_length=training_config.get("max_length", 512),
         )
 
         # Extract the key test metrics to pass to the join step
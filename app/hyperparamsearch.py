@@ -18,9 +18,11 @@ import pandas as pd
 from pathlib import Path
 
 from app.core.paths import PROJECT_ROOT, PROCESSED_DIR
+from app.core.lora import lora_from_config
 from app.core.train import train_model
 
-CSV_PATH = PROCESSED_DIR / "all_data.csv"
+# Processed Parquet files (or a legacy all_data.csv) in this folder
+CSV_PATH = PROCESSED_DIR
 
 # ================================
 # TOP-N CLEANUP (now top-level)
@@ -82,7 +84,13 @@ def build_objective(model_name: str, config: dict):
             eval_batch=params.get("batch_size"),
             epochs=hpo_config.get("epochs", 3),
             weight_decay=params["weight_decay"],
-            dropout=params["dropout"]
+            dropout=params["dropout"],
+            data_split_config={**config.get("data_split", {}), "train_subset": hpo_config.get("train_subset")},
+            lora=lora_from_config(config["training"]),
+            runtime=config.get("runtime"),
+            # The trial's batch size is kept; autotuning only decides gradient checkpointing
+            autotune=config["training"].get("autotune", True),
+            max_length=config["training"].get("max_length", 512),
         )
 
         trial.set_user_attr("metrics", metrics)
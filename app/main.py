@@ -1,7 +1,7 @@
 import os, sys
 
 # First app import to ensure PROJECT_ROOT is added to sys.path
-from app.core.paths import PROCESSED_DIR, PROJECT_ROOT, RAW_DIR, SYNTHETIC_DIR
+from app.core.paths import PACKED_SYNTHETIC_DIR, PROCESSED_DIR, PROJECT_ROOT, RAW_DIR, SYNTHETIC_DIR, ensure_data_dirs
 
 # Set environment variables for Hugging Face libraries before any other imports
 
@@ -16,19 +16,218 @@ os.environ["TOKENIZERS_PARALLELISM"] = "false" # Disable parallelism in tokenize
 import yaml
 import json
 import argparse
-import pandas as pd
 
 from collections import defaultdict
 from datetime import datetime
 from pathlib import Path
 
-from app.sampler.make_synthetic_data import SyntheticDocumentGenerator 
-from app.sampler.doc_generator import save_all_synthetic_as_text_files
+# Each pipeline step imports its own dependencies, so e.g. `--results` or `--help`
+# never pays for torch, transformers or Faker.
+
+# -----------------------------
+# Pipeline Steps
+# -----------------------------
+
+def run_generate(config: dict) -> None:
+    synthetic = config["synthetic_data"]
+    if synthetic.get("packed", False):
+        from app.sampler.packed import generate_packed, per_generator_from_config
+
+        print("GENERATING PACKED SYNTHETIC DATA ...")
+        generate_packed(
+            per_generator_from_config(synthetic),
+            output_dir=str(PACKED_SYNTHETIC_DIR),
+            label_map=config["label_map"],
+            seed=synthetic.get("seed", 42),
+            workers=synthetic.get("workers"),
+            shard_size=synthetic.get("shard_size", 500),
+            fmt=synthetic.get("format", "parquet"),
+            overwrite=synthetic["overwrite"],
+            stratified=synthetic.get("stratified_templates", False),
+        )
+        return
+
+    from app.sampler.make_synthetic_data import SyntheticDocumentGenerator 
+    from app.sampler.doc_generator import save_all_synthetic_as_text_files
+
+    stratified = synthetic.get("stratified_templates", False)
+    print("GENERATING SYNTHETIC DATA V0 ...")
+    save_all_synthetic_as_text_files(
+        per_category=config["synthetic_data"]["per_category_v0"],
+        output_dir=str(SYNTHETIC_DIR),
+        overwrite=config["synthetic_data"]["overwrite"],
+        stratified=stratified,
+    )       
+    print("GENERATING SYNTHETIC DATA V1 ...")
+    generator = SyntheticDocumentGenerator(per_category=config["synthetic_data"]["per_category_v1"], output_dir=str(SYNTHETIC_DIR),
+                                           stratified=stratified)
+    generator.generate_documents(overwrite=config["synthetic_data"]["overwrite"])
+
+
+def run_prepare(config: dict) -> None:
+    from app.core.prepare_data import prepare_datasets, combine_processed_files
+
+    print("PREPARING DATASETS")
+    prepare_datasets(config)
+    print("Combining Parquet files into a single dataset...")
+    combine_processed_files(Path(PROCESSED_DIR), export_csv=config.get("processed_data", {}).get("export_csv", False))
+
+
+def in_memory_synthetic_data(config: dict) -> dict:
+    """train_model(synthetic_data=...) arguments from the `synthetic_data` section of config.yaml."""
+    from app.sampler.packed import per_generator_from_config
+
+    return {
+        "per_generator": per_generator_from_config(config["synthetic_data"]),
+        "label_map": config["label_map"],
+        "seed": config["synthetic_data"].get("seed", 42),
+        "stratified": config["synthetic_data"].get("stratified_templates", False),
+    }
+
+
+def run_train(config: dict, in_memory_synthetic: bool = False, resume: bool = True, ddp_cpu: int = 1) -> None:
+    from app.core.lora import lora_from_config
+    from app.core.train import TrainingPreempted, train_model
+
+    print("TRAINING MODELS")
+    # Folder of processed Parquet files (falls back to all_data.csv)
+    csv_path = Path(PROCESSED_DIR)
+    synthetic_data = in_memory_synthetic_data(config) if in_memory_synthetic else None
+
+    results = defaultdict(dict)
+
+    for model_name in config["models_to_train"]:
+        print(f"\n🚀 Training {model_name}")
+
+        save_path = str(PROJECT_ROOT / "models" / model_name.replace("/", "_"))
+
+        # train_model now returns the final test metrics after evaluating the best model
+        train_kwargs = dict(
+            model_name=model_name,
+            csv_path=str(csv_path),
+            save_path=save_path,
+            learning_rate=config["training"]["learning_rate"],
+            epochs=config["training"]["epochs"],
+            data_split_config=config.get("data_split", {}),
+            synthetic_data=synthetic_data,
+            resume=resume and config["training"].get("resume", True),
+            save_steps=config["training"].get("save_steps"),
+            lora=lora_from_config(config["training"]),
+            runtime=config.get("runtime"),
+            autotune=config["training"].get("autotune", True),
+            target_batch_size=config["training"].get("target_batch_size", 8),
+            max_length=config["training"].get("max_length", 512),
+        )
+        try:
+            if ddp_cpu > 1:
+                from app.core.ddp import launch_cpu_ddp
+
+                all_metrics = launch_cpu_ddp(train_model, ddp_cpu, ddp_backend="gloo", **train_kwargs)
+            else:
+                all_metrics = train_model(**train_kwargs)
+        except TrainingPreempted as e:
+            print(f"🛑 {e}. Run --train again to resume.", file=sys.stderr)
+            sys.exit(143)
+        results[model_name] = all_metrics
+
+    print("\n📊 Final model results summary:")
+    for model, metrics in results.items():
+        print(f"\n--- MODEL: {model} ---")
+        print("  Validation Metrics:", metrics.get("validation", "N/A"))
+        print("  Test Metrics:", metrics.get("test", "N/A"))
+        print("--------------------" + "-" * len(model))
+
+    # Save the final results to a JSON file with a timestamp
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    results_filename = f"evaluation_results_{timestamp}.json"
+    results_path = PROJECT_ROOT / "models" / results_filename
+    print(f"\n💾 Saving final results to {results_path}")
+    with open(results_path, "w") as f:
+        json.dump(results, f, indent=4)
+
+
+def run_results() -> None:
+    from app.statistics.result import generate_results
+
+    print("Generate CSV and graphs of the models' results")
+    generate_results()
+
+
+def run_merge_adapter(args: argparse.Namespace) -> None:
+    from app.core.lora import merge_adapter
+
+    adapter_dir = Path(args.merge_adapter)
+    print(f"MERGING LORA ADAPTER {adapter_dir}")
+    merge_adapter(str(adapter_dir), args.output or str(adapter_dir.parent / f"{adapter_dir.name}-merged"))
+
+
+def resolve_model_path(model_name: str | None) -> Path:
+    """Pick `models/<model_name>`, or the same default model the API serves."""
+    model_dir = PROJECT_ROOT / "models"
+    if model_name:
+        return model_dir / model_name
+    available = sorted(d.name for d in model_dir.iterdir() if d.is_dir()) if model_dir.is_dir() else []
+    if not available:
+        raise FileNotFoundError(f"No trained models found in '{model_dir}'")
+    return model_dir / ("deepset_gbert-base" if "deepset_gbert-base" in available else available[0])
+
+
+def resolve_ocr_config(config: dict, args: argparse.Namespace):
+    """`ocr:` section of config.yaml, overridden by --ocr-preprocess/--psm/--oem."""
+    from app.core.ocr import OCRConfig
+
+    ocr_config = OCRConfig.from_dict(config.get("ocr"))
+    if args.ocr_preprocess:
+        ocr_config.preprocess = True
+    if args.psm is not None:
+        ocr_config.psm = args.psm
+    if args.oem is not None:
+        ocr_config.oem = args.oem
+    return ocr_config
+
+
+def resolve_runtime_config(config: dict, args: argparse.Namespace):
+    """`runtime:` section of config.yaml, overridden by --bf16/--compile."""
+    from app.core.precision import RuntimeConfig, parse_setting
+
+    runtime_config = RuntimeConfig.from_dict(config.get("runtime"))
+    if args.bf16 is not None:
+        runtime_config.bf16 = parse_setting(args.bf16)
+    if args.compile is not None:
+        runtime_config.compile = parse_setting(args.compile)
+    runtime_config.warmup_batch_size = args.batch_size
+    return runtime_config
+
+
+def run_classify(args: argparse.Namespace, config: dict) -> None:
+    from app.services.batch import classify_directory
+
+    print(f"CLASSIFYING DOCUMENTS IN {args.classify}")
+    classify_directory(
+        input_dir=args.classify,
+        output_dir=args.output or str(PROJECT_ROOT / "results" / "classified"),
+        model_path=str(resolve_model_path(args.model)),
+        fmt=args.format,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        ocr_config=resolve_ocr_config(config, args),
+        runtime_config=resolve_runtime_config(config, args),
+    )
+
+
+def run_watch(args: argparse.Namespace, config: dict) -> None:
+    from app.services.watch import WatchFolderClassifier
+
+    WatchFolderClassifier(
+        watch_dir=args.watch,
+        output_dir=args.output or str(PROJECT_ROOT / "results" / "watch"),
+        model_path=str(resolve_model_path(args.model)),
+        batch_size=args.batch_size,
+        workers=args.workers,
+        ocr_config=resolve_ocr_config(config, args),
+        runtime_config=resolve_runtime_config(config, args),
+    ).run()
 
-from app.core.evaluate import evaluate_model
-from app.core.prepare_data import prepare_datasets, combine_csv_files
-from app.core.train import train_model
-from app.statistics.result import generate_results
 
 # -----------------------------
 # Main Training Loop
@@ -36,78 +235,57 @@ from app.statistics.result import generate_results
 
 def main() -> None:
 
-    # Load configuration from YAML
-    config_path = PROJECT_ROOT / "config.yaml"
-    with open(config_path, "r") as f:
-        config = yaml.safe_load(f)
-
     parser = argparse.ArgumentParser(description="German Document Classifier Pipeline")
     parser.add_argument("--generate", action="store_true", help="Step 1: Generate synthetic data files.")
     parser.add_argument("--prepare", action="store_true", help="Step 2: Prepare datasets from raw/synthetic files into CSVs.")
     parser.add_argument("--train", action="store_true", help="Step 3: Train models on the prepared data.")
+    parser.add_argument("--in-memory-synthetic", action="store_true", help="With --train: generate synthetic training data in memory instead of reading app/data/processed.")
+    parser.add_argument("--ddp-cpu", type=int, default=1, metavar="N", help="With --train: data-parallel training in N CPU processes (gloo), each pinned to its own cores.")
+    parser.add_argument("--no-resume", action="store_true", help="With --train: start from scratch even if checkpoints exist.")
     parser.add_argument("--results", action="store_true", help="Step 4: Generate CSV and graphs of the models' results.")
     parser.add_argument("--all", action="store_true", help="Run the full pipeline (generate, prepare, and train).")
+    parser.add_argument("--classify", metavar="DIR", help="Classify every document below DIR (resumable batch run).")
+    parser.add_argument("--watch", metavar="DIR", help="Run as a daemon that classifies files dropped into DIR.")
+    parser.add_argument("--merge-adapter", metavar="DIR", help="Merge a LoRA adapter folder into its base model for export (default output: DIR-merged).")
+    parser.add_argument("--output", metavar="DIR", help="Output directory for --classify/--watch/--merge-adapter (default: results/classified, results/watch, <adapter>-merged).")
+    parser.add_argument("--format", choices=["parquet", "jsonl"], default="parquet", help="Output format for --classify.")
+    parser.add_argument("--model", help="Model folder under models/ used for --classify/--watch.")
+    parser.add_argument("--batch-size", type=int, default=16, help="Inference batch size for --classify/--watch.")
+    parser.add_argument("--workers", type=int, default=4, help="Parallel text extraction workers for --classify/--watch (PDF parsing is serialized, OCR runs in parallel).")
+    parser.add_argument("--ocr-preprocess", action="store_true", help="Grayscale, deskew, binarize and crop images before OCR.")
+    parser.add_argument("--psm", type=int, help="Tesseract page segmentation mode (default from config.yaml, else 3).")
+    parser.add_argument("--oem", type=int, help="Tesseract OCR engine mode (default from config.yaml, else 3).")
+    parser.add_argument("--bf16", choices=["on", "off", "auto"], help="bf16 autocast for --classify/--watch (default from config.yaml runtime.bf16).")
+    parser.add_argument("--compile", choices=["on", "off", "auto"], help="torch.compile the model for --classify/--watch (default from config.yaml runtime.compile).")
     
     args = parser.parse_args()
+    ensure_data_dirs()
+
+    # Load configuration from YAML
+    config_path = PROJECT_ROOT / "config.yaml"
+    with open(config_path, "r") as f:
+        config = yaml.safe_load(f)
 
     if args.generate or args.all:
-        print("GENERATING SYNTHETIC DATA V0 ...")
-        save_all_synthetic_as_text_files(
-            per_category=config["synthetic_data"]["per_category_v0"],
-            output_dir=str(SYNTHETIC_DIR),
-            overwrite=config["synthetic_data"]["overwrite"]
-        )       
-        print("GENERATING SYNTHETIC DATA V1 ...")
-        generator = SyntheticDocumentGenerator(per_category=config["synthetic_data"]["per_category_v1"], output_dir=str(SYNTHETIC_DIR))
-        generator.generate_documents(overwrite=config["synthetic_data"]["overwrite"])
+        run_generate(config)
 
     if args.prepare or args.all:
-        print("PREPARING DATASETS")
-        prepare_datasets(config)
-        print("Combining CSV files into a single dataset...")
-        combine_csv_files(Path(PROCESSED_DIR))
+        run_prepare(config)
 
     if args.train or args.all:
-        print("TRAINING MODELS")
-        csv_path = Path(PROCESSED_DIR) / "all_data.csv"
-
-        results = defaultdict(dict)
-
-        for model_name in config["models_to_train"]:
-            print(f"\n🚀 Training {model_name}")
-
-            save_path = str(PROJECT_ROOT / "models" / model_name.replace("/", "_"))
-
-            # train_model now returns the final test metrics after evaluating the best model
-            all_metrics = train_model(
-                model_name=model_name,
-                csv_path=str(csv_path),
-                save_path=save_path,
-                learning_rate=config["training"]["learning_rate"],
-                epochs=config["training"]["epochs"],
-                data_split_config=config.get("data_split", {})
-            )
-            results[model_name] = all_metrics
-
-        print("\n📊 Final model results summary:")
-        for model, metrics in results.items():
-            print(f"\n--- MODEL: {model} ---")
-            print("  Validation Metrics:", metrics.get("validation", "N/A"))
-            print("  Test Metrics:", metrics.get("test", "N/A"))
-            print("--------------------" + "-" * len(model))
-
-        # Save the final results to a JSON file with a timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        results_filename = f"evaluation_results_{timestamp}.json"
-        results_path = PROJECT_ROOT / "models" / results_filename
-        print(f"\n💾 Saving final results to {results_path}")
-        with open(results_path, "w") as f:
-            json.dump(results, f, indent=4)
-    # write perser for results
+        run_train(config, in_memory_synthetic=args.in_memory_synthetic, resume=not args.no_resume, ddp_cpu=args.ddp_cpu)
 
     if args.results or args.all:
-        print("Generate CSV and graphs of the models' results")
-        generate_results()
+        run_results()
+
+    if args.merge_adapter:
+        run_merge_adapter(args)
+
+    if args.classify:
+        run_classify(args, config)
+
+    if args.watch:
+        run_watch(args, config)
 
 if __name__ == "__main__":
     main()
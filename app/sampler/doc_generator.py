@@ -7,7 +7,9 @@ import random
 import pandas as pd
 from pathlib import Path
 from datetime import datetime, timedelta
-from sklearn.utils import resample
+
+from app.core.sampling import balance_indices
+from app.sampler.template_ids import update_template_ids
 
 class GermanDocumentGenerator:
     def __init__(self):
@@ -42,12 +44,16 @@ class GermanDocumentGenerator:
             "Martin Becker", "Julia Hoffmann", "Klaus Schulz", "Lisa Koch",
             "Peter Bauer", "Maria Richter", "Stefan Wagner", "Laura Klein"
         ]
+    def _choose_template(self, templates, i, stratified):
+        """Random template, or round-robin by document index so every template gets the same count."""
+        return templates[i % len(templates)] if stratified else random.choice(templates)
+
     def random_date(self):
         """Generate a random date within the last 2 years"""
         days_ago = random.randint(1, 730)  # 730 days = ~2 years
         return (datetime.now() - timedelta(days=days_ago)).strftime('%d.%m.%Y')
     
-    def generate_invoices(self, n=100):
+    def generate_invoices(self, n=100, start=0, stratified=False):
         """Generate 15 different invoice template variations"""
         invoices = []
         
@@ -69,9 +75,9 @@ class GermanDocumentGenerator:
             self._invoice_template_freelancer
         ]
         
-        for i in range(n):
-            template = random.choice(templates)
-            invoices.append({'text': template(i), 'label': 'Rechnung'})
+        for i in range(start, start + n):
+            template = self._choose_template(templates, i, stratified)
+            invoices.append({'text': template(i), 'label': 'Rechnung', 'template_id': template.__name__.lstrip('_')})
         
         return invoices
     
@@ -541,7 +547,7 @@ Mit freundlichen Grüßen
 {random.choice(self.names)}
 """
 
-    def generate_contracts(self, n=100):
+    def generate_contracts(self, n=100, start=0, stratified=False):
         """Generate 15 different contract variations"""
         contracts = []
         
@@ -563,9 +569,9 @@ Mit freundlichen Grüßen
             self._contract_template_training
         ]
         
-        for i in range(n):
-            template = random.choice(templates)
-            contracts.append({'text': template(i), 'label': 'Vertrag'})
+        for i in range(start, start + n):
+            template = self._choose_template(templates, i, stratified)
+            contracts.append({'text': template(i), 'label': 'Vertrag', 'template_id': template.__name__.lstrip('_')})
         
         return contracts
     
@@ -1315,7 +1321,7 @@ _______________________              _______________________
 Auftraggeber                         Schulungsanbieter
 """
 
-    def generate_purchase_orders(self, n=100):
+    def generate_purchase_orders(self, n=100, start=0, stratified=False):
         """Generate 15 different purchase order variations"""
         orders = []
         
@@ -1339,9 +1345,9 @@ Auftraggeber                         Schulungsanbieter
 
         ]
         
-        for i in range(n):
-            template = random.choice(templates)
-            orders.append({'text': template(i), 'label': 'Bestellung'})
+        for i in range(start, start + n):
+            template = self._choose_template(templates, i, stratified)
+            orders.append({'text': template(i), 'label': 'Bestellung', 'template_id': template.__name__.lstrip('_')})
         
         return orders
     
@@ -1505,7 +1511,7 @@ Email: {random.choice(self.names).lower().replace(' ', '.')}@company.de
 Zahlungsbedingungen: Netto 30 Tage nach Rechnungserhalt
 """
 
-    def generate_reminders(self, n=100):
+    def generate_reminders(self, n=100, start=0, stratified=False):
         """Generate 15 different reminder variations"""
         reminders = []
         
@@ -1527,9 +1533,9 @@ Zahlungsbedingungen: Netto 30 Tage nach Rechnungserhalt
             # self._reminder_template_pre_legal
         ]
         
-        for i in range(n):
-            template = random.choice(templates)
-            reminders.append({'text': template(i), 'label': 'Mahnung'})
+        for i in range(start, start + n):
+            template = self._choose_template(templates, i, stratified)
+            reminders.append({'text': template(i), 'label': 'Mahnung', 'template_id': template.__name__.lstrip('_')})
         
         return reminders
 
@@ -1657,7 +1663,7 @@ gerichtliche Schritte einleiten.
 Rechtsanwaltskanzlei Müller & Partner
 """
 
-    def generate_complaints(self, n=100):
+    def generate_complaints(self, n=100, start=0, stratified=False):
         """Generate 15 different complaint variations"""
         complaints = []
         
@@ -1679,9 +1685,9 @@ Rechtsanwaltskanzlei Müller & Partner
             # self._complaint_template_follow_up
         ]
         
-        for i in range(n):
-            template = random.choice(templates)
-            complaints.append({'text': template(i), 'label': 'Reklamation'})
+        for i in range(start, start + n):
+            template = self._choose_template(templates, i, stratified)
+            complaints.append({'text': template(i), 'label': 'Reklamation', 'template_id': template.__name__.lstrip('_')})
         
         return complaints
 
@@ -1746,30 +1752,10 @@ Hochachtungsvoll
         """
         Balance the dataset to have equal number of samples per class
         """
-        if target_count_per_class is None:
-            # Use the minority class count
-            target_count_per_class = df['label'].value_counts().min()
-        
-        balanced_dfs = []
-        
-        for label in df['label'].unique():
-            label_df = df[df['label'] == label]
-            
-            if len(label_df) >= target_count_per_class:
-                # Downsample
-                balanced_label_df = label_df.sample(target_count_per_class, random_state=42)
-            else:
-                # Upsample with replacement
-                balanced_label_df = resample(label_df, 
-                                           replace=True, 
-                                           n_samples=target_count_per_class, 
-                                           random_state=42)
-            balanced_dfs.append(balanced_label_df)
-        
-        balanced_df = pd.concat(balanced_dfs, ignore_index=True)
-        balanced_df = balanced_df.sample(frac=1, random_state=42).reset_index(drop=True)
-        
-        return balanced_df
+        # Minority class count by default; down-/up-sampling via index arrays over label codes
+        codes, _ = pd.factorize(df['label'])
+        indices = balance_indices(codes, target_count_per_class, random_state=42)
+        return df.iloc[indices].reset_index(drop=True)
 
     def save_dataset_csv(self, df, output_dir):
         """Save dataset as CSV only"""
@@ -1813,7 +1799,8 @@ Hochachtungsvoll
         
         return files_written
 
-def save_all_synthetic_as_text_files(per_category=200, output_dir="app/data/synthetic", overwrite=False):
+def save_all_synthetic_as_text_files(per_category=200, output_dir="app/data/synthetic", overwrite=False,
+                                     stratified=False):
     """
     Generate all document types and save each one as a separate .txt file
     
@@ -1821,6 +1808,7 @@ def save_all_synthetic_as_text_files(per_category=200, output_dir="app/data/synt
         per_category: Number of documents to generate per category
         output_dir: Directory to save all .txt files
         overwrite: Whether to overwrite existing files
+        stratified: Cycle through the templates so every template gets the same count
     
     Returns:
         Dictionary with statistics about generated files
@@ -1848,13 +1836,14 @@ def save_all_synthetic_as_text_files(per_category=200, output_dir="app/data/synt
         print(f"📝 Generating {category} documents...")
         
         # Generate documents for this category
-        documents = generate_func(per_category)
+        documents = generate_func(per_category, stratified=stratified)
         
         category_dir = output_path / category
         category_dir.mkdir(exist_ok=True)
         
         # Save each document as a separate .txt file
         files_written = 0
+        template_ids = {}
         for i, doc in enumerate(documents, start=1):
             filename = category_dir / f"{category.rstrip('s')}_v1_{i}.txt"
             
@@ -1867,7 +1856,10 @@ def save_all_synthetic_as_text_files(per_category=200, output_dir="app/data/synt
             
             # Write to file
             filename.write_text(text_content, encoding='utf-8')
+            if isinstance(doc, dict) and doc.get('template_id'):
+                template_ids[filename.name] = doc['template_id']
             files_written += 1
+        update_template_ids(category_dir, template_ids)
         
         stats[category] = files_written
         total_files += files_written
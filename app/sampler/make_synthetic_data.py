@@ -1,8 +1,12 @@
 import random
+from collections import defaultdict
 from pathlib import Path
-from typing import Optional, Sequence
+from typing import Callable, Dict, Optional, Sequence
 from faker import Faker
 
+from app.sampler.template_ids import update_template_ids
+from app.sampler.value_pools import DEFAULT_POOL_SIZE, FakerPools, LiveFaker
+
 
 class SyntheticDocumentGenerator:
     """Generate German business documents and persist them as .txt files."""
@@ -13,14 +17,25 @@ class SyntheticDocumentGenerator:
         output_dir: str = "app/data/synthetic",
         locales: Optional[Sequence[str]] = None,
         seed: Optional[int] = None,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        stratified: bool = False,
+        start_index: int = 0,
     ) -> None:
-        self.fake = Faker(locales or ["de_DE", "de_AT", "de_CH"])
+        """
+        `pool_size=0` calls Faker for every value instead of sampling precomputed pools.
+        `stratified` cycles through the templates of a category (starting at document
+        `start_index`) instead of picking them at random, so every template gets the same count.
+        """
+        locales = list(locales or ["de_DE", "de_AT", "de_CH"])
         if seed is not None:
             Faker.seed(seed)
             random.seed(seed)
+        self.values = FakerPools(locales, pool_size, seed=seed) if pool_size else LiveFaker(Faker(locales))
         self.per_category = per_category
+        self.last_template_id: Optional[str] = None
+        self.stratified = stratified
+        self._documents_made: Dict[str, int] = defaultdict(lambda: start_index)
         self.output_dir = Path(output_dir)
-        self.output_dir.mkdir(parents=True, exist_ok=True)
         self.generators = {
             "invoices": self.make_invoice,
             "contracts": self.make_contract,
@@ -29,235 +44,243 @@ class SyntheticDocumentGenerator:
             "complaints": self.make_complaint,
         }
 
+    def _pick(self, kind: str, templates: Sequence[Callable[[], str]]) -> str:
+        """Choose a template, remember its id and render only that one."""
+        if self.stratified:
+            index = self._documents_made[kind] % len(templates)
+            self._documents_made[kind] += 1
+        else:
+            index = random.randrange(len(templates))
+        self.last_template_id = f"{kind}_{index}"
+        return templates[index]()
+
     def random_date(self) -> str:
-        return self.fake.date_between(start_date="-2y", end_date="today").strftime(
-            "%d.%m.%Y"
-        )
+        return self.values.random_date()
 
     # ------------------ INVOICE (Rechnung) ------------------
     def make_invoice(self):
         templates = [
-            f"""Rechnung Nr. {self.fake.random_int(1000,9999)}
-Datum: {self.random_date()}
-Kunde: {self.fake.name()}
-{self.fake.company()}, {self.fake.address()}
+            lambda: f"""Rechnung Nr. {random.randint(1000,9999)}
+Datum: {self.values.random_date()}
+Kunde: {self.values.name()}
+{self.values.company()}, {self.values.address()}
 
 Pos. | Beschreibung             | Betrag (EUR)
-1    | {self.fake.word().capitalize()}                | {random.randint(100,800)}
-2    | {self.fake.word().capitalize()}                | {random.randint(50,600)}
+1    | {self.values.word().capitalize()}                | {random.randint(100,800)}
+2    | {self.values.word().capitalize()}                | {random.randint(50,600)}
 
 Zwischensumme: {random.randint(400,1500)} EUR
 MwSt (19%): {round(random.uniform(10,300),2)} EUR
 Gesamtbetrag: {random.randint(500,5000)} EUR
-Bitte überweisen Sie den Betrag bis {self.fake.date_this_month()}.
+Bitte überweisen Sie den Betrag bis {self.values.date_this_month()}.
 
 Mit freundlichen Grüßen,
-{self.fake.company()}
+{self.values.company()}
 """,
-            f"""Rechnung
-Rechnungsnummer: {self.fake.random_int(1000,9999)}
-Rechnungsdatum: {self.random_date()}
+            lambda: f"""Rechnung
+Rechnungsnummer: {random.randint(1000,9999)}
+Rechnungsdatum: {self.values.random_date()}
 
-Leistungszeitraum: {self.fake.date_this_year()} - {self.fake.date_this_year()}
-Empfänger: {self.fake.name()}, {self.fake.company()}
+Leistungszeitraum: {self.values.date_this_year()} - {self.values.date_this_year()}
+Empfänger: {self.values.name()}, {self.values.company()}
 Summe: {random.randint(200,3000)} EUR
 Zahlungsziel: 14 Tage ab Rechnungsdatum.
 """,
-            f"""*** RECHNUNG ***
-Von: {self.fake.company()}
-An: {self.fake.name()}
-Rechnungsdatum: {self.random_date()}
+            lambda: f"""*** RECHNUNG ***
+Von: {self.values.company()}
+An: {self.values.name()}
+Rechnungsdatum: {self.values.random_date()}
 Betrag: {random.randint(100,5000)} EUR
 
-Bitte zahlen Sie auf Konto IBAN DE{self.fake.random_int(10000000000000000000,99999999999999999999)}.
+Bitte zahlen Sie auf Konto IBAN DE{random.randint(10000000000000000000,99999999999999999999)}.
 """,
-            f"""RECHNUNG - {self.fake.company()}
-Kunde: {self.fake.name()}
-Adresse: {self.fake.address()}
-Rechnungsdatum: {self.random_date()}
+            lambda: f"""RECHNUNG - {self.values.company()}
+Kunde: {self.values.name()}
+Adresse: {self.values.address()}
+Rechnungsdatum: {self.values.random_date()}
 Zahlungsbedingungen: 30 Tage netto
 Gesamt: {random.randint(500,7000)} EUR
 """,
-            f"""Rechnung {self.fake.random_int(1000,9999)}
-Firma: {self.fake.company()}
-Empfänger: {self.fake.name()}
-Leistung: {self.fake.catch_phrase()}
+            lambda: f"""Rechnung {random.randint(1000,9999)}
+Firma: {self.values.company()}
+Empfänger: {self.values.name()}
+Leistung: {self.values.catch_phrase()}
 Preis: {random.randint(300,5000)} EUR (inkl. MwSt)
 """,
-            f"""Rechnungsbeleg
-Firma: {self.fake.company()}
-Adresse: {self.fake.address()}
-Rechnung Nr.: {self.fake.random_int(1000,9999)} | Datum: {self.random_date()}
+            lambda: f"""Rechnungsbeleg
+Firma: {self.values.company()}
+Adresse: {self.values.address()}
+Rechnung Nr.: {random.randint(1000,9999)} | Datum: {self.values.random_date()}
 Gesamtbetrag: {random.randint(100,4000)} EUR
-Fällig am: {self.fake.date_this_month()}
+Fällig am: {self.values.date_this_month()}
 """,
         ]
-        return random.choice(templates)
+        return self._pick("invoice", templates)
 
     # ------------------ CONTRACT (Vertrag) ------------------
     def make_contract(self):
         templates = [
-            f"""Dienstleistungsvertrag
-Zwischen {self.fake.company()} (Auftragnehmer)
-und {self.fake.company()} (Auftraggeber)
+            lambda: f"""Dienstleistungsvertrag
+Zwischen {self.values.company()} (Auftragnehmer)
+und {self.values.company()} (Auftraggeber)
 
-Vertragsbeginn: {self.random_date()}
+Vertragsbeginn: {self.values.random_date()}
 Laufzeit: {random.randint(6,36)} Monate
-Leistungsumfang: {self.fake.catch_phrase()}
+Leistungsumfang: {self.values.catch_phrase()}
 Kündigungsfrist: 3 Monate zum Vertragsende.
 """,
-            f"""Kaufvertrag
-Verkäufer: {self.fake.company()}
-Käufer: {self.fake.company()}
-Ware: {self.fake.word().capitalize()}
+            lambda: f"""Kaufvertrag
+Verkäufer: {self.values.company()}
+Käufer: {self.values.company()}
+Ware: {self.values.word().capitalize()}
 Preis: {random.randint(500,8000)} EUR
-Lieferdatum: {self.fake.date_this_month()}
+Lieferdatum: {self.values.date_this_month()}
 """,
-            f"""Vertrag über Zusammenarbeit
-Dieser Vertrag wird zwischen {self.fake.company()} und {self.fake.company()} geschlossen.
-Beginn: {self.random_date()}
-Ziel: Förderung gemeinsamer Projekte im Bereich {self.fake.word()}.
+            lambda: f"""Vertrag über Zusammenarbeit
+Dieser Vertrag wird zwischen {self.values.company()} und {self.values.company()} geschlossen.
+Beginn: {self.values.random_date()}
+Ziel: Förderung gemeinsamer Projekte im Bereich {self.values.word()}.
 """,
-            f"""Mietvertrag
-Vermieter: {self.fake.company()}
-Mieter: {self.fake.name()}
-Objekt: {self.fake.address()}
+            lambda: f"""Mietvertrag
+Vermieter: {self.values.company()}
+Mieter: {self.values.name()}
+Objekt: {self.values.address()}
 Monatsmiete: {random.randint(800,2500)} EUR
-Vertragsbeginn: {self.random_date()}
+Vertragsbeginn: {self.values.random_date()}
 """,
-            f"""Arbeitsvertrag
-Arbeitgeber: {self.fake.company()}
-Arbeitnehmer: {self.fake.name()}
-Beginn: {self.random_date()}
-Tätigkeit: {self.fake.job()}
+            lambda: f"""Arbeitsvertrag
+Arbeitgeber: {self.values.company()}
+Arbeitnehmer: {self.values.name()}
+Beginn: {self.values.random_date()}
+Tätigkeit: {self.values.job()}
 Vergütung: {random.randint(2500,6000)} EUR monatlich.
 """,
-            f"""Kooperationsvertrag
-Zwischen {self.fake.company()} und {self.fake.company()}.
+            lambda: f"""Kooperationsvertrag
+Zwischen {self.values.company()} und {self.values.company()}.
 Vertragsdauer: {random.randint(12,48)} Monate
 Kündigung: schriftlich, Frist 4 Wochen.
-Ort, Datum: {self.fake.city()}, {self.random_date()}
+Ort, Datum: {self.values.city()}, {self.values.random_date()}
 """,
         ]
-        return random.choice(templates)
+        return self._pick("contract", templates)
 
     # ------------------ PURCHASE ORDER (Bestellung) ------------------
     def make_order(self):
         templates = [
-            f"""Bestellung Nr. {self.fake.random_int(1000,9999)}
-Datum: {self.random_date()}
+            lambda: f"""Bestellung Nr. {random.randint(1000,9999)}
+Datum: {self.values.random_date()}
 Wir bestellen folgende Artikel:
-- {self.fake.word()} ({random.randint(1,50)} Stück)
-- {self.fake.word()} ({random.randint(1,20)} Stück)
-Liefertermin: {self.fake.date_this_month()}
+- {self.values.word()} ({random.randint(1,50)} Stück)
+- {self.values.word()} ({random.randint(1,20)} Stück)
+Liefertermin: {self.values.date_this_month()}
 """,
-            f"""Auftragsbestätigung / Bestellung
-Kunde: {self.fake.company()}
+            lambda: f"""Auftragsbestätigung / Bestellung
+Kunde: {self.values.company()}
 Artikelübersicht:
-{self.fake.word()} – Menge: {random.randint(10,200)} – Preis: {random.randint(100,3000)} EUR
-Versand: DHL | Lieferadresse: {self.fake.address()}
+{self.values.word()} – Menge: {random.randint(10,200)} – Preis: {random.randint(100,3000)} EUR
+Versand: DHL | Lieferadresse: {self.values.address()}
 """,
-            f"""Bestellformular
-Firma: {self.fake.company()}
-An: {self.fake.company()}
-Datum: {self.random_date()}
-Bestellung: {self.fake.word()} – {random.randint(5,100)} Stück
+            lambda: f"""Bestellformular
+Firma: {self.values.company()}
+An: {self.values.company()}
+Datum: {self.values.random_date()}
+Bestellung: {self.values.word()} – {random.randint(5,100)} Stück
 Zahlungsart: Rechnung
 """,
-            f"""Einkaufsbestellung
+            lambda: f"""Einkaufsbestellung
 Abteilung: Einkauf
-Lieferant: {self.fake.company()}
-Artikel: {self.fake.word().capitalize()}, Preis: {random.randint(100,1000)} EUR
-Lieferung bis: {self.fake.date_this_month()}
+Lieferant: {self.values.company()}
+Artikel: {self.values.word().capitalize()}, Preis: {random.randint(100,1000)} EUR
+Lieferung bis: {self.values.date_this_month()}
 """,
-            f"""Online-Bestellung
-Kundennummer: {self.fake.random_int(10000,99999)}
-Produkt: {self.fake.word()} ({random.randint(1,10)}x)
+            lambda: f"""Online-Bestellung
+Kundennummer: {random.randint(10000,99999)}
+Produkt: {self.values.word()} ({random.randint(1,10)}x)
 Gesamtbetrag: {random.randint(100,2500)} EUR
 Bezahlmethode: PayPal
 """,
-            f"""Bestellung
+            lambda: f"""Bestellung
 Sehr geehrte Damen und Herren,
-bitte liefern Sie uns folgende Produkte bis {self.fake.date_this_month()}:
-- {self.fake.word()} ({random.randint(2,15)} Stück)
-- {self.fake.word()} ({random.randint(1,5)} Stück)
+bitte liefern Sie uns folgende Produkte bis {self.values.date_this_month()}:
+- {self.values.word()} ({random.randint(2,15)} Stück)
+- {self.values.word()} ({random.randint(1,5)} Stück)
 Mit freundlichen Grüßen,
-{self.fake.name()}
+{self.values.name()}
 """,
         ]
-        return random.choice(templates)
+        return self._pick("order", templates)
 
     # ------------------ PAYMENT REMINDER (Zahlungserinnerung) ------------------
     def make_reminder(self):
         templates = [
-            f"""Zahlungserinnerung
+            lambda: f"""Zahlungserinnerung
 Sehr geehrte Damen und Herren,
-unsere Rechnung Nr. {self.fake.random_int(1000,9999)} vom {self.random_date()} ist noch offen.
+unsere Rechnung Nr. {random.randint(1000,9999)} vom {self.values.random_date()} ist noch offen.
 Bitte begleichen Sie den Betrag von {random.randint(100,2000)} EUR innerhalb von 7 Tagen.
 """,
-            f"""Mahnung
-Kundennummer: {self.fake.random_int(10000,99999)}
-Offene Rechnung Nr. {self.fake.random_int(1000,9999)}.
+            lambda: f"""Mahnung
+Kundennummer: {random.randint(10000,99999)}
+Offene Rechnung Nr. {random.randint(1000,9999)}.
 Wir fordern Sie auf, den Betrag von {random.randint(100,5000)} EUR umgehend zu zahlen.
 """,
-            f"""Letzte Mahnung
+            lambda: f"""Letzte Mahnung
 Sehr geehrte Damen und Herren,
 trotz mehrfacher Erinnerung ist Ihre Zahlung noch nicht eingegangen.
 Gesamtforderung: {random.randint(500,3000)} EUR
 Bitte überweisen Sie sofort.
 """,
-            f"""Erste Zahlungserinnerung
-Rechnung {self.fake.random_int(1000,9999)} vom {self.random_date()}.
+            lambda: f"""Erste Zahlungserinnerung
+Rechnung {random.randint(1000,9999)} vom {self.values.random_date()}.
 Offener Betrag: {random.randint(50,800)} EUR.
-Zahlungsziel: {self.fake.date_this_month()}
+Zahlungsziel: {self.values.date_this_month()}
 """,
-            f"""Freundliche Zahlungserinnerung
-Dies ist eine Erinnerung an Ihre unbezahlte Rechnung Nr. {self.fake.random_int(1000,9999)}.
+            lambda: f"""Freundliche Zahlungserinnerung
+Dies ist eine Erinnerung an Ihre unbezahlte Rechnung Nr. {random.randint(1000,9999)}.
 Gesamtbetrag: {random.randint(300,2000)} EUR
-Zahlung bis spätestens {self.fake.date_this_month()} erbeten.
+Zahlung bis spätestens {self.values.date_this_month()} erbeten.
 """,
-            f"""Mahnung 2. Stufe
+            lambda: f"""Mahnung 2. Stufe
 Offene Forderung: {random.randint(200,1000)} EUR.
 Falls bereits gezahlt, betrachten Sie dieses Schreiben als gegenstandslos.
 """,
         ]
-        return random.choice(templates)
+        return self._pick("reminder", templates)
 
     # ------------------ COMPLAINT (Beschwerde) ------------------
     def make_complaint(self):
         templates = [
-            f"""Beschwerde über Lieferung
-Am {self.random_date()} haben wir beschädigte Ware erhalten ({self.fake.word()}).
+            lambda: f"""Beschwerde über Lieferung
+Am {self.values.random_date()} haben wir beschädigte Ware erhalten ({self.values.word()}).
 Wir bitten um Ersatz oder Gutschrift.
 Mit freundlichen Grüßen,
-{self.fake.name()}, {self.fake.company()}
+{self.values.name()}, {self.values.company()}
 """,
-            f"""Reklamation – Falsche Lieferung
-Unsere Bestellung Nr. {self.fake.random_int(1000,9999)} war unvollständig.
+            lambda: f"""Reklamation – Falsche Lieferung
+Unsere Bestellung Nr. {random.randint(1000,9999)} war unvollständig.
 Bitte prüfen Sie den Vorgang und liefern Sie nach.
 """,
-            f"""Kundenbeschwerde
+            lambda: f"""Kundenbeschwerde
 Sehr geehrtes Serviceteam,
-wir sind mit der Bearbeitung unseres Auftrags Nr. {self.fake.random_int(1000,9999)} unzufrieden.
+wir sind mit der Bearbeitung unseres Auftrags Nr. {random.randint(1000,9999)} unzufrieden.
 Wir bitten um Stellungnahme innerhalb von 5 Werktagen.
 """,
-            f"""Mangelanzeige
-Bei der Lieferung vom {self.random_date()} wurde ein defektes Produkt festgestellt.
-Artikel: {self.fake.word().capitalize()}
+            lambda: f"""Mangelanzeige
+Bei der Lieferung vom {self.values.random_date()} wurde ein defektes Produkt festgestellt.
+Artikel: {self.values.word().capitalize()}
 Bitte senden Sie uns Ersatz.
 """,
-            f"""Reklamation
+            lambda: f"""Reklamation
 Sehr geehrte Damen und Herren,
 die gelieferte Ware entspricht nicht der Bestellung.
 Wir erwarten eine Korrektur oder Rückerstattung.
 """,
-            f"""Beschwerde über Kundenservice
+            lambda: f"""Beschwerde über Kundenservice
 Ich bin unzufrieden mit der Kommunikation Ihres Kundendienstes.
-Ticketnummer: {self.fake.random_int(10000,99999)}
+Ticketnummer: {random.randint(10000,99999)}
 Bitte kontaktieren Sie mich zur Klärung.
 """,
         ]
-        return random.choice(templates)
+        return self._pick("complaint", templates)
 
     def generate_documents(
         self, per_category: Optional[int] = None, overwrite: bool = False
@@ -265,15 +288,19 @@ Bitte kontaktieren Sie mich zur Klärung.
         """Create .txt files for every configured category."""
         per_category = per_category or self.per_category
         files_written = 0
+        self.output_dir.mkdir(parents=True, exist_ok=True)
 
         for category, generator in self.generators.items():
             category_dir = self.output_dir / category
             category_dir.mkdir(exist_ok=True)
+            template_ids = {}
             for i in range(per_category):
                 filename = category_dir / f"{category.rstrip('s')}_v0_{i+1}.txt"
                 if filename.exists() and not overwrite:
                     continue
                 filename.write_text(generator(), encoding="utf-8")
+                template_ids[filename.name] = self.last_template_id
                 files_written += 1
+            update_template_ids(category_dir, template_ids)
 
         return files_written
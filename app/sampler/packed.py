@@ -0,0 +1,201 @@
+"""
+Parallel, sharded synthetic data generation into packed shards.
+
+Instead of one tiny .txt file per document, categories and index ranges are
+split into fixed-size shards that worker processes write as Parquet or JSONL
+files (filename, text, label, template_id). Every shard is seeded only from
+(seed, generator, category, start index), so the output is identical for any
+number of workers. Shard names carry the index range, seed and template mode,
+so a repeated run skips only shards of the same plan; `manifest.json` lists
+the shards of the latest plan, and shards of earlier plans are removed.
+"""
+import json
+import os
+import random
+import zlib
+
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import pandas as pd
+
+SHARD_SIZE = 500
+CATEGORIES = ("invoices", "contracts", "orders", "paymentreminders", "complaints")
+SHARD_COLUMNS = ["filename", "text", "label", "template_id"]
+MANIFEST_FILE = "manifest.json"
+
+
+class ShardSpec(NamedTuple):
+    generator: str  # "v0" (make_synthetic_data) or "v1" (doc_generator), as in the .txt filenames
+    category: str   # folder name, e.g. "invoices"
+    start: int
+    stop: int
+
+    def name(self, seed: int, stratified: bool = False) -> str:
+        mode = "stratified" if stratified else "random"
+        return f"shard-{self.generator}-{self.category}-{self.start:07d}-{self.stop:07d}-seed{seed}-{mode}"
+
+
+def shard_seed(seed: int, spec: ShardSpec) -> int:
+    """Deterministic per-shard seed (CRC32, unlike hash() not salted per process)."""
+    return zlib.crc32(f"{seed}:{spec.generator}:{spec.category}:{spec.start}".encode("utf-8"))
+
+
+def plan_shards(per_generator: Dict[str, int], shard_size: int = SHARD_SIZE) -> List[ShardSpec]:
+    """Split `{"v0": n, "v1": m}` documents per category into fixed index ranges."""
+    return [
+        ShardSpec(generator, category, start, min(start + shard_size, n))
+        for generator, n in per_generator.items()
+        for category in CATEGORIES
+        for start in range(0, n, shard_size)
+    ]
+
+
+def per_generator_from_config(synthetic_config: Dict) -> Dict[str, int]:
+    """Documents per category and generator from the `synthetic_data` section of config.yaml."""
+    # per_category_v0 drives doc_generator ("_v1_" files), per_category_v1 make_synthetic_data ("_v0_" files)
+    return {"v0": synthetic_config["per_category_v1"], "v1": synthetic_config["per_category_v0"]}
+
+
+@contextmanager
+def _isolated_random() -> Iterator[None]:
+    """
+    The generators seed the process-global `random` and Faker's shared RNG. Restore both
+    afterwards, so generating in a trainer or API process does not reseed its random numbers.
+    """
+    from faker.generator import random as faker_random
+
+    states = random.getstate(), faker_random.getstate()
+    try:
+        yield
+    finally:
+        random.setstate(states[0])
+        faker_random.setstate(states[1])
+
+
+def _iter_v0(spec: ShardSpec, seed: int, stratified: bool) -> Iterator[Tuple[str, str]]:
+    from app.sampler.make_synthetic_data import SyntheticDocumentGenerator
+
+    generator = SyntheticDocumentGenerator(per_category=0, seed=seed, stratified=stratified, start_index=spec.start)
+    make = generator.generators[spec.category]
+    for _ in range(spec.start, spec.stop):
+        text = make()
+        yield generator.last_template_id, text
+
+
+def _iter_v1(spec: ShardSpec, seed: int, stratified: bool) -> Iterator[Tuple[str, str]]:
+    from app.sampler.doc_generator import GermanDocumentGenerator
+
+    random.seed(seed)
+    generator = GermanDocumentGenerator()
+    generate = {
+        "invoices": generator.generate_invoices,
+        "contracts": generator.generate_contracts,
+        "orders": generator.generate_purchase_orders,
+        "paymentreminders": generator.generate_reminders,
+        "complaints": generator.generate_complaints,
+    }[spec.category]
+    for doc in generate(spec.stop - spec.start, start=spec.start, stratified=stratified):
+        yield doc["template_id"], doc["text"]
+
+
+def shard_rows(spec: ShardSpec, seed: int, label_map: Dict[str, str],
+               stratified: bool = False) -> List[Dict[str, str]]:
+    """
+    Documents of one shard as rows (filename, text, label, template_id), in memory.
+    With `stratified`, templates are assigned round-robin by document index, so every
+    template of a category gets the same count regardless of the sharding.
+    """
+    documents = _iter_v0 if spec.generator == "v0" else _iter_v1
+    prefix = f"{spec.category.rstrip('s')}_{spec.generator}"
+    label = label_map.get(spec.category, spec.category)
+    with _isolated_random():
+        return [
+            {"filename": f"{prefix}_{i + 1}", "text": text, "label": label, "template_id": template_id}
+            for i, (template_id, text) in zip(range(spec.start, spec.stop), documents(spec, shard_seed(seed, spec), stratified))
+        ]
+
+
+def generate_shard(spec: ShardSpec, output_dir: str, seed: int, label_map: Dict[str, str],
+                   fmt: str = "parquet", overwrite: bool = False, stratified: bool = False) -> Tuple[Path, bool]:
+    """Generate one shard in a worker process; returns (path, written)."""
+    output_path = Path(output_dir) / f"{spec.name(seed, stratified)}.{fmt}"
+    if output_path.exists() and not overwrite:
+        return output_path, False
+
+    rows = shard_rows(spec, seed, label_map, stratified)
+
+    # Write to a temp file first, so an interrupted run never leaves a truncated shard behind
+    tmp_path = output_path.with_suffix(output_path.suffix + ".tmp")
+    if fmt == "parquet":
+        pd.DataFrame(rows, columns=SHARD_COLUMNS).to_parquet(tmp_path, index=False, compression="zstd")
+    else:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+    os.replace(tmp_path, output_path)
+    return output_path, True
+
+
+def generate_packed(
+    per_generator: Dict[str, int],
+    output_dir: str,
+    label_map: Dict[str, str],
+    seed: int = 42,
+    workers: Optional[int] = None,
+    shard_size: int = SHARD_SIZE,
+    fmt: str = "parquet",
+    overwrite: bool = False,
+    stratified: bool = False,
+) -> List[Path]:
+    """Generate all shards with a process pool; the result does not depend on `workers`."""
+    if fmt not in ("parquet", "jsonl"):
+        raise ValueError(f"Unsupported shard format: {fmt}")
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+
+    specs = plan_shards(per_generator, shard_size)
+    print(f"Generating {len(specs)} shards ({per_generator}) with {workers or os.cpu_count()} workers...")
+    paths, written = [], 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(generate_shard, spec, str(output_path), seed, label_map, fmt, overwrite, stratified)
+            for spec in specs
+        ]
+        for future in futures:
+            path, was_written = future.result()
+            paths.append(path)
+            written += was_written
+
+    # Only the shards of this plan are read later; shards of earlier plans would be stale
+    current = {path.name for path in paths}
+    stale = [path for path in output_path.glob("shard-*") if path.name not in current]
+    for path in stale:
+        path.unlink()
+    (output_path / MANIFEST_FILE).write_text(json.dumps({
+        "per_generator": per_generator, "seed": seed, "shard_size": shard_size, "format": fmt,
+        "stratified": stratified, "shards": sorted(current),
+    }, indent=4))
+
+    print(f"✅ {written} shards written, {len(paths) - written} already present, {len(stale)} stale removed")
+    print(f"📁 Location: {output_path.absolute()}")
+    return paths
+
+
+def packed_shard_paths(shard_dir: Path) -> List[Path]:
+    """Shards of the latest `generate_packed` plan (empty if it never ran in `shard_dir`)."""
+    manifest = Path(shard_dir) / MANIFEST_FILE
+    if not manifest.exists():
+        return []
+    return [Path(shard_dir) / name for name in json.loads(manifest.read_text())["shards"]]
+
+
+def read_packed_shards(shard_dir: Path) -> Iterator[pd.DataFrame]:
+    """Yield one DataFrame per shard (Parquet or JSONL) of the current plan, in a stable order."""
+    for path in packed_shard_paths(shard_dir):
+        if path.suffix == ".parquet":
+            yield pd.read_parquet(path, columns=SHARD_COLUMNS)
+        elif path.suffix == ".jsonl":
+            yield pd.read_json(path, lines=True, dtype={"template_id": str})[SHARD_COLUMNS]
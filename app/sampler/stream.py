@@ -0,0 +1,38 @@
+"""
+Synthetic documents straight into training, without writing files.
+
+Documents are generated shard by shard with the same plan and seeds as the
+packed output (app.sampler.packed), cleaned with `clean_text` one shard at a
+time and handed over as Arrow record batches. Nothing touches the disk, so
+augmentation experiments can regenerate data on every run.
+"""
+from typing import Dict, Iterator
+
+import pyarrow as pa
+
+from app.core.utils import clean_text
+from app.sampler.packed import SHARD_SIZE, plan_shards, shard_rows
+
+
+def iter_synthetic_batches(
+    per_generator: Dict[str, int],
+    label_map: Dict[str, str],
+    seed: int = 42,
+    shard_size: int = SHARD_SIZE,
+    stratified: bool = False,
+) -> Iterator[pa.RecordBatch]:
+    """Yield one cleaned (text, label, template_id) batch per shard; empty texts are dropped."""
+    for spec in plan_shards(per_generator, shard_size):
+        rows = shard_rows(spec, seed, label_map, stratified)
+        texts = [clean_text(row["text"]) for row in rows]
+        keep = [i for i, text in enumerate(texts) if text]
+        if not keep:
+            continue
+        yield pa.RecordBatch.from_arrays(
+            [
+                pa.array([texts[i] for i in keep], pa.string()),
+                pa.array([rows[i]["label"] for i in keep], pa.string()),
+                pa.array([rows[i]["template_id"] for i in keep], pa.string()),
+            ],
+            names=["text", "label", "template_id"],
+        )
@@ -0,0 +1,32 @@
+# template_ids.py
+"""
+Template ids of synthetic documents written as one `.txt` file each.
+
+Packed shards carry a `template_id` column; for the `.txt` layout every category
+folder gets a `template_ids.json` ({filename: template_id}) next to its files, so
+`--prepare` can fill the same column and `data_split.template_split` works for both.
+"""
+import json
+
+from pathlib import Path
+from typing import Dict
+
+TEMPLATE_IDS_FILE = "template_ids.json"
+
+
+def read_template_ids(category_dir) -> Dict[str, str]:
+    path = Path(category_dir) / TEMPLATE_IDS_FILE
+    if not path.is_file():
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def update_template_ids(category_dir, template_ids: Dict[str, str]) -> None:
+    """Merge the ids of newly written files (skipped existing files keep their recorded id)."""
+    if not template_ids:
+        return
+    merged = {**read_template_ids(category_dir), **template_ids}
+    path = Path(category_dir) / TEMPLATE_IDS_FILE
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(dict(sorted(merged.items())), f, indent=1)
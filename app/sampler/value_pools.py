@@ -0,0 +1,140 @@
+"""
+Precomputed Faker value pools for synthetic document generation.
+
+Faker is slow per call (address/company providers run their own formatters).
+Instead of calling it for every placeholder, a few thousand values per field and
+locale are generated once per process, and templates draw from these pools with
+a seeded NumPy generator. Dates are precomputed as formatted strings, too.
+"""
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+DEFAULT_POOL_SIZE = 2000
+FAKER_FIELDS = ("company", "name", "address", "word", "catch_phrase", "job", "city")
+
+# Random draws are made in blocks; one NumPy call per value would cost more than the lookup
+_DRAW_BLOCK = 4096
+
+
+@lru_cache(maxsize=None)
+def _locale_pool(locale: str, field: str, size: int, seed: int) -> Tuple[str, ...]:
+    from faker import Faker
+
+    fake = Faker(locale)
+    fake.seed_instance(seed)
+    provider = getattr(fake, field)
+    return tuple(provider() for _ in range(size))
+
+
+def _date_range(start: date, end: date, fmt: Optional[str]) -> List[str]:
+    days = (end - start).days
+    dates = (start + timedelta(days=d) for d in range(days + 1))
+    return [d.strftime(fmt) if fmt else d.isoformat() for d in dates]
+
+
+class FakerPools:
+    """Faker-like accessors (`company()`, `name()`, ...) backed by precomputed pools."""
+
+    def __init__(
+        self,
+        locales: Sequence[str],
+        size: int = DEFAULT_POOL_SIZE,
+        seed: Optional[int] = None,
+        pool_seed: int = 42,
+    ) -> None:
+        # Pools only depend on (locale, size, pool_seed), so every generator in a process
+        # shares them; `seed` only drives which values are drawn
+        per_locale = max(1, size // len(locales))
+        self._pools: Dict[str, Tuple[str, ...]] = {
+            field: sum((_locale_pool(locale, field, per_locale, pool_seed) for locale in locales), ())
+            for field in FAKER_FIELDS
+        }
+        today = date.today()
+        # Same ranges as Faker's date_between("-2y", "today"), date_this_month() and date_this_year()
+        self._pools["random_date"] = tuple(_date_range(today - timedelta(days=730), today, "%d.%m.%Y"))
+        self._pools["date_this_month"] = tuple(_date_range(today.replace(day=1), today, None))
+        self._pools["date_this_year"] = tuple(_date_range(today.replace(month=1, day=1), today, None))
+
+        self._rng = np.random.default_rng(seed)
+        self._uniform = np.empty(0)
+        self._next = 0
+
+    def _draw(self, field: str) -> str:
+        if self._next == len(self._uniform):
+            self._uniform = self._rng.random(_DRAW_BLOCK)
+            self._next = 0
+        pool = self._pools[field]
+        value = pool[int(self._uniform[self._next] * len(pool))]
+        self._next += 1
+        return value
+
+    def company(self) -> str:
+        return self._draw("company")
+
+    def name(self) -> str:
+        return self._draw("name")
+
+    def address(self) -> str:
+        return self._draw("address")
+
+    def word(self) -> str:
+        return self._draw("word")
+
+    def catch_phrase(self) -> str:
+        return self._draw("catch_phrase")
+
+    def job(self) -> str:
+        return self._draw("job")
+
+    def city(self) -> str:
+        return self._draw("city")
+
+    def random_date(self) -> str:
+        return self._draw("random_date")
+
+    def date_this_month(self) -> str:
+        return self._draw("date_this_month")
+
+    def date_this_year(self) -> str:
+        return self._draw("date_this_year")
+
+
+class LiveFaker:
+    """Same accessors, but every value is a fresh Faker call (the behaviour without pools)."""
+
+    def __init__(self, fake) -> None:
+        # A multi-locale Faker picks the locale on attribute access, so look providers up per call
+        self.fake = fake
+
+    def company(self) -> str:
+        return self.fake.company()
+
+    def name(self) -> str:
+        return self.fake.name()
+
+    def address(self) -> str:
+        return self.fake.address()
+
+    def word(self) -> str:
+        return self.fake.word()
+
+    def catch_phrase(self) -> str:
+        return self.fake.catch_phrase()
+
+    def job(self) -> str:
+        return self.fake.job()
+
+    def city(self) -> str:
+        return self.fake.city()
+
+    def random_date(self) -> str:
+        return self.fake.date_between(start_date="-2y", end_date="today").strftime("%d.%m.%Y")
+
+    def date_this_month(self) -> str:
+        return self.fake.date_this_month().isoformat()
+
+    def date_this_year(self) -> str:
+        return self.fake.date_this_year().isoformat()
@@ -0,0 +1,65 @@
+# adapters.py
+"""
+Serve several LoRA adapter folders (app.core.lora) from one copy of their base model.
+
+The base model is loaded once per (base model, number of labels); every adapter
+folder is attached to it under its own adapter name. Because the LoRA updates
+are not merged into the shared weights, switching is just `set_adapter`, done
+per forward pass under the host lock.
+"""
+import threading
+
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Tuple
+
+from app.core.lora import adapter_base_model, load_base_model
+
+_HOSTS: Dict[Tuple[str, int], "AdapterHost"] = {}
+_HOSTS_LOCK = threading.Lock()
+
+
+class AdapterHost:
+    """One frozen base model with any number of LoRA adapters attached."""
+
+    def __init__(self, base_model: str, num_labels: int, device) -> None:
+        self.base_model = base_model
+        self.device = device
+        self.model = load_base_model(base_model, num_labels)
+        self.adapters: Dict[str, str] = {}  # adapter folder -> adapter name
+        self.lock = threading.RLock()
+
+    def attach(self, adapter_dir: str) -> str:
+        """Load the adapter (once) and return its name."""
+        from peft import PeftModel
+
+        key = str(Path(adapter_dir).resolve())
+        with self.lock:
+            if key not in self.adapters:
+                # Module dict keys: no dots or slashes, so the path itself can't be the name
+                name = f"adapter_{len(self.adapters)}"
+                if self.adapters:
+                    self.model.load_adapter(key, adapter_name=name)
+                else:
+                    self.model = PeftModel.from_pretrained(self.model, key, adapter_name=name)
+                self.model.to(self.device)
+                self.model.eval()
+                self.adapters[key] = name
+            return self.adapters[key]
+
+    @contextmanager
+    def active(self, name: str) -> Iterator:
+        """The shared model with `name` active; forward passes of other adapters wait."""
+        with self.lock:
+            self.model.set_adapter(name)
+            yield self.model
+
+
+def get_adapter_host(adapter_dir: str, num_labels: int, device) -> AdapterHost:
+    """The host sharing this adapter's base model, created on first use."""
+    key = (adapter_base_model(adapter_dir), num_labels)
+    with _HOSTS_LOCK:
+        if key not in _HOSTS:
+            print(f"🧩 Loading shared base model {key[0]} ({num_labels} labels)")
+            _HOSTS[key] = AdapterHost(key[0], num_labels, device)
+        return _HOSTS[key]
@@ -0,0 +1,196 @@
+# batch.py
+"""
+Offline bulk classification of a directory tree.
+
+Files are processed in chunks: text is extracted in parallel, the chunk is
+classified in batches and written as one part file (Parquet or JSONL). Each
+committed part is recorded in a checkpoint file, so an interrupted run resumes
+without reprocessing finished files and without duplicate rows.
+"""
+import json
+import os
+import sys
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from app.core.ocr import DEFAULT_OCR_CONFIG, OCRConfig
+from app.core.precision import DEFAULT_RUNTIME_CONFIG, RuntimeConfig
+from app.services.predict import DocumentClassifier
+
+# Partial uploads and editor/OS artifacts; everything else is sniffed by detect_file_type,
+# so extensionless or misnamed scans are classified and unsupported types reported as failures
+TEMPORARY_SUFFIXES = {".tmp", ".part", ".partial", ".crdownload", ".download", ".swp"}
+CHECKPOINT_NAME = "_checkpoint.jsonl"
+
+
+def is_candidate_document(name: str) -> bool:
+    """False for hidden files and files that are still being written."""
+    return not (name.startswith((".", "~$")) or name.endswith("~")
+                or Path(name).suffix.lower() in TEMPORARY_SUFFIXES)
+
+
+def iter_documents(input_dir: Path, exclude: Optional[Path] = None) -> Iterator[Path]:
+    """Walk the tree lazily (millions of files) in a stable order, skipping the `exclude` subtree."""
+    exclude = exclude.resolve() if exclude is not None else None
+    for root, dirs, files in os.walk(input_dir):
+        # Hidden folders (.git, .Trash) and the output folder hold no input documents
+        dirs[:] = sorted(d for d in dirs if not d.startswith(".")
+                         and (exclude is None or (Path(root) / d).resolve() != exclude))
+        for name in sorted(files):
+            if is_candidate_document(name):
+                yield Path(root) / name
+
+
+class Checkpoint:
+    """Append-only log of committed part files and the documents they contain."""
+
+    def __init__(self, output_dir: Path) -> None:
+        self.path = output_dir / CHECKPOINT_NAME
+        self.done: Set[str] = set()
+        self.parts: Set[str] = set()
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A torn last line from a crash: its part was never committed
+                        continue
+                    self.parts.add(entry["part"])
+                    self.done.update(entry["files"])
+
+    def commit(self, part_name: str, files: List[str]) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"part": part_name, "files": files}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.parts.add(part_name)
+        self.done.update(files)
+
+
+def _write_part(rows: List[Dict], output_dir: Path, part_name: str, fmt: str) -> None:
+    """Write a part to a temp file and rename it, so readers never see half-written parts."""
+    final_path = output_dir / part_name
+    tmp_path = output_dir / f".{part_name}.tmp"
+    if fmt == "parquet":
+        import pandas as pd
+
+        # Explicit dtypes keep the schema identical across parts, even if a part only has failures
+        df = pd.DataFrame(rows)
+        df = df.astype({c: "float64" for c in df.columns if c == "confidence" or c.startswith("prob_")})
+        df = df.astype({c: "string" for c in ("filename", "label", "error")})
+        df.to_parquet(tmp_path, index=False, compression="zstd")
+    else:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+    os.replace(tmp_path, final_path)
+
+
+def _remove_uncommitted_parts(output_dir: Path, checkpoint: Checkpoint) -> None:
+    for path in output_dir.glob("part-*"):
+        if path.name not in checkpoint.parts:
+            print(f"[WARN] Removing uncommitted part from an interrupted run: {path.name}", file=sys.stderr)
+            path.unlink()
+    for path in output_dir.glob(".part-*.tmp"):
+        path.unlink()
+
+
+def _safe_extract(classifier: DocumentClassifier, path: Path) -> Tuple[str, Optional[str]]:
+    try:
+        return classifier.extract_text_from_any(str(path), budget=classifier.new_token_budget()), None
+    except Exception as e:
+        return "", f"{type(e).__name__}: {e}"
+
+
+def classify_directory(
+    input_dir: str,
+    output_dir: str,
+    model_path: str,
+    fmt: str = "parquet",
+    batch_size: int = 16,
+    workers: int = 4,
+    chunk_size: int = 1000,
+    ocr_config: Optional[OCRConfig] = None,
+    runtime_config: Optional[RuntimeConfig] = None,
+) -> Dict[str, int]:
+    """
+    Classify every file below `input_dir` and write part files to `output_dir`; files of
+    unsupported types are recorded with their error.
+
+    Extraction runs in a thread pool: OCR happens in Tesseract subprocesses, so
+    threads keep the cores busy without copying the model into every worker.
+    PyMuPDF is not thread-safe, so PDF parsing and rendering are serialized by
+    `PYMUPDF_LOCK` (app.core.utils); only OCR and other formats run in parallel.
+    """
+    if fmt not in ("parquet", "jsonl"):
+        raise ValueError(f"Unsupported output format: {fmt}")
+
+    input_dir = Path(input_dir)
+    if not input_dir.is_dir():
+        raise FileNotFoundError(f"Input directory not found: {input_dir}")
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    checkpoint = Checkpoint(output_dir)
+    _remove_uncommitted_parts(output_dir, checkpoint)
+    if checkpoint.done:
+        print(f"♻️  Resuming: {len(checkpoint.done)} files already classified")
+
+    classifier = DocumentClassifier(model_path, ocr_config=ocr_config or DEFAULT_OCR_CONFIG,
+                                    runtime_config=runtime_config or DEFAULT_RUNTIME_CONFIG)
+    stats = {"classified": 0, "failed": 0, "skipped": 0}
+    part_index = len(checkpoint.parts)
+    start_time = time.perf_counter()
+
+    def pending() -> Iterator[Path]:
+        for path in iter_documents(input_dir, exclude=output_dir):
+            if path.relative_to(input_dir).as_posix() in checkpoint.done:
+                stats["skipped"] += 1
+                continue
+            yield path
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        documents = pending()
+        while True:
+            chunk = [p for _, p in zip(range(chunk_size), documents)]
+            if not chunk:
+                break
+
+            extracted = list(pool.map(lambda p: _safe_extract(classifier, p), chunk))
+            ok_ids = [i for i, (text, error) in enumerate(extracted) if error is None and text.strip()]
+            predictions = classifier.predict_batch([extracted[i][0] for i in ok_ids], batch_size=batch_size)
+            by_id = dict(zip(ok_ids, predictions))
+
+            rows = []
+            for i, path in enumerate(chunk):
+                pred = by_id.get(i)
+                error = extracted[i][1] or (None if pred else "No text extracted")
+                probabilities = pred["probabilities"] if pred else {}
+                rows.append({
+                    "filename": path.relative_to(input_dir).as_posix(),
+                    "label": pred["label"] if pred else None,
+                    "confidence": pred["confidence"] if pred else None,
+                    # One column per class keeps the full distribution in a flat, columnar layout
+                    **{f"prob_{c}": probabilities.get(str(c)) for c in classifier.label_classes},
+                    "error": error,
+                })
+                stats["classified" if pred else "failed"] += 1
+
+            part_name = f"part-{part_index:05d}.{fmt}"
+            _write_part(rows, output_dir, part_name, fmt)
+            checkpoint.commit(part_name, [r["filename"] for r in rows])
+            part_index += 1
+
+            elapsed = time.perf_counter() - start_time
+            done = stats["classified"] + stats["failed"]
+            print(f"   {done} files in {elapsed:.0f}s ({done / max(elapsed, 1e-9):.1f} files/s), "
+                  f"{stats['failed']} failed, {stats['skipped']} skipped")
+
+    classifier.dump_metrics(str(output_dir / "metrics.prom"))
+    print(f"\n✅ Completed: {stats['classified']} classified, {stats['failed']} failed, {stats['skipped']} skipped")
+    print(f"📄 Output: {output_dir}")
+    return stats
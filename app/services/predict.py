@@ -1,140 +1,301 @@
-
-
-import fitz  # PyMuPDF
-import pytesseract
-import re
-import io
-import mimetypes
-import torch
-import docx  # for DOCX files
-
-import pillow_heif
-pillow_heif.register_heif_opener()
-
-import numpy as np
-from pathlib import Path
-from typing import Dict, Any
+# Heavy dependencies (torch, transformers, PyMuPDF, Tesseract, Pillow) are imported
+# on first use, so importing this module (and the API) stays fast on cold start.
+import copy
+import sys
+import threading
+import time
+from contextlib import nullcontext
+from functools import lru_cache
 from pathlib import Path
-from PIL import Image
-
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
+from typing import Any, Dict, List, Optional
 
+from app.core.filetype import FileType, UnsupportedFileTypeError, detect_file_type
+from app.core.lora import is_adapter_dir
+from app.core.metrics import FILES_TOTAL, MODEL_LOAD_SECONDS, PREDICTIONS_TOTAL, REGISTRY, timed
+from app.core.ocr import DEFAULT_OCR_CONFIG, OCRConfig, ocr_image
+from app.core.precision import DEFAULT_RUNTIME_CONFIG, RuntimeConfig, resolve_runtime
 from app.core.paths import PROJECT_ROOT
-from app.core.utils import clean_text, extract_pdf, load_label_encoder
+from app.core.utils import (
+    TokenBudget, clean_text, collect_until_budget, extract_docx, extract_pdf, iter_text_file,
+    load_label_encoder, load_pil_image_module,
+)
 
 
 # Device detection
-device = (
-    torch.device("cuda") if torch.cuda.is_available() else
-    torch.device("mps") if torch.backends.mps.is_available() else
-    torch.device("cpu")
-)
+@lru_cache(maxsize=None)
+def get_device():
+    import torch
+
+    return (
+        torch.device("cuda") if torch.cuda.is_available() else
+        torch.device("mps") if torch.backends.mps.is_available() else
+        torch.device("cpu")
+    )
 
 # Get APP_DIR (one level up from src/)
 PREDICTION_MODEL = PROJECT_ROOT / "models" / "bert-base-german-cased"
 
 
 class DocumentClassifier:
-    def __init__(self, model_path:str = PREDICTION_MODEL)-> None:
+    def __init__(self, model_path:str = PREDICTION_MODEL, early_stop: bool = True, budget_chunks: int = 1,
+                 ocr_config: OCRConfig = DEFAULT_OCR_CONFIG,
+                 runtime_config: RuntimeConfig = DEFAULT_RUNTIME_CONFIG)-> None:
+        from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
         # Load tokenizer + model
-        self.device = device
+        self.device = get_device()
+        self.model_name = Path(model_path).name
+        load_start = time.perf_counter()
         self.tokenizer = AutoTokenizer.from_pretrained(model_path)
-        self.model = AutoModelForSequenceClassification.from_pretrained(model_path)
-        self.model.to(self.device)   # <-- move model to device
-        self.model.eval()
 
         # Load label classes for ID → Label mapping
         self.label_encoder = load_label_encoder(model_path)
         self.label_classes = self.label_encoder.classes_
 
+        # LoRA adapter folders share one base model with the other adapters (app.services.adapters)
+        self.adapter_host, self.adapter_name = None, None
+        if is_adapter_dir(model_path):
+            from app.services.adapters import get_adapter_host
+
+            self.adapter_host = get_adapter_host(str(model_path), len(self.label_classes), self.device)
+            self.adapter_name = self.adapter_host.attach(str(model_path))
+            self.model = self.adapter_host.model
+        else:
+            self.model = AutoModelForSequenceClassification.from_pretrained(model_path)
+            self.model.to(self.device)   # <-- move model to device
+            self.model.eval()
+
+        # Extraction stops once the cleaned text fills the model input. `budget_chunks` > 1
+        # keeps reading for several input windows (for chunked long-document inference).
+        self.early_stop = early_stop
+        self.budget_chunks = budget_chunks
+        self.max_input_tokens = min(
+            self.tokenizer.model_max_length,
+            getattr(self.model.config, "max_position_embeddings", 512),
+        )
+        # Budgets are counted from extraction threads; a separate tokenizer copy avoids racing
+        # the inference tokenizer's truncation/padding state ("Already borrowed" errors)
+        self._budget_tokenizer = copy.deepcopy(self.tokenizer)
+        self._budget_lock = threading.Lock()
+
+        # Opt-in bf16 autocast / torch.compile (compiling happens here, not on the first request)
+        self.runtime = resolve_runtime(runtime_config, self.device)
+        self.pad_lengths = ()
+        if self.runtime["compile"]:
+            self._compile(runtime_config.warmup_lengths, runtime_config.warmup_batch_size)
+        MODEL_LOAD_SECONDS.set(time.perf_counter() - load_start, model=self.model_name)
+
+        # Tesseract options (--psm/--oem, language) and optional image preprocessing
+        self.ocr_config = ocr_config
+
+    # -----------------------
+    # TOKEN BUDGET
+    # -----------------------
+    def new_token_budget(self) -> Optional[TokenBudget]:
+        if not self.early_stop:
+            return None
+
+        def count_tokens(text: str) -> int:
+            with self._budget_lock:
+                return len(self._budget_tokenizer(text, add_special_tokens=False)["input_ids"])
+
+        return TokenBudget(self.max_input_tokens * self.budget_chunks, count_tokens=count_tokens)
+
+    # -----------------------
+    # TORCH.COMPILE + WARMUP
+    # -----------------------
+    def _compile(self, warmup_lengths, warmup_batch_size: int) -> None:
+        import torch
+
+        if self.adapter_host is not None:
+            # Switching adapters on the shared model would invalidate the compiled graph
+            print(f"[WARN] torch.compile is skipped for LoRA adapter {self.model_name}", file=sys.stderr)
+            self.runtime["compile"] = False
+            return
+
+        self.model = torch.compile(self.model, mode=self.runtime["compile_mode"])
+        # Inputs are padded up to these lengths, so only a handful of shapes ever reach the graph
+        self.pad_lengths = tuple(n for n in warmup_lengths if n < self.max_input_tokens) + (self.max_input_tokens,)
+        # Size 1 is always specialized; once a second batch size or padded length is seen, automatic
+        # dynamic shapes mark that dimension dynamic, so partial batches and the other buckets reuse it
+        batch_sizes = sorted({1, min(2, warmup_batch_size), warmup_batch_size})
+        # Warm up in no_grad like predict_file/predict_batch: dynamo guards on grad mode
+        with timed("compile_warmup"), torch.no_grad():
+            for length in self.pad_lengths:
+                for batch_size in batch_sizes:
+                    inputs = self.tokenizer(
+                        ["warmup"] * batch_size, padding="max_length", max_length=length, return_tensors="pt"
+                    ).to(self.device)
+                    self.forward(inputs)
+        print(f"🔥 Compiled {self.model_name} for sequence lengths {list(self.pad_lengths)}, batch sizes {batch_sizes}")
+
+    def _pad_to_bucket(self, inputs):
+        """Right-pad a tokenized batch to the next warmed-up length (compiled models only)."""
+        import torch
+
+        length = inputs["input_ids"].shape[1]
+        target = next((n for n in self.pad_lengths if n >= length), length)
+        if target == length:
+            return inputs
+        pad_values = {"input_ids": self.tokenizer.pad_token_id or 0}
+        return type(inputs)({
+            key: torch.nn.functional.pad(tensor, (0, target - length), value=pad_values.get(key, 0))
+            for key, tensor in inputs.items()
+        })
+
+    # -----------------------
+    # FORWARD PASS
+    # -----------------------
+    def forward(self, inputs) -> Any:
+        import torch
+
+        if self.pad_lengths:
+            inputs = self._pad_to_bucket(inputs)
+        autocast = (
+            torch.autocast(device_type=self.device.type, dtype=torch.bfloat16)
+            if self.runtime["bf16"] else nullcontext()
+        )
+        with autocast:
+            if self.adapter_host is None:
+                logits = self.model(**inputs).logits
+            else:
+                with self.adapter_host.active(self.adapter_name) as model:
+                    logits = model(**inputs).logits
+        # Softmax and confidences in fp32
+        return logits.float()
 
     # -----------------------
     # EXTRACT TEXT FROM IMAGE (OCR)
     # -----------------------
     def extract_text_from_image(self, image_path: str) -> str:
-        img = Image.open(image_path)
-        img = img.convert("RGB") 
-        try:
-            return pytesseract.image_to_string(img, lang="deu")
-        except:
-            return pytesseract.image_to_string(img)  
+        img = load_pil_image_module().open(image_path)
+        return ocr_image(img, self.ocr_config)
 
 
     # -----------------------
     # EXTRACT TEXT FROM DOCX
     # -----------------------
-    def extract_text_from_docx(self, docx_path: str) -> str:
-        document = docx.Document(docx_path)
-        return "\n".join([p.text for p in document.paragraphs])
+    def extract_text_from_docx(self, docx_path: str, budget: Optional[TokenBudget] = None) -> str:
+        # Paragraphs, tables (line items), headers and footers in reading order
+        return extract_docx(docx_path, budget=budget)
 
     # -----------------------
     # UNIVERSAL EXTRACTOR
-    # Handles PDF, image, text, docx
+    # Handles PDF, image, text, docx — routed by magic bytes, not the filename
     # -----------------------
-    def extract_text_from_any(self, file_path: str)  -> str:
-        mimetypes.add_type("image/webp", ".webp")
-        mime, _ = mimetypes.guess_type(file_path)
-
-        if mime is None:
-            file_path_str = str(file_path).lower()
-            # Check for HEIC, WebP, and other common images that might be missed
-            if file_path_str.endswith(('.heic', '.heif', '.webp', '.jpg', '.jpeg', '.png', '.bmp', '.tiff')):
-                return self.extract_text_from_image(file_path)
-            
-            raise ValueError(f"Unknown file type for {file_path}")
+    def extract_text_from_any(self, file_path: str, file_type: Optional[FileType] = None,
+                              budget: Optional[TokenBudget] = None)  -> str:
+        if file_type is None:
+            # Raises UnsupportedFileTypeError before any expensive parsing
+            with timed("mime_detection"):
+                file_type = detect_file_type(file_path, name=Path(file_path).name)
+        FILES_TOTAL.inc(mime=file_type.mime)
 
         # --- PDF ---
-        if mime == "application/pdf":
-            return extract_pdf(file_path)
+        if file_type.kind == "pdf":
+            return extract_pdf(file_path, budget=budget, ocr_config=self.ocr_config)
 
         # --- IMAGES ---
-        if mime.startswith("image/"):
+        if file_type.kind == "image":
             return self.extract_text_from_image(file_path)
 
         # --- TEXT FILES ---
-        if mime.startswith("text/"):
-            with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-                return f.read()
+        if file_type.kind == "text":
+            return collect_until_budget(iter_text_file(file_path), budget, kind="text")
 
         # --- DOCX ---
-        if mime in ("application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-            "application/msword"):
-            return self.extract_text_from_docx(file_path)
+        if file_type.kind == "docx":
+            return self.extract_text_from_docx(file_path, budget=budget)
 
-        # --- Add more file types here ---
-        raise ValueError(f"Unsupported file type: {mime}")
+        # --- Add more file types here (and to app/core/filetype.py) ---
+        raise UnsupportedFileTypeError(file_type.mime, str(file_path))
 
     # -----------------------
     # UNIVERSAL FILE PREDICT
     # -----------------------
-    def predict_file(self, file_path: str) -> Dict[str, Any]:
-        extracted_text = self.extract_text_from_any(file_path)
+    def predict_file(self, file_path: str, file_type: Optional[FileType] = None) -> Dict[str, Any]:
+        extracted_text = self.extract_text_from_any(file_path, file_type=file_type, budget=self.new_token_budget())
         return self.predict(extracted_text)
 
     # -----------------------
     # PREDICT TEXT DIRECTLY
     # -----------------------
     def predict(self, text: str) -> Dict[str, Any]:
-        clean = clean_text(text)
+        import torch
 
-        inputs = self.tokenizer(
-            clean,
-            padding=True,
-            truncation=True,
-            return_tensors="pt"
-        ).to(self.device)
+        with timed("clean_text"):
+            clean = clean_text(text)
 
-        with torch.no_grad():
-            logits = self.model(**inputs).logits
-        probs = torch.softmax(logits, dim=-1)[0]
-        pred_id = int(probs.argmax())
-        confidence = float(probs[pred_id])
+        with timed("tokenization"):
+            inputs = self.tokenizer(
+                clean,
+                padding=True,
+                truncation=True,
+                return_tensors="pt"
+            ).to(self.device)
+
+        with timed("forward"), torch.no_grad():
+            logits = self.forward(inputs)
+        with timed("softmax"):
+            probs = torch.softmax(logits, dim=-1)[0]
+            pred_id = int(probs.argmax())
+            confidence = float(probs[pred_id])
 
         # pred_id = logits.argmax(dim=-1).cpu().numpy()[0]
         label = self.label_classes[pred_id]
+        PREDICTIONS_TOTAL.inc(model=self.model_name, label=str(label))
 
         return {
             "label": str(label),
             "label_id": pred_id,
             "confidence": confidence
-        }
\ No newline at end of file
+        }
+
+    # -----------------------
+    # PREDICT MANY TEXTS (BATCHED)
+    # -----------------------
+    def predict_batch(self, texts: List[str], batch_size: int = 16) -> List[Dict[str, Any]]:
+        """Batched `predict` that also returns the full probability distribution per text."""
+        import torch
+
+        with timed("clean_text"):
+            cleaned = [clean_text(t) for t in texts]
+
+        # Sort by length so each batch pads to similar lengths, restore order afterwards
+        order = sorted(range(len(cleaned)), key=lambda i: len(cleaned[i]))
+        results: List[Optional[Dict[str, Any]]] = [None] * len(cleaned)
+
+        for start in range(0, len(order), batch_size):
+            batch_ids = order[start:start + batch_size]
+            with timed("tokenization"):
+                inputs = self.tokenizer(
+                    [cleaned[i] for i in batch_ids],
+                    padding=True,
+                    truncation=True,
+                    return_tensors="pt"
+                ).to(self.device)
+
+            with timed("forward"), torch.no_grad():
+                logits = self.forward(inputs)
+            with timed("softmax"):
+                probs = torch.softmax(logits, dim=-1).cpu()
+
+            for row, idx in zip(probs, batch_ids):
+                pred_id = int(row.argmax())
+                label = str(self.label_classes[pred_id])
+                PREDICTIONS_TOTAL.inc(model=self.model_name, label=label)
+                results[idx] = {
+                    "label": label,
+                    "label_id": pred_id,
+                    "confidence": float(row[pred_id]),
+                    "probabilities": {str(c): float(p) for c, p in zip(self.label_classes, row)},
+                }
+
+        return results
+
+    # -----------------------
+    # METRICS
+    # -----------------------
+    def dump_metrics(self, output_path: str) -> Path:
+        """Write the collected stage timings and counters (e.g. at the end of a batch run)."""
+        return REGISTRY.write(output_path)
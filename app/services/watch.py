@@ -0,0 +1,315 @@
+# watch.py
+"""
+Watch-folder daemon: continuously classify documents dropped into a directory.
+
+Pipeline:
+    watcher (inotify, or polling fallback) -> debounce until the file is stable
+    -> bounded extraction queue -> extraction threads
+    -> bounded inference queue -> batched inference -> results + sorted files
+
+Classified files are moved to `<output_dir>/<label>/`, failures to
+`<output_dir>/_failed/`, and one JSON line per document is appended to
+`<output_dir>/results_<date>.jsonl`.
+"""
+import json
+import os
+import queue
+import shutil
+import signal
+import sys
+import threading
+import time
+
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from app.core.ocr import DEFAULT_OCR_CONFIG, OCRConfig
+from app.core.precision import DEFAULT_RUNTIME_CONFIG, RuntimeConfig
+from app.services.batch import is_candidate_document
+from app.services.predict import DocumentClassifier
+
+FAILED_DIR_NAME = "_failed"
+
+
+def _file_signature(path: Path) -> Optional[Tuple[int, float]]:
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    return st.st_size, st.st_mtime
+
+
+# -----------------------
+# FILE SYSTEM EVENTS
+# -----------------------
+class DirectoryWatcher:
+    """Yields paths that may have changed; uses inotify when available, else polls."""
+
+    def __init__(self, watch_dir: Path, poll_interval: float = 2.0) -> None:
+        self.watch_dir = watch_dir
+        self.poll_interval = poll_interval
+        self._inotify = None
+        try:
+            # Optional dependency: `pip install inotify_simple` (Linux only)
+            from inotify_simple import INotify, flags
+
+            self._inotify = INotify()
+            self._inotify.add_watch(str(watch_dir), flags.CLOSE_WRITE | flags.MOVED_TO | flags.CREATE)
+            self.backend = "inotify"
+        except (ImportError, OSError):
+            self.backend = "polling"
+
+    def scan(self) -> Iterator[Path]:
+        with os.scandir(self.watch_dir) as entries:
+            for entry in entries:
+                if entry.is_file() and is_candidate_document(entry.name):
+                    yield Path(entry.path)
+
+    def changes(self, timeout: float) -> List[Path]:
+        if self._inotify is None:
+            time.sleep(min(timeout, self.poll_interval))
+            return list(self.scan())
+        events = self._inotify.read(timeout=int(timeout * 1000))
+        return [
+            self.watch_dir / e.name for e in events
+            if e.name and is_candidate_document(e.name)
+        ]
+
+
+class Debouncer:
+    """Releases a file only after its size and mtime stayed unchanged for `settle_seconds`."""
+
+    def __init__(self, settle_seconds: float = 3.0) -> None:
+        self.settle_seconds = settle_seconds
+        self._seen: Dict[Path, Tuple[int, float, float]] = {}
+
+    def touch(self, path: Path) -> None:
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            self._seen.pop(path, None)
+            return
+        previous = self._seen.get(path)
+        if previous is None or previous[:2] != (st.st_size, st.st_mtime):
+            self._seen[path] = (st.st_size, st.st_mtime, time.monotonic())
+
+    def ready(self) -> List[Path]:
+        now = time.monotonic()
+        for path in list(self._seen):
+            # Re-stat pending files: with inotify we get no further event while a scanner keeps writing
+            self.touch(path)
+        done = [p for p, (size, _, since) in self._seen.items()
+                if size > 0 and now - since >= self.settle_seconds]
+        for path in done:
+            del self._seen[path]
+        return done
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+
+# -----------------------
+# DAEMON
+# -----------------------
+class WatchFolderClassifier:
+    def __init__(
+        self,
+        watch_dir: str,
+        output_dir: str,
+        model_path: str,
+        batch_size: int = 16,
+        workers: int = 2,
+        queue_size: int = 64,
+        settle_seconds: float = 3.0,
+        poll_interval: float = 2.0,
+        batch_timeout: float = 1.0,
+        stats_interval: float = 60.0,
+        ocr_config: Optional[OCRConfig] = None,
+        runtime_config: Optional[RuntimeConfig] = None,
+    ) -> None:
+        self.watch_dir = Path(watch_dir)
+        if not self.watch_dir.is_dir():
+            raise FileNotFoundError(f"Watch directory not found: {self.watch_dir}")
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+
+        self.classifier = DocumentClassifier(model_path, ocr_config=ocr_config or DEFAULT_OCR_CONFIG,
+                                             runtime_config=runtime_config or DEFAULT_RUNTIME_CONFIG)
+        self.batch_size = batch_size
+        self.workers = workers
+        self.batch_timeout = batch_timeout
+        self.stats_interval = stats_interval
+
+        self.watcher = DirectoryWatcher(self.watch_dir, poll_interval=poll_interval)
+        self.debouncer = Debouncer(settle_seconds)
+        # Bounded queues apply back-pressure instead of buffering a whole day of scans in RAM
+        self.extract_queue: "queue.Queue[Path]" = queue.Queue(maxsize=queue_size)
+        self.infer_queue: "queue.Queue[Tuple[Path, str, Optional[str]]]" = queue.Queue(maxsize=queue_size)
+        self.in_flight: Set[Path] = set()
+        # Files that could not be moved out of the watch folder, with their (size, mtime) at that
+        # point; they are skipped until they change, instead of being classified on every scan
+        self.unmovable: Dict[Path, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+        self.stop_event = threading.Event()
+
+        self.stats = {"classified": 0, "failed": 0}
+        self._last_stats = (time.monotonic(), 0)
+
+    # --- stages ---
+    def _extract_worker(self) -> None:
+        """One of `workers` threads; PDFs go through PYMUPDF_LOCK (app.core.utils), OCR runs in parallel."""
+        while not self.stop_event.is_set():
+            try:
+                path = self.extract_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                text, error = self.classifier.extract_text_from_any(str(path), budget=self.classifier.new_token_budget()), None
+                if not text.strip():
+                    error = "No text extracted"
+            except Exception as e:
+                text, error = "", f"{type(e).__name__}: {e}"
+            # The inference worker exits on stop, so a full queue must not block shutdown
+            while not self.stop_event.is_set():
+                try:
+                    self.infer_queue.put((path, text, error), timeout=0.5)
+                    break
+                except queue.Full:
+                    continue
+
+    def _inference_worker(self) -> None:
+        while not self.stop_event.is_set():
+            batch = self._collect_batch()
+            if batch:
+                self._process_batch(batch)
+
+    def _collect_batch(self) -> List[Tuple[Path, str, Optional[str]]]:
+        """Wait for the first item, then take more until the batch is full or the timeout expires."""
+        try:
+            batch = [self.infer_queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.batch_timeout
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.infer_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _process_batch(self, batch: List[Tuple[Path, str, Optional[str]]]) -> None:
+        ok = [item for item in batch if item[2] is None]
+        try:
+            predictions = self.classifier.predict_batch([text for _, text, _ in ok], batch_size=self.batch_size)
+        except Exception as e:
+            print(f"[ERROR] Inference failed for {len(ok)} files: {e}", file=sys.stderr)
+            predictions = [None] * len(ok)
+        by_path = {path: pred for (path, _, _), pred in zip(ok, predictions)}
+
+        records = []
+        for path, _, error in batch:
+            pred = by_path.get(path)
+            if pred is None and error is None:
+                error = "Inference failed"
+            target_dir = self.output_dir / (pred["label"] if pred else FAILED_DIR_NAME)
+            destination = self._move(path, target_dir)
+            records.append({
+                "timestamp": datetime.now().isoformat(timespec="seconds"),
+                "filename": path.name,
+                "stored_as": str(destination) if destination else None,
+                "label": pred["label"] if pred else None,
+                "confidence": pred["confidence"] if pred else None,
+                "probabilities": pred["probabilities"] if pred else None,
+                "error": error,
+            })
+            signature = _file_signature(path) if destination is None else None
+            with self._lock:
+                self.stats["classified" if pred else "failed"] += 1
+                if signature is not None:
+                    self.unmovable[path] = signature
+                self.in_flight.discard(path)
+
+        results_path = self.output_dir / f"results_{datetime.now():%Y%m%d}.jsonl"
+        with open(results_path, "a", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    @staticmethod
+    def _move(path: Path, target_dir: Path) -> Optional[Path]:
+        target_dir.mkdir(parents=True, exist_ok=True)
+        destination = target_dir / path.name
+        counter = 1
+        while destination.exists():
+            destination = target_dir / f"{path.stem}_{counter}{path.suffix}"
+            counter += 1
+        try:
+            return Path(shutil.move(str(path), str(destination)))
+        except OSError as e:
+            print(f"[ERROR] Cannot move {path} to {target_dir}: {e}", file=sys.stderr)
+            return None
+
+    # --- bookkeeping ---
+    def _log_stats(self, force: bool = False) -> None:
+        now = time.monotonic()
+        last_time, last_done = self._last_stats
+        if not force and now - last_time < self.stats_interval:
+            return
+        with self._lock:
+            done = self.stats["classified"] + self.stats["failed"]
+            in_flight = len(self.in_flight)
+        rate = (done - last_done) / max(now - last_time, 1e-9)
+        print(f"[STATS] {self.stats['classified']} classified, {self.stats['failed']} failed | "
+              f"{rate:.2f} files/s | backlog: {len(self.debouncer)} settling, "
+              f"{self.extract_queue.qsize()} to extract, {self.infer_queue.qsize()} to classify, "
+              f"{in_flight} in flight")
+        self._last_stats = (now, done)
+
+    def _enqueue(self, candidates: List[Path]) -> None:
+        for path in candidates:
+            with self._lock:
+                if path in self.in_flight:
+                    continue
+                if path in self.unmovable:
+                    if self.unmovable[path] == _file_signature(path):
+                        continue
+                    del self.unmovable[path]  # replaced or removed: classify it again
+            self.debouncer.touch(path)
+        for path in self.debouncer.ready():
+            with self._lock:
+                if path in self.in_flight:
+                    continue
+                self.in_flight.add(path)
+            # Blocks when the pipeline is saturated (back-pressure)
+            while not self.stop_event.is_set():
+                try:
+                    self.extract_queue.put(path, timeout=0.5)
+                    break
+                except queue.Full:
+                    self._log_stats()
+
+    def run(self) -> None:
+        print(f"👀 Watching {self.watch_dir} ({self.watcher.backend}) → {self.output_dir}")
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, lambda *_: self.stop_event.set())
+
+        threads = [threading.Thread(target=self._extract_worker, daemon=True) for _ in range(self.workers)]
+        threads.append(threading.Thread(target=self._inference_worker, daemon=True))
+        for t in threads:
+            t.start()
+
+        # Files that arrived while the daemon was down
+        self._enqueue(list(self.watcher.scan()))
+        while not self.stop_event.is_set():
+            self._enqueue(self.watcher.changes(timeout=1.0))
+            self._log_stats()
+
+        # Files still queued are not moved, so they are picked up again on the next start
+        print("🛑 Stopping watcher...")
+        for t in threads:
+            t.join(timeout=30)
+        self._log_stats(force=True)
+        self.classifier.dump_metrics(str(self.output_dir / "metrics.prom"))
@@ -33,7 +33,7 @@ plt.rcParams['font.family'] = 'serif'
 # --- Constants ---
 MODELS_DIR = PROJECT_ROOT / "models"
 RESULTS_DIR = PROJECT_ROOT / "results"
-DATA_PATH = PROCESSED_DIR / "all_data.csv"
+DATA_PATH = PROCESSED_DIR  # processed Parquet files (or a legacy all_data.csv)
 
 
 
@@ -149,6 +149,24 @@ def load_experiment_data(model_dirs):
 
     return pd.DataFrame(records)
 
+def load_dataset_stats(data_path: Path) -> pd.DataFrame:
+    """Label and text length per document; only these columns are read from Parquet."""
+    import pyarrow.compute as pc
+    import pyarrow.dataset as pa_ds
+    from app.core.prepare_data import processed_parquet_files
+
+    parquet_files = processed_parquet_files(data_path)
+    if not parquet_files:
+        legacy_csv = data_path / "all_data.csv" if data_path.is_dir() else data_path
+        return pd.read_csv(legacy_csv, usecols=["label", "text"]) if legacy_csv.exists() else pd.DataFrame()
+
+    dataset = pa_ds.dataset([str(f) for f in parquet_files], format="parquet")
+    # The text length is computed in Arrow, so no text is materialized as Python strings
+    return dataset.to_table(columns={
+        "label": pc.field("label"),
+        "text_length": pc.utf8_length(pc.field("text")),
+    }).to_pandas()
+
 # --- Visualization Functions ---
 
 def plot_f1_score_bar(df):
@@ -263,8 +281,9 @@ def plot_class_distribution(df_data):
     save_fig(fig, 'fig_dataset_class_distribution.png')
 
     # 2. Box Plot (Text Length)
-    if 'text' in df_data.columns:
+    if 'text_length' not in df_data.columns and 'text' in df_data.columns:
         df_data['text_length'] = df_data['text'].str.len()
+    if 'text_length' in df_data.columns:
         fig2, ax2 = plt.subplots(figsize=(14, 8))
         sns.boxplot(data=df_data, x='label', y='text_length', palette="Set2", ax=ax2)
         ax2.set_yscale('log')
@@ -306,16 +325,16 @@ def generate_results():
     RESULTS_DIR.mkdir(parents=True, exist_ok=True)
     log(f"Starting Result Analysis. Output: {RESULTS_DIR.resolve()}")
 
-    # 1. Dataset Analysis (Only if CSV exists)
-    if DATA_PATH.exists():
-        log("Analyzing Dataset...")
-        try:
-            raw_data = pd.read_csv(DATA_PATH)
-            plot_class_distribution(raw_data)
-        except Exception as e:
-            log(f"⚠️ Dataset plot error: {e}")
-    else:
-        log("ℹ️ Dataset CSV not found. Skipping dataset plots.")
+    # 1. Dataset Analysis (Only if processed data exists)
+    try:
+        dataset_stats = load_dataset_stats(DATA_PATH) if DATA_PATH.exists() else pd.DataFrame()
+        if not dataset_stats.empty:
+            log("Analyzing Dataset...")
+            plot_class_distribution(dataset_stats)
+        else:
+            log("ℹ️ Processed dataset not found. Skipping dataset plots.")
+    except Exception as e:
+        log(f"⚠️ Dataset plot error: {e}")
 
     # 2. Model Data Loading
     log("Scanning models...")
@@ -0,0 +1,15 @@
+from app.services.batch import iter_documents
+
+
+def test_iter_documents_sniffs_instead_of_filtering_by_suffix(tmp_path):
+    for name in ("scan_0001", "rechnung.PDF.bin", "brief.docx", ".DS_Store", "upload.pdf.part", "~$brief.docx"):
+        (tmp_path / name).write_bytes(b"x")
+    (tmp_path / ".git").mkdir()
+    (tmp_path / ".git" / "HEAD").write_bytes(b"x")
+    output = tmp_path / "out"
+    output.mkdir()
+    (output / "part-00000.parquet").write_bytes(b"x")
+
+    found = [p.name for p in iter_documents(tmp_path, exclude=output)]
+
+    assert found == ["brief.docx", "rechnung.PDF.bin", "scan_0001"]
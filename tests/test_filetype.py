@@ -0,0 +1,52 @@
+import io
+import zipfile
+
+import pytest
+
+from app.core.filetype import DOCX_MIME, UnsupportedFileTypeError, detect_file_type
+
+
+def _zip_bytes(*members: str) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zf:
+        for member in members:
+            zf.writestr(member, "<xml/>")
+    return buffer.getvalue()
+
+
+def test_pdf():
+    assert detect_file_type(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n1 0 obj") == ("pdf", "application/pdf")
+
+
+def test_docx_from_bytes_path_and_stream(tmp_path):
+    data = _zip_bytes("[Content_Types].xml", "word/document.xml")
+    path = tmp_path / "upload.bin"  # the name does not matter
+    path.write_bytes(data)
+    stream = io.BytesIO(data)
+
+    assert detect_file_type(data) == ("docx", DOCX_MIME)
+    assert detect_file_type(path) == ("docx", DOCX_MIME)
+    assert detect_file_type(stream) == ("docx", DOCX_MIME)
+    assert stream.tell() == 0
+
+
+def test_plain_zip_is_rejected():
+    with pytest.raises(UnsupportedFileTypeError) as exc:
+        detect_file_type(_zip_bytes("readme.txt"), name="archive.docx")
+    assert exc.value.mime == "application/zip"
+    assert "archive.docx" in str(exc.value)
+
+
+def test_ole2_doc_is_rejected():
+    with pytest.raises(UnsupportedFileTypeError) as exc:
+        detect_file_type(b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1" + b"\x00" * 504)
+    assert exc.value.mime == "application/msword"
+
+
+def test_cp1252_text():
+    head = "Sehr geehrte Damen und Herren, die Gebühr beträgt 50 €.\n".encode("cp1252")
+    assert detect_file_type(head) == ("text", "text/plain")
+
+
+def test_text_starting_with_bm_is_not_bmp():
+    assert detect_file_type(b"BMW Fahrzeugschein\nKennzeichen M-AB 123\n") == ("text", "text/plain")
@@ -0,0 +1,43 @@
+import numpy as np
+
+from app.core.near_duplicates import cluster_near_duplicates, group_train_test_split
+
+INVOICE = (
+    "Rechnung Nr {n} vom 12.03.2024 Sehr geehrte Damen und Herren wir berechnen Ihnen "
+    "für die Lieferung von Büromaterial den folgenden Betrag zahlbar innerhalb von "
+    "vierzehn Tagen ohne Abzug auf das unten genannte Konto mit freundlichen Grüßen Ihr Team"
+)
+CONTRACT = (
+    "Mietvertrag zwischen dem Vermieter und dem Mieter über die Wohnung im zweiten "
+    "Obergeschoss des Hauses die Miete beträgt monatlich und ist jeweils im Voraus bis "
+    "zum dritten Werktag eines Monats zu zahlen die Kaution beträgt drei Monatsmieten"
+)
+
+
+def test_cluster_near_duplicates_merges_siblings_and_keeps_different_texts_apart():
+    texts = [INVOICE.format(n=1), CONTRACT, INVOICE.format(n=1), INVOICE.format(n=1) + " Anlage", "ganz anderer Text"]
+
+    groups = cluster_near_duplicates(texts)
+
+    assert groups[0] == groups[2] == groups[3] == 0
+    assert groups[1] == 1
+    assert groups[4] == 4
+
+
+def test_cluster_near_duplicates_empty_input():
+    assert len(cluster_near_duplicates([])) == 0
+
+
+def test_group_train_test_split_never_splits_a_cluster():
+    rng = np.random.default_rng(0)
+    groups = np.repeat(np.arange(40), rng.integers(1, 6, size=40))
+    labels = groups % 3
+    rows = np.arange(len(groups))
+
+    train, test = group_train_test_split(rows, labels, groups, test_size=0.2, random_state=1)
+
+    assert len(test) > 0
+    assert np.array_equal(np.sort(np.r_[train, test]), rows)
+    assert not set(groups[train]) & set(groups[test])
+    # Every label is represented in the test split
+    assert set(labels[test]) == {0, 1, 2}
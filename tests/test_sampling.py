@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from app.core.sampling import balance_indices, class_counts, stratified_subset
+
+
+def test_balance_indices_downsamples_to_smallest_class_without_replacement():
+    codes = np.array([0] * 10 + [1] * 4 + [2] * 6 + [-1] * 3)
+
+    rows = balance_indices(codes, random_state=0)
+
+    assert class_counts(codes[rows]).tolist() == [4, 4, 4]
+    assert len(np.unique(rows)) == len(rows)
+    assert (codes[rows] >= 0).all()
+
+
+def test_balance_indices_upsamples_small_classes():
+    codes = np.array([0] * 10 + [1] * 3)
+
+    rows = balance_indices(codes, target_per_class=8, random_state=0)
+
+    assert class_counts(codes[rows]).tolist() == [8, 8]
+    small = rows[codes[rows] == 1]
+    # Every original row is kept before any row is repeated
+    assert set(small) == {10, 11, 12}
+    large = rows[codes[rows] == 0]
+    assert len(np.unique(large)) == len(large)
+
+
+def test_balance_indices_is_deterministic():
+    codes = np.array([0, 1, 1, 2, 2, 2] * 5)
+    assert np.array_equal(balance_indices(codes, random_state=7), balance_indices(codes, random_state=7))
+
+
+def test_stratified_subset_float_keeps_class_shares():
+    codes = np.array([0] * 60 + [1] * 30 + [2] * 10)
+
+    rows = stratified_subset(codes, 0.5, random_state=0)
+
+    assert class_counts(codes[rows]).tolist() == [30, 15, 5]
+    assert np.array_equal(rows, np.sort(rows))
+
+
+def test_stratified_subset_int_meets_row_count_exactly():
+    codes = np.array([0] * 7 + [1] * 5 + [2] * 1)
+
+    rows = stratified_subset(codes, 6, random_state=0)
+
+    assert len(rows) == 6
+    counts = class_counts(codes[rows])
+    # Every present class keeps at least one row
+    assert (counts > 0).all()
+    assert counts[0] >= counts[1] >= counts[2]
+
+
+def test_stratified_subset_full_size_returns_all_valid_rows():
+    codes = np.array([0, 1, -1, 1])
+    assert stratified_subset(codes, 1.0).tolist() == [0, 1, 3]
+    assert stratified_subset(codes, 10).tolist() == [0, 1, 3]
+
+
+@pytest.mark.parametrize("size", [1, 0, -3, True, 0.0, 1.5])
+def test_stratified_subset_rejects_ambiguous_sizes(size):
+    with pytest.raises(ValueError):
+        stratified_subset(np.array([0, 0, 1, 1]), size)